@@ -0,0 +1,223 @@
+"""FastAPI を介さずに API Gateway のイベントを直接処理する Lambda エントリポイント
+
+商品の 5 つのルート (作成・一覧・取得・更新・削除) は、事前にコンパイルした正規表現で
+振り分け、pydantic で検証したうえで api.routes の処理 (FastAPI のアプリと共通) を
+直接呼び出す。FastAPI / Starlette のリクエスト解析や依存性解決を通らないため
+1 回の呼び出しあたりのオーバーヘッドが小さく、コールドスタート時に FastAPI を
+import する必要もない。
+
+それ以外のリクエスト (一括作成・ストリーミング一覧など) は api.lambda_handler の
+ASGI ブリッジに委譲する。ローカル開発では従来どおり api.main の FastAPI アプリを使う。
+"""
+
+import base64
+import re
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Annotated
+from typing import Any
+from typing import TypeVar
+from urllib.parse import parse_qs
+
+from pydantic import BaseModel
+from pydantic import Field
+from pydantic import TypeAdapter
+from pydantic import ValidationError
+
+from api import lambda_handler
+from api import metrics
+from api import profiling
+from api import routes
+from api.models import Product
+from api.models import ProductUpdate
+from api.pagination import DEFAULT_PAGE_SIZE
+from api.pagination import MAX_PAGE_SIZE
+from api.routes import HTTPError
+from api.routes import RouteResponse
+
+M = TypeVar("M", bound=BaseModel)
+
+_limit_adapter = TypeAdapter(Annotated[int, Field(ge=1, le=MAX_PAGE_SIZE)])
+
+
+@dataclass
+class Request:
+    event: dict
+    method: str
+    path: str
+    query: dict[str, list[str]]
+    headers: dict[str, str]
+    body: bytes
+    path_params: dict[str, str]
+
+
+def handler(event: dict, context: Any) -> dict:
+    """Lambda ハンドラ"""
+    request = _parse_event(event)
+    route = _match(request)
+    if route is None:
+        return lambda_handler.handler(event, context)
+    if route is _delegate:
+        # 委譲先の FastAPI アプリではミドルウェアが計測する
+        return _dispatch(route, request)
+    name = f"{request.method} {_ROUTE_PATHS[route]}"
+    if not profiling.should_profile(request.headers.get(profiling.PROFILE_HEADER)):
+        return _measure(name, route, request)
+    with profiling.profile(name) as result:
+        response = _measure(name, route, request)
+    _add_header(response, profiling.PROFILE_ID_HEADER, result.id)
+    return response
+
+
+def _measure(name: str, route: Callable[[Request], dict], request: Request) -> dict:
+    if not metrics.enabled():
+        return _dispatch(route, request)
+    start = time.perf_counter()
+    with metrics.record() as recorded:
+        response = _dispatch(route, request)
+    seconds = time.perf_counter() - start
+    _add_header(response, "server-timing", metrics.server_timing(recorded, seconds))
+    metrics.emit(name, response["statusCode"], seconds, recorded)
+    return response
+
+
+def _add_header(response: dict, name: str, value: str) -> None:
+    # HTTP API は headers、REST API は multiValueHeaders で返す
+    if "headers" in response:
+        response["headers"][name] = value
+    else:
+        response["multiValueHeaders"][name] = [value]
+
+
+def _dispatch(route: Callable[[Request], dict], request: Request) -> dict:
+    try:
+        return route(request)
+    except HTTPError as e:
+        return _respond(request, routes.error_response(e))
+
+
+def _parse_event(event: dict) -> Request:
+    if lambda_handler.is_http_api(event):
+        method = event["requestContext"]["http"]["method"]
+        path = event["rawPath"]
+        query = parse_qs(event.get("rawQueryString", ""), keep_blank_values=True)
+        headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+    else:
+        method = event["httpMethod"]
+        path = event["path"]
+        query = event.get("multiValueQueryStringParameters") or {}
+        headers = {
+            k.lower(): ",".join(v)
+            for k, v in (event.get("multiValueHeaders") or {}).items()
+        }
+
+    body = (event.get("body") or "").encode()
+    if event.get("isBase64Encoded"):
+        body = base64.b64decode(body)
+    return Request(event, method, path, query, headers, body, {})
+
+
+def _match(request: Request) -> Callable[[Request], dict] | None:
+    for method, pattern, route in _ROUTES:
+        if method == request.method and (match := pattern.fullmatch(request.path)):
+            request.path_params = match.groupdict()
+            if route is _list_products and _streams(request):
+                # ストリーミング・並列 Scan は ASGI ブリッジで処理する
+                return _delegate
+            return route
+    return None
+
+
+def _streams(request: Request) -> bool:
+    return "stream" in request.query or "segments" in request.query
+
+
+def _respond(request: Request, response: RouteResponse) -> dict:
+    return lambda_handler.to_response(
+        request.event, response.status_code, response.headers, response.body
+    )
+
+
+def _validation_error(e: ValidationError, *loc: str) -> HTTPError:
+    errors = e.errors(include_url=False)
+    return HTTPError(422, [{**err, "loc": [*loc, *err["loc"]]} for err in errors])
+
+
+def _parse_body(model: type[M], body: bytes) -> M:
+    try:
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        raise _validation_error(e, "body") from e
+
+
+def _create_product(request: Request) -> dict:
+    product = _parse_body(Product, request.body)
+    return _respond(request, routes.create_product(product))
+
+
+def _list_products(request: Request) -> dict:
+    query = request.query
+    try:
+        limit = _limit_adapter.validate_python(
+            query.get("limit", [DEFAULT_PAGE_SIZE])[-1]
+        )
+    except ValidationError as e:
+        raise _validation_error(e, "query", "limit") from e
+    response = routes.list_products(
+        limit,
+        query.get("cursor", [None])[-1],
+        query.get("ids"),
+        query.get("fields"),
+        request.headers.get("if-none-match"),
+    )
+    return _respond(request, response)
+
+
+def _read_product(request: Request) -> dict:
+    response = routes.read_product(
+        request.path_params["product_id"],
+        request.query.get("fields"),
+        request.headers.get("if-none-match"),
+    )
+    return _respond(request, response)
+
+
+def _update_product(request: Request) -> dict:
+    update = _parse_body(ProductUpdate, request.body)
+    response = routes.update_product(
+        request.path_params["product_id"], update, request.headers.get("if-match")
+    )
+    return _respond(request, response)
+
+
+def _delete_product(request: Request) -> dict:
+    response = routes.delete_product(request.path_params["product_id"])
+    return _respond(request, response)
+
+
+def _delegate(request: Request) -> dict:
+    return lambda_handler.handler(request.event, None)
+
+
+_PRODUCTS = re.compile(r"/products/")
+_DELEGATED = re.compile(r"/products/(search|latest|stats)")
+_PRODUCT = re.compile(r"/products/(?P<product_id>[^/]+)")
+
+_ROUTES: list[tuple[str, re.Pattern[str], Callable[[Request], dict]]] = [
+    ("POST", _PRODUCTS, _create_product),
+    ("GET", _PRODUCTS, _list_products),
+    # 検索・新着順の一覧・集計は ASGI ブリッジで処理する (商品 ID より先に判定する)
+    ("GET", _DELEGATED, _delegate),
+    ("GET", _PRODUCT, _read_product),
+    ("PATCH", _PRODUCT, _update_product),
+    ("DELETE", _PRODUCT, _delete_product),
+]
+# 計測結果のルート名 (api.main のルートのパスと揃える)
+_ROUTE_PATHS: dict[Callable[[Request], dict], str] = {
+    _create_product: "/products/",
+    _list_products: "/products/",
+    _read_product: "/products/{product_id}",
+    _update_product: "/products/{product_id}",
+    _delete_product: "/products/{product_id}",
+}
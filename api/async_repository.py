@@ -0,0 +1,101 @@
+"""repository の非同期版
+
+boto3 はブロッキング I/O のため、専用の有界スレッドプールで実行して await する。
+FastAPI 既定のスレッドプール (40 スレッド) を DynamoDB 待ちで使い切らないよう、
+同時に発行する DynamoDB 呼び出しの数は DYNAMODB_MAX_CONCURRENCY で制御する。
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from collections.abc import AsyncIterator
+from collections.abc import Callable
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Any
+from typing import TypeVar
+
+from api import repository
+from api import search
+from api import stats
+from api.bulk import create_products as _create_products
+from api.models import DYNAMODB_MAX_CONCURRENCY
+from api.models import Product
+from api.models import ProductBatchResult
+from api.models import ProductStatsResponse
+
+T = TypeVar("T")
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+_STOP = object()
+
+
+def executor() -> ThreadPoolExecutor:
+    """初回利用時にスレッドプールを作成する (コールドスタート時の負担を避ける)"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=DYNAMODB_MAX_CONCURRENCY, thread_name_prefix="dynamodb"
+                )
+    return _executor
+
+
+async def run(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """同期関数を DynamoDB 用スレッドプールで実行する (contextvars は引き継ぐ)"""
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(executor(), call)
+
+
+async def iterate(iterator: Iterator[T]) -> AsyncIterator[T]:
+    """同期イテレータを 1 要素ずつスレッドプールで進める非同期イテレータ"""
+    try:
+        while (item := await run(next, iterator, _STOP)) is not _STOP:
+            yield item  # type: ignore[misc]
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await run(close)
+
+
+async def create_products(
+    products: list[tuple[int, Product]],
+) -> list[ProductBatchResult]:
+    return await run(_create_products, products)
+
+
+async def search_products(
+    *,
+    min_price: Decimal | None = None,
+    max_price: Decimal | None = None,
+    name_prefix: str | None = None,
+    limit: int,
+    cursor: str | None = None,
+) -> tuple[list[Product], str | None]:
+    return await run(
+        search.search_products,
+        min_price=min_price,
+        max_price=max_price,
+        name_prefix=name_prefix,
+        limit=limit,
+        cursor=cursor,
+    )
+
+
+async def latest_products(
+    *, limit: int, cursor: str | None = None
+) -> tuple[list[Product], str | None]:
+    return await run(search.latest_products, limit=limit, cursor=cursor)
+
+
+async def product_stats() -> ProductStatsResponse:
+    return await run(stats.read)
+
+
+async def clear_products() -> int:
+    return await run(repository.clear_products)
@@ -0,0 +1,103 @@
+import os
+import random
+import time
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from itertools import islice
+
+from api.metrics import propagate_context
+from api.models import Product
+
+# BatchWriteItem で 1 回に送れる件数の上限
+BATCH_WRITE_MAX_ITEMS = 25
+# 並列に発行する BatchWriteItem の数
+DEFAULT_BATCH_WORKERS = int(os.getenv("DYNAMODB_BATCH_WORKERS", "8"))
+
+_MAX_ATTEMPTS = 8
+_BASE_BACKOFF_SECONDS = 0.05
+_MAX_BACKOFF_SECONDS = 2.0
+
+
+class UnprocessedItemsError(Exception):
+    """リトライ上限を超えても UnprocessedItems が残った場合の例外"""
+
+
+def _chunks(requests: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    iterator = iter(requests)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _backoff(attempt: int) -> float:
+    # Full Jitter: 0 〜 min(上限, 基準 * 2^attempt) の一様乱数
+    return random.uniform(  # nosec B311
+        0, min(_MAX_BACKOFF_SECONDS, _BASE_BACKOFF_SECONDS * 2**attempt)
+    )
+
+
+def write_batch(chunk: list[dict], max_attempts: int = _MAX_ATTEMPTS) -> None:
+    """25 件以内の書き込みを送信し、UnprocessedItems はバックオフして再送する"""
+    table_name = Product._resolve_table_name()
+    request_items = {table_name: chunk}
+    for attempt in range(max_attempts):
+        response = Product._dynamodb_resource().batch_write_item(
+            RequestItems=request_items
+        )
+        request_items = response.get("UnprocessedItems") or {}
+        if not request_items:
+            return
+        time.sleep(_backoff(attempt))
+    unprocessed = len(request_items.get(table_name, []))
+    raise UnprocessedItemsError(
+        f"{unprocessed} items were not processed after {max_attempts} attempts"
+    )
+
+
+def batch_write(
+    requests: Iterable[dict], *, max_workers: int = DEFAULT_BATCH_WORKERS
+) -> int:
+    """PutRequest / DeleteRequest の列を 25 件ずつに分け、並列に BatchWriteItem する
+
+    requests は遅延評価のまま読み進め、処理中のバッチ数を max_workers の 2 倍までに
+    抑えるため、巨大な入力でもメモリは一定に保たれる。書き込んだ件数を返す。
+    """
+    written = 0
+    in_flight: set[Future] = set()
+    write = propagate_context(_write_counted)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for chunk in _chunks(requests, BATCH_WRITE_MAX_ITEMS):
+                if len(in_flight) >= max_workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    written += sum(future.result() for future in done)
+                in_flight.add(executor.submit(write, chunk))
+            written += sum(future.result() for future in in_flight)
+        finally:
+            for future in in_flight:
+                future.cancel()
+    return written
+
+
+def _write_counted(chunk: list[dict]) -> int:
+    write_batch(chunk)
+    return len(chunk)
+
+
+def batch_delete(
+    keys: Iterable[dict], *, max_workers: int = DEFAULT_BATCH_WORKERS
+) -> int:
+    """キーの列をまとめて削除する"""
+    requests = ({"DeleteRequest": {"Key": key}} for key in keys)
+    return batch_write(requests, max_workers=max_workers)
+
+
+def batch_put(
+    items: Iterable[dict], *, max_workers: int = DEFAULT_BATCH_WORKERS
+) -> int:
+    """アイテムの列をまとめて書き込む (条件付き書き込みは不可)"""
+    requests = ({"PutRequest": {"Item": item}} for item in items)
+    return batch_write(requests, max_workers=max_workers)
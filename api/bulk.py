@@ -0,0 +1,185 @@
+import json
+import random
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+from dyntastic import A
+from dyntastic import transaction
+from pydantic import ValidationError
+
+from api import batch
+from api import stats
+from api.cache import product_cache
+from api.errors import TRANSACTION_CANCELED
+from api.errors import error_code
+from api.metrics import propagate_context
+from api.models import PRODUCT_INDEX_SHARDS
+from api.models import PRODUCT_INITIAL_VERSION
+from api.models import Product
+from api.models import ProductBatchResult
+from api.repository import product_reads
+from api.snapshot import product_snapshot
+
+# 1 リクエストで受け付ける件数の上限
+MAX_BATCH_CREATE_ITEMS = 1000
+# TransactWriteItems で 1 回に送れる件数の上限
+TRANSACT_MAX_ITEMS = 100
+
+_MAX_ATTEMPTS = 5
+_BASE_BACKOFF_SECONDS = 0.05
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class BatchPayloadError(ValueError):
+    """リクエストボディ全体が解釈できない場合の例外"""
+
+
+def parse_batch_payload(body: bytes, content_type: str | None) -> list[object]:
+    """JSON 配列または NDJSON のボディを行ごとの値に分解する
+
+    NDJSON の不正な行はその行だけを無効扱いにできるよう、例外を値として返す。
+    """
+    if content_type and content_type.startswith(NDJSON_MEDIA_TYPE):
+        rows = list(_parse_ndjson(body))
+    else:
+        try:
+            rows = json.loads(body)
+        except ValueError as e:
+            raise BatchPayloadError("Invalid JSON") from e
+        if not isinstance(rows, list):
+            raise BatchPayloadError("Request body must be a JSON array")
+    if len(rows) > MAX_BATCH_CREATE_ITEMS:
+        raise BatchPayloadError(f"Too many items (max {MAX_BATCH_CREATE_ITEMS})")
+    return rows
+
+
+def _parse_ndjson(body: bytes) -> Iterator[object]:
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+
+def validate_products(
+    rows: list[object],
+) -> tuple[list[tuple[int, Product]], list[ProductBatchResult]]:
+    """全行を 1 回ずつ検証し、有効な商品と無効行の結果に振り分ける"""
+    valid: list[tuple[int, Product]] = []
+    invalid: list[ProductBatchResult] = []
+    for index, row in enumerate(rows):
+        if isinstance(row, ValueError):
+            invalid.append(
+                ProductBatchResult(index=index, status="invalid", detail="Invalid JSON")
+            )
+            continue
+        try:
+            valid.append((index, Product.model_validate(row)))
+        except ValidationError as e:
+            product_id = row.get("product_id") if isinstance(row, dict) else None
+            invalid.append(
+                ProductBatchResult(
+                    index=index,
+                    product_id=product_id if isinstance(product_id, str) else None,
+                    status="invalid",
+                    detail=_summarize(e),
+                )
+            )
+    return valid, invalid
+
+
+def _summarize(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, err['loc'])) or 'body'}: {err['msg']}"
+        for err in error.errors()
+    )
+
+
+def _transact_create(products: list[Product]) -> set[str]:
+    """条件付き Put をトランザクションでまとめて書き込み、重複した ID を返す
+
+    キャンセル理由が ConditionalCheckFailed の商品を除いて再送するため、
+    重複以外の商品は 1 リクエスト内の他の重複に巻き込まれずに作成される。
+    """
+    conflicts: set[str] = set()
+    for attempt in range(_MAX_ATTEMPTS):
+        try:
+            with transaction():
+                for product in products:
+                    product.save(condition=A.product_id.not_exists())
+                if stats.enabled():
+                    # 商品数・価格合計のカウンタも同じトランザクションで増やす
+                    stats.add(
+                        stats.deltas((p.product_id, 1, p.price) for p in products)
+                    )
+            return conflicts
+        except ClientError as e:
+            if error_code(e) != TRANSACTION_CANCELED:
+                raise
+            reasons = e.response.get("CancellationReasons", [])
+            failed = {
+                product.product_id
+                for product, reason in zip(products, reasons, strict=False)
+                if reason.get("Code") == "ConditionalCheckFailed"
+            }
+            if not failed:
+                # 競合トランザクションやスロットリングは待ってから再送
+                time.sleep(
+                    random.uniform(0, _BASE_BACKOFF_SECONDS * 2**attempt)  # nosec B311
+                )
+                continue
+            conflicts |= failed
+            products = [p for p in products if p.product_id not in failed]
+            if not products:
+                return conflicts
+    raise RuntimeError(f"Transaction did not succeed after {_MAX_ATTEMPTS} attempts")
+
+
+def create_products(
+    products: list[tuple[int, Product]], *, max_workers: int | None = None
+) -> list[ProductBatchResult]:
+    """商品をまとめて作成し、リクエスト位置ごとの結果を返す"""
+    results: list[ProductBatchResult] = []
+    unique: list[Product] = []
+    seen: set[str] = set()
+    for index, product in products:
+        if product.product_id in seen:
+            # 同一リクエスト内の重複は 2 件目以降を競合とする
+            results.append(_result(index, product, "conflict"))
+            continue
+        seen.add(product.product_id)
+        product.version = PRODUCT_INITIAL_VERSION
+        unique.append(product)
+
+    # 集計が有効な場合は shard ごとのカウンタの更新も同じトランザクションに含める
+    chunk_size = TRANSACT_MAX_ITEMS - (PRODUCT_INDEX_SHARDS if stats.enabled() else 0)
+    chunks = [unique[i : i + chunk_size] for i in range(0, len(unique), chunk_size)]
+    with ThreadPoolExecutor(max_workers or batch.DEFAULT_BATCH_WORKERS) as executor:
+        conflicts = set().union(
+            *executor.map(propagate_context(_transact_create), chunks)
+        )
+
+    indexes = {id(product): index for index, product in products}
+    for product in unique:
+        status = "conflict" if product.product_id in conflicts else "created"
+        if status == "created":
+            product_cache.invalidate(product.product_id)
+            product_reads.forget(product.product_id)
+            product_snapshot.apply(product)
+        results.append(_result(indexes[id(product)], product, status))
+    return results
+
+
+def _result(index: int, product: Product, status: str) -> ProductBatchResult:
+    detail = "Product already exists" if status == "conflict" else None
+    return ProductBatchResult(
+        index=index,
+        product_id=product.product_id,
+        status=status,  # type: ignore[arg-type]
+        detail=detail,
+    )
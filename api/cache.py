@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Generic
+from typing import TypeVar
+
+from api.models import PRODUCT_CACHE_MAX_SIZE
+from api.models import PRODUCT_CACHE_TTL_SECONDS
+from api.models import Product
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """件数上限と有効期限付きの LRU キャッシュ (スレッドセーフ)
+
+    モジュールレベルに置くことで、Lambda のウォームスタート間でも内容が保持される。
+    max_size が 0 の場合は何も保持しない。
+
+    読み込み結果は、読み込み開始前に generation(key) で得た値を since に渡して
+    set する。その間に同じキーへの書き込み (since なしの set・invalidate・clear)
+    があれば、古い値で上書きしないよう保持しない。
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+        # キーごとの最後の書き込みの世代 (新しい順に max_size 件まで)
+        self._generation = 0
+        self._written: OrderedDict[K, int] = OrderedDict()
+        # _written から追い出した世代の最大値 (追い出したキーはこの世代とみなす)
+        self._forgotten = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: K) -> V | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    # 期限切れは削除してミス扱い
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, key: K) -> int:
+        """key への最後の書き込みの世代 (読み込み開始前に取得して set に渡す)"""
+        with self._lock:
+            return self._written.get(key, self._forgotten)
+
+    def set(self, key: K, value: V, since: int | None = None) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if since is None:
+                self._record_write(key)
+            elif self._written.get(key, self._forgotten) != since:
+                # 読み込み中に書き込まれたため、読んだ値は古い可能性がある
+                return
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                # 最も長く参照されていないものから追い出す
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._record_write(key)
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._forgotten = self._generation
+            self._written.clear()
+            self._entries.clear()
+
+    def _record_write(self, key: K) -> None:
+        self._generation += 1
+        self._written[key] = self._generation
+        self._written.move_to_end(key)
+        if len(self._written) > self.max_size:
+            _, self._forgotten = self._written.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+
+# 単一商品の読み取りキャッシュ (このプロセスの書き込みで無効化される)
+product_cache: TTLCache[str, Product] = TTLCache(
+    PRODUCT_CACHE_MAX_SIZE, PRODUCT_CACHE_TTL_SECONDS
+)
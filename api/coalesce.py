@@ -0,0 +1,117 @@
+import threading
+from collections.abc import Callable
+from collections.abc import Hashable
+from concurrent.futures import Future
+from typing import Generic
+from typing import TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class SingleFlight(Generic[K, V]):
+    """同じキーへの同時呼び出しを 1 回の実行にまとめる
+
+    先着の呼び出しだけが fn を実行し、実行中に到着した呼び出しはその結果
+    (例外を含む) を共有する。完了後の呼び出しは改めて fn を実行する。
+    書き込み後に forget(key) を呼ぶと、書き込み前に始まった実行の結果を
+    以降の呼び出しには共有しない。
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[K, Future[V]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: K, fn: Callable[[], V]) -> V:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if future is None:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+
+    def forget(self, key: K) -> None:
+        """実行中の呼び出しがあっても、以降の呼び出しは改めて fn を実行する"""
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._calls.clear()
+
+
+class BatchLoader(Generic[K, V]):
+    """短い時間窓に届いた異なるキーの取得を 1 回の一括取得にまとめる (DataLoader 方式)
+
+    最初の load() から window_seconds 経過するか max_batch_size 件に達した時点で
+    load_many をまとめて 1 回呼ぶ。load_many は見つかったキーだけを含む dict を返し、
+    見つからなかったキーの load() は None を返す。
+    """
+
+    def __init__(
+        self,
+        load_many: Callable[[list[K]], dict[K, V]],
+        window_seconds: float,
+        max_batch_size: int = 100,
+    ):
+        self._load_many = load_many
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._pending: dict[K, Future[V | None]] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    def load(self, key: K) -> V | None:
+        full_batch = None
+        with self._lock:
+            if self._pending is None:
+                self._pending = {}
+                timer = threading.Timer(
+                    self.window_seconds, self._dispatch_pending, (self._pending,)
+                )
+                timer.daemon = True
+                timer.start()
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+            if len(self._pending) >= self.max_batch_size:
+                # 上限に達したら時間窓を待たずにこのスレッドで送る
+                full_batch, self._pending = self._pending, None
+        if full_batch is not None:
+            self._dispatch(full_batch)
+        return future.result()
+
+    def _dispatch_pending(self, batch: dict[K, Future[V | None]]) -> None:
+        with self._lock:
+            if self._pending is not batch:
+                # 件数上限で既に送信済み
+                return
+            self._pending = None
+        self._dispatch(batch)
+
+    def _dispatch(self, batch: dict[K, Future[V | None]]) -> None:
+        try:
+            results = self._load_many(list(batch))
+        except BaseException as e:
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        for key, future in batch.items():
+            future.set_result(results.get(key))
@@ -0,0 +1,209 @@
+"""Dyntastic のモデルと DynamoDB のアイテムの変換
+
+dyntastic の既定の変換は、読み込みでは全フィールドを model_validate で検証し直し、
+書き込みでは model_dump の結果を attr.serialize で再帰的にたどる。
+ここではモデルのフィールド・計算フィールドの型から属性ごとの変換関数を
+1 度だけ組み立て、自テーブルのアイテム (書き込み時に検証済み) を検証せずにモデルにする。
+組み立ては model_construct と同じインスタンス属性を直接設定して行う
+(model_construct はエイリアスや既定値の解決を毎回行うため、検証付きの読み込みと
+ほとんど変わらない)。
+
+item は boto3 のリソース層の表現 (数値は Decimal)、wire は DynamoDB API の
+型付き表現 ({"S": "..."}, {"N": "..."}) で、クライアントを直接呼ぶ場合に使う。
+"""
+
+import functools
+import types
+from collections.abc import Callable
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any
+from typing import Generic
+from typing import TypeVar
+from typing import Union
+from typing import get_args
+from typing import get_origin
+
+from boto3.dynamodb.types import DYNAMODB_CONTEXT
+from pydantic import BaseModel
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def _number(value: Decimal | int) -> str:
+    # TypeSerializer と同様に、DynamoDB で表せない桁数 (38 桁超) は例外にする
+    return str(DYNAMODB_CONTEXT.create_decimal(value))
+
+
+def _decimal(value: Any) -> Decimal:
+    # 数値型で保存されていれば Decimal のまま (文字列で保存された古いアイテムも読む)
+    return value if type(value) is Decimal else Decimal(str(value))
+
+
+@dataclass(frozen=True)
+class _Converter:
+    wire_type: str
+    # モデルの値 → item の値 (None は変換なし)
+    encode: Callable[[Any], Any] | None
+    # item の値 → モデルの値 (None は変換なし)
+    decode: Callable[[Any], Any] | None
+    to_wire: Callable[[Any], str]
+    from_wire: Callable[[str], Any]
+
+
+_CONVERTERS: dict[type, _Converter] = {
+    str: _Converter("S", None, None, str, str),
+    int: _Converter("N", None, int, _number, int),
+    Decimal: _Converter("N", None, _decimal, _number, Decimal),
+    # Product の field_serializer と同じ ISO 形式の文字列で保存する
+    datetime: _Converter(
+        "S",
+        datetime.isoformat,
+        datetime.fromisoformat,
+        datetime.isoformat,
+        datetime.fromisoformat,
+    ),
+}
+
+
+@dataclass(frozen=True)
+class _Attribute:
+    attribute: str
+    field: str
+    converter: _Converter
+    default: Callable[[], Any] | None = None
+    # 計算フィールドの値を求める関数 (property の getter)
+    compute: Callable[[Any], Any] | None = None
+
+
+def _converter(annotation: Any) -> _Converter:
+    """X または X | None の注釈から変換関数を選ぶ"""
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            annotation = args[0]
+    if annotation not in _CONVERTERS:
+        raise TypeError(f"Unsupported attribute type: {annotation!r}")
+    return _CONVERTERS[annotation]
+
+
+class ItemCodec(Generic[M]):
+    """1 つのモデルのフィールドと DynamoDB の属性の対応表"""
+
+    def __init__(self, model: type[M]):
+        self.model = model
+        self._fields = [
+            _Attribute(
+                field.alias or name,
+                name,
+                _converter(field.annotation),
+                (
+                    None
+                    if field.is_required()
+                    else functools.partial(field.get_default, call_default_factory=True)
+                ),
+            )
+            for name, field in model.model_fields.items()
+        ]
+        self._computed = [
+            _Attribute(
+                info.alias or name,
+                name,
+                _converter(info.return_type),
+                compute=info.wrapped_property.fget,
+            )
+            for name, info in model.model_computed_fields.items()
+        ]
+        self._required = [attr for attr in self._fields if not attr.default]
+        self._private = model.__private_attributes__
+
+    def to_item(self, model: M) -> dict[str, Any]:
+        """attr.serialize(model.model_dump(by_alias=True)) と同じ item にする"""
+        item = {}
+        for attr, value in self._values(model):
+            if value is not None:
+                encode = attr.converter.encode
+                item[attr.attribute] = value if encode is None else encode(value)
+        return item
+
+    def from_item(self, item: dict[str, Any]) -> M | None:
+        """item をモデルにする。必須の属性が欠けている (GSI の射影など) 場合は None"""
+        if any(item.get(attr.attribute) is None for attr in self._required):
+            return None
+        values = {}
+        fields_set = set()
+        for attr in self._fields:
+            value = item.get(attr.attribute)
+            if value is None:
+                values[attr.field] = attr.default() if attr.default else None
+                continue
+            decode = attr.converter.decode
+            values[attr.field] = value if decode is None else decode(value)
+            fields_set.add(attr.field)
+        return self._construct(values, fields_set)
+
+    def to_wire(self, model: M) -> dict[str, dict[str, str]]:
+        """モデルを DynamoDB API の型付きの属性にする"""
+        return {
+            attr.attribute: {attr.converter.wire_type: attr.converter.to_wire(value)}
+            for attr, value in self._values(model)
+            if value is not None
+        }
+
+    def from_wire(self, item: dict[str, dict[str, Any]]) -> M | None:
+        """型付きの属性をモデルにする。必須の属性が欠けている場合は None"""
+        if any(
+            attr.converter.wire_type not in item.get(attr.attribute, {})
+            for attr in self._required
+        ):
+            return None
+        values = {}
+        fields_set = set()
+        for attr in self._fields:
+            value = item.get(attr.attribute)
+            if value is None or attr.converter.wire_type not in value:
+                # 属性がない・NULL の場合は既定値にする
+                values[attr.field] = attr.default() if attr.default else None
+                continue
+            values[attr.field] = attr.converter.from_wire(
+                value[attr.converter.wire_type]
+            )
+            fields_set.add(attr.field)
+        return self._construct(values, fields_set)
+
+    def _values(self, model: M) -> Iterator[tuple[_Attribute, Any]]:
+        values = vars(model)
+        for attr in self._fields:
+            yield attr, values[attr.field]
+        if self._computed:
+            # Dyntastic は属性の参照ごとに状態を確認して遅いため、計算フィールドは
+            # フィールドの値だけを持つオブジェクトに対して求める
+            fields = types.SimpleNamespace(**values)
+            for attr in self._computed:
+                yield attr, attr.compute(fields)  # type: ignore[misc]
+
+    def _construct(self, values: dict[str, Any], fields_set: set[str]) -> M:
+        # model_construct と同じ属性を設定する (extra は使わない)
+        model = self.model.__new__(self.model)
+        object.__setattr__(model, "__dict__", values)
+        object.__setattr__(model, "__pydantic_fields_set__", fields_set)
+        object.__setattr__(model, "__pydantic_extra__", None)
+        object.__setattr__(
+            model,
+            "__pydantic_private__",
+            {name: attr.get_default() for name, attr in self._private.items()} or None,
+        )
+        return model
+
+
+_codecs: dict[type, ItemCodec] = {}
+
+
+def item_codec(model: type[M]) -> ItemCodec[M]:
+    """モデルごとの ItemCodec (初回利用時に組み立てる)"""
+    codec = _codecs.get(model)
+    if codec is None:
+        codec = _codecs.setdefault(model, ItemCodec(model))
+    return codec
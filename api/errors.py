@@ -0,0 +1,22 @@
+from botocore.exceptions import ClientError
+
+# botocore の例外クラスはクライアントごとに生成されるため、
+# 複数スレッドでクライアントが作られても判定できるようエラーコードで比較する
+CONDITIONAL_CHECK_FAILED = "ConditionalCheckFailedException"
+TRANSACTION_CANCELED = "TransactionCanceledException"
+
+
+def error_code(error: ClientError) -> str:
+    return error.response.get("Error", {}).get("Code", "")
+
+
+def is_conditional_check_failed(error: ClientError) -> bool:
+    return error_code(error) == CONDITIONAL_CHECK_FAILED
+
+
+class ProductAlreadyExists(Exception):
+    """同じ product_id の商品が既に存在する場合の例外"""
+
+
+class VersionMismatch(Exception):
+    """If-Match で指定された版と現在の版が一致しない場合の例外"""
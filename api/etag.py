@@ -0,0 +1,91 @@
+"""ETag と条件付きリクエスト (If-None-Match / If-Match)
+
+商品の ETag は version 属性と作成日時から作る ("3-62a99ba0c6000" のような強い ETag)。
+削除して作り直した商品は版が 1 から数え直すため、作成日時 (UTC のマイクロ秒を
+16 進数にしたもの) で作り直す前の商品の ETag と区別する。
+一覧の ETag はページ内の商品の ETag と次ページのカーソルから作る弱い ETag で、
+レスポンス本体をシリアライズせずに計算できる。
+"""
+
+import hashlib
+from collections.abc import Iterable
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import NamedTuple
+
+from api.models import created_at_key
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class InvalidETagError(ValueError):
+    """If-Match に商品の ETag として解釈できない値が指定された場合の例外"""
+
+
+class ItemVersion(NamedTuple):
+    """商品の ETag が表す版 (作成日時の並べ替え用キーと version)"""
+
+    created_key: str
+    version: int
+
+
+def item_etag(created_at: datetime, version: int) -> str:
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    micros = (created_at - _EPOCH) // _MICROSECOND
+    return f'"{version}-{micros:x}"'
+
+
+def collection_etag(entries: Iterable[tuple[str, str]], *extra: str | None) -> str:
+    """entries はページ内の (product_id, 商品の ETag)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for product_id, etag in entries:
+        digest.update(f"{product_id}\x00{etag}\x01".encode())
+    for value in extra:
+        digest.update(f"{value or ''}\x02".encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _split(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _opaque(tag: str) -> str:
+    return tag.removeprefix("W/")
+
+
+def none_match(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match が現在の ETag に一致するか (一致すれば 304 を返す)
+
+    If-None-Match は弱い比較で判定する (W/ の有無は区別しない)。
+    """
+    if not if_none_match:
+        return False
+    tags = _split(if_none_match)
+    return "*" in tags or _opaque(etag) in {_opaque(tag) for tag in tags}
+
+
+def parse_if_match(if_match: str | None) -> list[ItemVersion] | None:
+    """If-Match から期待する版の一覧を取り出す ("*" や未指定なら None)
+
+    If-Match は強い比較のため、弱い ETag は一致しない値として扱う。
+    """
+    if not if_match or if_match.strip() == "*":
+        return None
+    versions = [_parse_item_etag(tag) for tag in _split(if_match)]
+    if not versions:
+        raise InvalidETagError(if_match)
+    return versions
+
+
+def _parse_item_etag(tag: str) -> ItemVersion:
+    if tag.startswith("W/") or len(tag) < 2 or tag[0] != '"' or tag[-1] != '"':
+        raise InvalidETagError(tag)
+    version, _, micros = tag[1:-1].partition("-")
+    try:
+        created_at = _EPOCH + int(micros, 16) * _MICROSECOND
+        return ItemVersion(created_at_key(created_at), int(version))
+    except (ValueError, OverflowError) as e:
+        raise InvalidETagError(tag) from e
@@ -0,0 +1,212 @@
+"""商品テーブルのエクスポート (NDJSON / CSV / Parquet)
+
+uv run python -m api.export products.ndjson.gz --format ndjson --segments 8
+
+テーブルを並列セグメント Scan し、読んだページを順に出力へ書き込む。
+全件をメモリに載せないため、件数に関わらず使用メモリはページ数枚分で一定になる。
+NDJSON / CSV は gzip で圧縮し、Parquet は列ごとに zstd で圧縮する
+(Parquet は pyarrow がインストールされている場合のみ)。
+接続先は DYNAMODB_ENDPOINT_URL・DYNAMODB_PRODUCT_TABLE_NAME で指定する。
+"""
+
+import argparse
+import contextlib
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Iterable
+from collections.abc import Iterator
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import IO
+from typing import Any
+
+from api.models import Product
+from api.projection import PRODUCT_FIELDS
+from api.projection import projection
+from api.scan import DEFAULT_SCAN_SEGMENTS
+from api.scan import scan_segments
+from api.serialization import dump_ndjson
+from api.serialization import jsonable_products
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+Pages = Iterable[list[Product]]
+
+
+class ExportFormatError(ValueError):
+    """未対応の形式、または形式に必要なパッケージがない場合の例外"""
+
+
+@dataclass
+class ExportResult:
+    items: int
+    bytes_written: int
+    seconds: float
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+
+class _CountingWriter(io.BufferedIOBase):
+    """書き込んだバイト数 (圧縮後) を数えながら出力先へ渡す"""
+
+    def __init__(self, out: IO[bytes]):
+        self.out = out
+        self.bytes_written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self.out.write(data)
+        size = memoryview(data).nbytes
+        self.bytes_written += size
+        return size
+
+    def flush(self) -> None:
+        self.out.flush()
+
+
+def _write_ndjson(pages: Pages, out: io.BufferedIOBase) -> int:
+    items = 0
+    for products in pages:
+        out.write(dump_ndjson(products))
+        items += len(products)
+    return items
+
+
+def _write_csv(pages: Pages, out: io.BufferedIOBase) -> int:
+    items = 0
+    header = True
+    for products in pages:
+        # 1 ページ分の行を文字列にまとめてから書き込む
+        text = io.StringIO(newline="")
+        writer = csv.DictWriter(text, fieldnames=PRODUCT_FIELDS)
+        if header:
+            writer.writeheader()
+            header = False
+        writer.writerows(jsonable_products(products))
+        out.write(text.getvalue().encode())
+        items += len(products)
+    return items
+
+
+_TEXT_WRITERS: dict[str, Callable[[Pages, io.BufferedIOBase], int]] = {
+    "ndjson": _write_ndjson,
+    "csv": _write_csv,
+}
+
+
+def _write_parquet(pages: Pages, out: io.BufferedIOBase, compress: bool) -> int:
+    try:
+        import pyarrow as pa  # type: ignore[import-not-found]
+        import pyarrow.parquet as pq  # type: ignore[import-not-found]
+    except ImportError as e:
+        raise ExportFormatError("parquet export requires pyarrow") from e
+
+    # 価格は NDJSON / CSV と同じく桁を落とさないよう文字列で持つ
+    schema = pa.schema(
+        [
+            ("product_id", pa.string()),
+            ("name", pa.string()),
+            ("description", pa.string()),
+            ("price", pa.string()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+        ]
+    )
+    items = 0
+    compression = "zstd" if compress else "none"
+    with pq.ParquetWriter(out, schema, compression=compression) as writer:
+        for products in pages:
+            if not products:
+                continue
+            # 1 ページを 1 つの行グループとして書き込む
+            columns = {
+                "product_id": [p.product_id for p in products],
+                "name": [p.name for p in products],
+                "description": [p.description for p in products],
+                "price": [str(p.price) for p in products],
+                "created_at": [p.created_at for p in products],
+            }
+            writer.write_table(pa.table(columns, schema=schema))
+            items += len(products)
+    return items
+
+
+def _scan_pages(total_segments: int, per_page: int | None) -> Generator[list[Product]]:
+    # レスポンスに含めるフィールドだけを読み出す
+    for items in scan_segments(
+        total_segments, per_page=per_page, **projection(PRODUCT_FIELDS)
+    ):
+        yield [Product._dyntastic_load_model(item) for item in items]
+
+
+def export_products(
+    out: IO[bytes],
+    export_format: str = "ndjson",
+    *,
+    compress: bool = True,
+    total_segments: int = DEFAULT_SCAN_SEGMENTS,
+    per_page: int | None = None,
+) -> ExportResult:
+    """テーブル全体を out に書き出し、件数・書き込んだバイト数・経過秒を返す"""
+    if export_format not in EXPORT_FORMATS:
+        raise ExportFormatError(f"Unsupported export format: {export_format}")
+    counter = _CountingWriter(out)
+    start = time.perf_counter()
+    pages = _scan_pages(total_segments, per_page)
+    try:
+        if export_format == "parquet":
+            items = _write_parquet(pages, counter, compress)
+        elif compress:
+            with gzip.GzipFile(fileobj=counter, mode="wb") as f:
+                items = _TEXT_WRITERS[export_format](pages, f)
+        else:
+            items = _TEXT_WRITERS[export_format](pages, counter)
+    finally:
+        # 書き込みが失敗した場合も Scan のワーカーを止める
+        pages.close()
+    counter.flush()
+    return ExportResult(items, counter.bytes_written, time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def _open_output(path: str) -> Iterator[IO[bytes]]:
+    if path == "-":
+        yield sys.stdout.buffer
+        return
+    with open(path, "wb") as f:
+        yield f
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output", help="出力先のパス (- で標準出力)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--no-compress", action="store_true")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SCAN_SEGMENTS)
+    parser.add_argument("--per-page", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    with _open_output(args.output) as out:
+        result = export_products(
+            out,
+            args.format,
+            compress=not args.no_compress,
+            total_segments=args.segments,
+            per_page=args.per_page,
+        )
+    # 出力先が標準出力の場合もあるため、結果は標準エラー出力に書く
+    report = {**asdict(result), "items_per_second": round(result.items_per_second)}
+    print(json.dumps(report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
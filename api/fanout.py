@@ -0,0 +1,43 @@
+"""1 リクエスト内の DynamoDB 呼び出しを並列に発行する共有スレッドプール
+
+呼び出しのたびにスレッドプールを作らず、プロセス内で 1 つのプールを使い回す。
+呼び出し元は async_repository のスレッドプール上で動くため、同じプールに投入すると
+すべてのスレッドが互いの完了を待って止まり得る。そのため別のプールにする。
+"""
+
+import threading
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from api.metrics import propagate_context
+from api.models import DYNAMODB_FANOUT_CONCURRENCY
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def executor() -> ThreadPoolExecutor:
+    """初回利用時にスレッドプールを作成する (コールドスタート時の負担を避ける)"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=DYNAMODB_FANOUT_CONCURRENCY,
+                    thread_name_prefix="dynamodb-fanout",
+                )
+    return _executor
+
+
+def fan_out(fn: Callable[[T], R], args: Iterable[T]) -> Iterator[R]:
+    """fn を args の各要素について並列に実行し、結果を args の順に返す
+
+    呼び出し元の contextvars (計測中のリクエスト) は各呼び出しに引き継ぐ。
+    """
+    return executor().map(propagate_context(fn), args)
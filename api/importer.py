@@ -0,0 +1,301 @@
+"""NDJSON / CSV からの商品の一括インポート
+
+uv run python -m api.importer products.ndjson.gz --checkpoint products.checkpoint.json
+
+入力を先頭から順に読み、chunk_rows 行ずつ Product で検証してから BatchWriteItem
+(25 件ずつ) を並列に発行する。処理中のバッチ数は max_workers の 2 倍までに抑える
+(背圧) ため、入力の大きさに関わらず使用メモリは一定になる。
+UnprocessedItems は api.batch.write_batch がバックオフして再送する。
+
+書き込みは条件なしの Put のため、同じ product_id の商品は上書きされる。
+再開時に同じ行を書き直しても結果が変わらないよう、product_id の指定を必須とする。
+同じ product_id の行はチャンク内では後の行が残るが、チャンクをまたぐ場合は
+並列に書き込むため、どちらが残るかは保証しない。
+チェックポイントには、先頭から連続して書き込みを終えた行数を記録する。
+"""
+
+import argparse
+import contextlib
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import IO
+from typing import cast
+
+from api import stats
+from api.batch import BATCH_WRITE_MAX_ITEMS
+from api.batch import DEFAULT_BATCH_WORKERS
+from api.batch import write_batch
+from api.bulk import validate_products
+from api.codec import item_codec
+from api.models import PRODUCT_INITIAL_VERSION
+from api.models import Product
+
+IMPORT_FORMATS = ("ndjson", "csv")
+# 1 度に検証する行数
+DEFAULT_CHUNK_ROWS = 1000
+
+
+class ImportSourceError(ValueError):
+    """入力ファイルとチェックポイントが対応しない場合の例外"""
+
+
+@dataclass
+class ImportResult:
+    # 今回読んだ行数 (チェックポイントから再開して読み飛ばした行は含まない)
+    rows: int
+    written: int
+    invalid: int
+    skipped: int
+    seconds: float
+
+    @property
+    def items_per_second(self) -> float:
+        return self.written / self.seconds if self.seconds else 0.0
+
+
+def detect_format(path: str) -> str:
+    """拡張子 (.csv / .csv.gz) から形式を決める。それ以外は NDJSON とする"""
+    name = path.removesuffix(".gz")
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+@contextlib.contextmanager
+def _open_source(path: str) -> Iterator[IO[bytes]]:
+    f = gzip.open(path) if path.endswith(".gz") else open(path, "rb")
+    with f:
+        yield cast(IO[bytes], f)
+
+
+def _raw_rows(f: IO[bytes], import_format: str) -> Iterator[object]:
+    if import_format == "csv":
+        for row in csv.DictReader(io.TextIOWrapper(f, encoding="utf-8", newline="")):
+            # 空欄は未指定として扱う (description は None、created_at は既定値)
+            yield {name: value for name, value in row.items() if value}
+    else:
+        yield from f
+
+
+def _parse_row(row: object) -> object:
+    """NDJSON の行を値にする (空行は None、不正な JSON は例外を値として返す)"""
+    if not isinstance(row, bytes):
+        return row
+    if not row.strip():
+        return None
+    try:
+        return json.loads(row)
+    except ValueError as e:
+        return e
+
+
+def _validate_chunk(start: int, rows: list[object]) -> tuple[list[dict], list[dict]]:
+    """1 チャンク分の行を検証し、書き込むアイテムと無効な行の情報を返す"""
+    positions: list[int] = []
+    candidates: list[object] = []
+    errors: list[dict] = []
+    for position, row in enumerate(rows, start):
+        if row is None:
+            continue
+        if isinstance(row, dict) and not row.get("product_id"):
+            errors.append({"row": position, "detail": "product_id: Field required"})
+            continue
+        positions.append(position)
+        candidates.append(row)
+
+    valid, invalid = validate_products(candidates)
+    errors += [
+        {"row": positions[result.index], **result.model_dump(exclude={"index"})}
+        for result in invalid
+    ]
+    # 1 回の BatchWriteItem に同じキーは含められないため、チャンク内では後の行を優先する
+    items: dict[str, dict] = {}
+    codec = item_codec(Product)
+    for _, product in valid:
+        product.version = PRODUCT_INITIAL_VERSION
+        items[product.product_id] = codec.to_item(product)
+    return list(items.values()), sorted(errors, key=lambda error: error["row"])
+
+
+def _chunks(
+    rows: Iterable[object], size: int, start: int
+) -> Iterator[tuple[int, list]]:
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield start, chunk
+        start += len(chunk)
+
+
+class _Checkpoint:
+    """先頭から連続して書き込みを終えた行数をファイルに記録する"""
+
+    def __init__(self, path: str | None, source: str):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.rows = 0
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("source") != self.source:
+                raise ImportSourceError(f"Checkpoint {path} is for another source")
+            self.rows = saved["rows"]
+
+    def save(self, rows: int) -> None:
+        self.rows = rows
+        if not self.path:
+            return
+        # 書き込み途中で止まっても壊れたファイルが残らないよう、置き換えで更新する
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "rows": rows}, f)
+        os.replace(tmp, self.path)
+
+
+class _Writer:
+    """バッチを並列に書き込み、完了したチャンクの位置をチェックポイントに進める"""
+
+    def __init__(
+        self, executor: ThreadPoolExecutor, max_workers: int, checkpoint: _Checkpoint
+    ):
+        self.executor = executor
+        self.max_in_flight = max_workers * 2
+        self.checkpoint = checkpoint
+        self.written = 0
+        self.in_flight: dict[Future, int] = {}
+        # 読み込み順のチャンク (終端の行位置, バッチの Future)
+        self.chunks: deque[tuple[int, list[Future]]] = deque()
+
+    def submit(self, end: int, items: list[dict]) -> None:
+        futures = []
+        for i in range(0, len(items), BATCH_WRITE_MAX_ITEMS):
+            while len(self.in_flight) >= self.max_in_flight:
+                self._collect(wait(self.in_flight, return_when=FIRST_COMPLETED).done)
+            batch = [
+                {"PutRequest": {"Item": item}}
+                for item in items[i : i + BATCH_WRITE_MAX_ITEMS]
+            ]
+            future = self.executor.submit(write_batch, batch)
+            self.in_flight[future] = len(batch)
+            futures.append(future)
+        self.chunks.append((end, futures))
+        self._advance()
+
+    def finish(self) -> None:
+        self._collect(wait(self.in_flight).done)
+
+    def cancel(self) -> None:
+        for future in self.in_flight:
+            future.cancel()
+
+    def _collect(self, done: Iterable[Future]) -> None:
+        for future in done:
+            # 書き込みに失敗したバッチがあれば例外を送出し、チェックポイントは進めない
+            future.result()
+            self.written += self.in_flight.pop(future)
+        self._advance()
+
+    def _advance(self) -> None:
+        end = None
+        while self.chunks and not any(f in self.in_flight for f in self.chunks[0][1]):
+            end, _ = self.chunks.popleft()
+        if end is not None:
+            self.checkpoint.save(end)
+
+
+def import_products(
+    path: str,
+    import_format: str | None = None,
+    *,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    max_workers: int = DEFAULT_BATCH_WORKERS,
+    checkpoint: str | None = None,
+    on_invalid: Callable[[dict], None] | None = None,
+) -> ImportResult:
+    """path の商品をテーブルに書き込み、件数と経過秒を返す
+
+    checkpoint のファイルがあれば、記録された行の次から再開する。
+    無効な行は書き込まずに on_invalid へ渡す ({"row": 行位置, "detail": ...})。
+    """
+    import_format = import_format or detect_format(path)
+    progress = _Checkpoint(checkpoint, path)
+    skipped = progress.rows
+    rows = invalid = 0
+    start = time.perf_counter()
+    with (
+        _open_source(path) as f,
+        ThreadPoolExecutor(max_workers=max_workers) as executor,
+    ):
+        raw = _raw_rows(f, import_format)
+        # 書き込み済みの行は JSON として解釈せずに読み飛ばす
+        for _ in itertools.islice(raw, skipped):
+            pass
+        writer = _Writer(executor, max_workers, progress)
+        try:
+            for position, chunk in _chunks(map(_parse_row, raw), chunk_rows, skipped):
+                items, errors = _validate_chunk(position, chunk)
+                rows += len(chunk)
+                invalid += len(errors)
+                for error in errors:
+                    if on_invalid:
+                        on_invalid(error)
+                writer.submit(position + len(chunk), items)
+            writer.finish()
+        finally:
+            writer.cancel()
+
+    if stats.enabled():
+        # BatchWriteItem は集計用のカウンタを更新しないため作り直す
+        stats.rebuild()
+    return ImportResult(
+        rows, writer.written, invalid, skipped, time.perf_counter() - start
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("source", help="入力ファイル (.gz は gzip として読む)")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=DEFAULT_BATCH_WORKERS)
+    parser.add_argument("--checkpoint", help="再開位置を記録するファイル")
+    parser.add_argument("--errors", help="無効な行を NDJSON で書き出すパス")
+    args = parser.parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        errors = (
+            stack.enter_context(open(args.errors, "w", encoding="utf-8"))
+            if args.errors
+            else None
+        )
+        result = import_products(
+            args.source,
+            args.format,
+            chunk_rows=args.chunk_rows,
+            max_workers=args.workers,
+            checkpoint=args.checkpoint,
+            on_invalid=(
+                (lambda error: print(json.dumps(error), file=errors))
+                if errors
+                else None
+            ),
+        )
+    report = {**asdict(result), "items_per_second": round(result.items_per_second)}
+    print(json.dumps(report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""API Gateway → Lambda のエントリポイント
+
+コールドスタートを短くするため、このモジュールは標準ライブラリだけを import し、
+FastAPI アプリと DynamoDB クライアントは最初の呼び出しで 1 度だけ用意する。
+以降の呼び出しでは同じコンテナ内のアプリ・クライアント・イベントループを使い回す。
+
+API Gateway の REST API (ペイロード 1.0) と HTTP API (ペイロード 2.0) に対応する。
+"""
+
+import asyncio
+import base64
+import functools
+from typing import Any
+from urllib.parse import urlencode
+
+_TEXT_CONTENT_TYPES = ("text/", "application/json", "application/x-ndjson")
+
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+@functools.cache
+def _app() -> Any:
+    from api.main import app
+    from api.models import Product
+
+    # 接続設定済みのクライアントを作っておき、以降の呼び出しで使い回す
+    Product._dynamodb_table()
+    Product._dynamodb_client()
+    return app
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop
+
+
+def handler(event: dict, context: Any) -> dict:
+    """Lambda ハンドラ"""
+    scope, body = _to_asgi(event)
+    status, headers, content = _event_loop().run_until_complete(
+        _call_asgi(_app(), scope, body)
+    )
+    return to_response(event, status, headers, content)
+
+
+def is_http_api(event: dict) -> bool:
+    """HTTP API (ペイロード 2.0) のイベントか"""
+    return event.get("version") == "2.0"
+
+
+def _to_asgi(event: dict) -> tuple[dict, bytes]:
+    """API Gateway のイベントを ASGI の scope とリクエストボディに変換する"""
+    if is_http_api(event):
+        method = event["requestContext"]["http"]["method"]
+        path = event["rawPath"]
+        query = event.get("rawQueryString", "")
+        headers = list((event.get("headers") or {}).items())
+        if event.get("cookies"):
+            headers.append(("cookie", "; ".join(event["cookies"])))
+    else:
+        method = event["httpMethod"]
+        path = event["path"]
+        query = urlencode(event.get("multiValueQueryStringParameters") or {}, True)
+        headers = [
+            (name, value)
+            for name, values in (event.get("multiValueHeaders") or {}).items()
+            for value in values
+        ]
+
+    body = (event.get("body") or "").encode()
+    if event.get("isBase64Encoded"):
+        body = base64.b64decode(body)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "https",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "server": ("lambda", 443),
+        "client": None,
+    }
+    return scope, body
+
+
+async def _call_asgi(
+    app: Any, scope: dict, body: bytes
+) -> tuple[int, list[tuple[str, str]], bytes]:
+    """ASGI アプリを 1 リクエスト分実行し、レスポンスをまとめて返す"""
+    status = 500
+    headers: list[tuple[str, str]] = []
+    content = bytearray()
+    request_sent = False
+    response_done = asyncio.Event()
+
+    async def receive() -> dict:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # レスポンスを返し終えるまでは切断を通知しない
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            headers.extend((k.decode(), v.decode()) for k, v in message["headers"])
+        elif message["type"] == "http.response.body":
+            content.extend(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_done.set()
+
+    await app(scope, receive, send)
+    return status, headers, bytes(content)
+
+
+def to_response(
+    event: dict, status: int, headers: list[tuple[str, str]], content: bytes
+) -> dict:
+    """レスポンスを API Gateway のペイロード形式に変換する"""
+    content_type = next((v for k, v in headers if k == "content-type"), "")
+    is_text = not content or content_type.startswith(_TEXT_CONTENT_TYPES)
+    body = content.decode() if is_text else base64.b64encode(content).decode()
+
+    response: dict[str, Any] = {
+        "statusCode": status,
+        "body": body,
+        "isBase64Encoded": not is_text,
+    }
+    if is_http_api(event):
+        cookies = [v for k, v in headers if k == "set-cookie"]
+        joined: dict[str, str] = {}
+        for k, v in headers:
+            if k != "set-cookie":
+                joined[k] = f"{joined[k]},{v}" if k in joined else v
+        response["headers"] = joined
+        if cookies:
+            response["cookies"] = cookies
+    else:
+        multi: dict[str, list[str]] = {}
+        for k, v in headers:
+            multi.setdefault(k, []).append(v)
+        response["multiValueHeaders"] = multi
+    return response
@@ -1,14 +1,47 @@
-from dyntastic import A
-from dyntastic.exceptions import DoesNotExist
+from collections.abc import Callable
+from decimal import Decimal
+from typing import Annotated
+from typing import Any
+
 from fastapi import FastAPI
+from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Request
 from fastapi import Response
-
+from fastapi.responses import StreamingResponse
+
+from api import async_repository
+from api import metrics
+from api import routes
+from api import stats
+from api.bulk import BatchPayloadError
+from api.bulk import parse_batch_payload
+from api.bulk import validate_products
+from api.metrics import DynamoDBMetricsMiddleware
 from api.models import Product
+from api.models import ProductBatchResult
 from api.models import ProductResponse
+from api.models import ProductStatsResponse
 from api.models import ProductUpdate
+from api.pagination import DEFAULT_PAGE_SIZE
+from api.pagination import MAX_PAGE_SIZE
+from api.pagination import InvalidCursorError
+from api.pagination import iter_ndjson
+from api.pagination import iter_product_pages
+from api.profiling import ProfilingMiddleware
+from api.routes import HTTPError
+from api.routes import RouteResponse
+from api.scan import MAX_SCAN_SEGMENTS
+from api.scan import scan_products
+from api.search import InvalidSearchError
+from api.snapshot import product_snapshot
 
 app = FastAPI()
+# リクエストごとの DynamoDB 呼び出しの計測 (DYNAMODB_METRICS_ENABLED で有効化)
+app.add_middleware(DynamoDBMetricsMiddleware)
+# 一部のリクエストのサンプリングプロファイル (PROFILING_ENABLED で有効化)
+app.add_middleware(ProfilingMiddleware)
 
 
 @app.get("/health")
@@ -16,81 +49,183 @@ def health_check():
     return {"status": "healthy"}
 
 
-@app.post("/products/")
-def create_product(product: Product) -> ProductResponse:
-    try:
-        # 既存レコードがあれば何もせず existing に格納
-        existing = Product.get(product.product_id, consistent_read=True)
-    except DoesNotExist:
-        # レコード未存在時は existing = None のまま
-        existing = None
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics() -> Response:
+    """DynamoDB 呼び出しの累計 (Prometheus のテキスト形式)"""
+    if not metrics.DYNAMODB_METRICS_ENDPOINT_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(
+        metrics.registry.prometheus_text(), media_type=metrics.PROMETHEUS_MEDIA_TYPE
+    )
 
-    if existing:
-        # 重複時は 409 Conflict
-        raise HTTPException(status_code=409, detail="Product already exists")
-    # 新しい商品を作成
-    product.save()
-    return product  # type: ignore
 
+# api.routes のエラーは FastAPI の HTTPException と同じ形式で返す
+@app.exception_handler(HTTPError)
+async def route_error(request: Request, exc: HTTPError) -> Response:
+    return _response(routes.error_response(exc))
 
-@app.get("/products/")
-def list_products() -> list[ProductResponse]:
-    # DynamoDB の Scan API を使用して全アイテムを取得
-    items = Product.scan()
-    return list(items)  # type: ignore
 
+@app.post("/products/", response_model=ProductResponse)
+async def create_product(product: Product) -> Response:
+    return await _run(routes.create_product, product)
 
-@app.get("/products/{product_id}")
-def read_product(product_id: str) -> ProductResponse:
-    try:
-        product = Product.get(product_id)
-    except DoesNotExist as e:
-        raise HTTPException(status_code=404, detail="Product not found") from e
-    return product  # type: ignore
 
-
-@app.patch("/products/{product_id}")
-def update_product(product_id: str, product: ProductUpdate) -> ProductResponse:
+@app.post("/products/batch")
+async def create_products_batch(request: Request) -> list[ProductBatchResult]:
+    """JSON 配列または NDJSON で受け取った商品をまとめて作成する"""
+    body = await request.body()
     try:
-        item = Product.get(product_id)
-    except DoesNotExist as e:
-        raise HTTPException(status_code=404, detail="Product not found") from e
-
-    # 部分更新: リクエスト JSON のキー/値を属性更新式に変換
-    expressions = []
-    # 明示的に設定されたフィールドのみ取得
-    update_data = product.model_dump(exclude_unset=True)
-
-    if "name" in update_data:
-        expressions.append(A("name").set(update_data["name"]))
-    if "description" in update_data:
-        expressions.append(A("description").set(update_data["description"]))
-    if "price" in update_data:
-        expressions.append(A("price").set(update_data["price"]))
-
-    # フィールドが指定されていなければエラー
-    if not expressions:
-        raise HTTPException(status_code=400, detail="No fields to update")
-
-    # 更新式を適用
-    item.update(*expressions)
-    return Product.get(product_id)  # type: ignore
+        rows = parse_batch_payload(body, request.headers.get("content-type"))
+    except BatchPayloadError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    # 全件を 1 パスで検証し、有効なものだけを条件付き Put でまとめて書き込む
+    valid, invalid = validate_products(rows)
+    created = await async_repository.create_products(valid)
+    return sorted(invalid + created, key=lambda result: result.index)
+
+
+@app.get("/products/", response_model=list[ProductResponse])
+async def list_products(
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    stream: bool = False,
+    segments: Annotated[int, Query(ge=1, le=MAX_SCAN_SEGMENTS)] = 1,
+    ids: Annotated[list[str] | None, Query()] = None,
+    fields: Annotated[list[str] | None, Query()] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    if not ids:
+        if stream:
+            if routes.select_fields(fields):
+                # フィールドの射影は 1 ページ単位の一覧と単一取得のみ対応
+                raise HTTPException(
+                    status_code=400,
+                    detail="fields cannot be combined with ids or stream",
+                )
+            # NDJSON でテーブル全体をページ単位にストリーミング (limit はページサイズ)
+            return _stream_products(limit, routes.start_key(cursor), segments)
+        if segments > 1:
+            raise HTTPException(status_code=400, detail="segments requires stream=true")
+    return await _run(routes.list_products, limit, cursor, ids, fields, if_none_match)
+
+
+@app.get("/products/search", response_model=list[ProductResponse])
+async def search_products(
+    min_price: Decimal | None = None,
+    max_price: Decimal | None = None,
+    name_prefix: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """価格帯・名前の前方一致で検索する (Scan ではなく GSI を Query する)
+
+    name_prefix 指定時は名前順、それ以外は価格順に返す。
+    """
+    snapshot = product_snapshot.current()
+    try:
+        if snapshot is not None and name_prefix is None:
+            # 価格帯の検索はスナップショットの価格順の並びから返す
+            products, next_cursor = snapshot.search(
+                min_price=min_price, max_price=max_price, limit=limit, cursor=cursor
+            )
+        else:
+            products, next_cursor = await async_repository.search_products(
+                min_price=min_price,
+                max_price=max_price,
+                name_prefix=name_prefix,
+                limit=limit,
+                cursor=cursor,
+            )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+    except InvalidSearchError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    return _response(routes.product_page(products, next_cursor, if_none_match))
+
+
+@app.get("/products/latest", response_model=list[ProductResponse])
+async def latest_products(
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """作成日時の新しい順に一覧する (作成日時の GSI を Query する)"""
+    snapshot = product_snapshot.current()
+    try:
+        if snapshot is not None:
+            products, next_cursor = snapshot.latest(limit=limit, cursor=cursor)
+        else:
+            products, next_cursor = await async_repository.latest_products(
+                limit=limit, cursor=cursor
+            )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+    return _response(routes.product_page(products, next_cursor, if_none_match))
+
+
+@app.get("/products/stats")
+async def product_stats() -> ProductStatsResponse:
+    """商品数と価格の集計値 (書き込み時に更新したカウンタを読むだけで Scan しない)"""
+    if not stats.enabled():
+        raise HTTPException(status_code=404, detail="Product stats are not enabled")
+    return await async_repository.product_stats()
+
+
+async def _run(route: Callable[..., RouteResponse], *args: Any) -> Response:
+    """共通のルートの処理を DynamoDB 用スレッドプールで実行する"""
+    return _response(await async_repository.run(route, *args))
+
+
+def _response(response: RouteResponse) -> Response:
+    return Response(response.body, response.status_code, headers=dict(response.headers))
+
+
+def _stream_products(
+    limit: int, start_key: dict | None, segments: int
+) -> StreamingResponse:
+    if segments > 1:
+        if start_key:
+            raise HTTPException(
+                status_code=400, detail="cursor cannot be combined with segments"
+            )
+        # 複数セグメントを並列に Scan し、到着したページから順に流す
+        pages = scan_products(segments, per_page=limit)
+    else:
+        pages = iter_product_pages(limit, start_key)
+    # ページの取得と NDJSON 化は DynamoDB 用スレッドプールで 1 ページずつ進める
+    return StreamingResponse(
+        async_repository.iterate(iter_ndjson(pages)), media_type="application/x-ndjson"
+    )
+
+
+@app.get("/products/{product_id}", response_model=ProductResponse)
+async def read_product(
+    product_id: str,
+    fields: Annotated[list[str] | None, Query()] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    return await _run(routes.read_product, product_id, fields, if_none_match)
+
+
+@app.patch("/products/{product_id}", response_model=ProductResponse)
+async def update_product(
+    product_id: str,
+    product: ProductUpdate,
+    if_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    return await _run(routes.update_product, product_id, product, if_match)
 
 
 @app.delete("/products/{product_id}", status_code=204)
-def delete_product(product_id: str) -> Response:
-    try:
-        item = Product.get(product_id)
-    except DoesNotExist as e:
-        raise HTTPException(status_code=404, detail="Product not found") from e
-    item.delete()
-    return Response(status_code=204)
+async def delete_product(product_id: str) -> Response:
+    return await _run(routes.delete_product, product_id)
 
 
 @app.delete("/test/clear-table", status_code=204)
-def clear_table() -> Response:
+async def clear_table() -> Response:
     """テスト用: テーブル内の全アイテムを削除"""
-    items = Product.scan()
-    for item in items:
-        item.delete()
+    await async_repository.clear_products()
     return Response(status_code=204)
@@ -0,0 +1,326 @@
+"""リクエストごとの DynamoDB 呼び出しの計測
+
+DYNAMODB_METRICS_ENABLED が有効な場合、ASGI ミドルウェアがリクエストごとに
+計測用のオブジェクトを contextvars に置き、botocore のイベントフックが
+DynamoDB の呼び出し回数・所要時間・消費キャパシティ (ReturnConsumedCapacity=TOTAL
+を付けて取得) を操作ごとに加算する。結果は次の形で出力する。
+
+- Server-Timing ヘッダー (レスポンスヘッダーの送信までに行った呼び出し)
+- CloudWatch の Embedded Metric Format (EMF) の JSON 行 (DYNAMODB_METRICS_EMF_ENABLED)
+- Prometheus のテキスト形式の GET /metrics (DYNAMODB_METRICS_ENDPOINT_ENABLED)。
+  値はプロセス (Lambda ではコンテナ) ごとの累計
+
+ワーカースレッドで DynamoDB を呼び出す場合は propagate_context で包み、
+呼び出し元のリクエストに計上されるようにする。
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import TypeVar
+
+if TYPE_CHECKING:
+    from starlette.types import ASGIApp
+    from starlette.types import Message
+    from starlette.types import Receive
+    from starlette.types import Scope
+    from starlette.types import Send
+
+T = TypeVar("T")
+
+DYNAMODB_METRICS_ENABLED = (
+    os.getenv("DYNAMODB_METRICS_ENABLED", "false").lower() == "true"
+)
+DYNAMODB_METRICS_EMF_ENABLED = (
+    os.getenv("DYNAMODB_METRICS_EMF_ENABLED", "false").lower() == "true"
+)
+DYNAMODB_METRICS_ENDPOINT_ENABLED = (
+    os.getenv("DYNAMODB_METRICS_ENDPOINT_ENABLED", "false").lower() == "true"
+)
+DYNAMODB_METRICS_NAMESPACE = os.getenv("DYNAMODB_METRICS_NAMESPACE", "ServerlessSample")
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_UNMATCHED_ROUTE = "unmatched"
+
+
+@dataclass
+class OperationMetrics:
+    calls: int = 0
+    seconds: float = 0.0
+    capacity: float = 0.0
+
+    def add(self, other: "OperationMetrics") -> None:
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.capacity += other.capacity
+
+
+class RequestMetrics:
+    """1 リクエスト中の DynamoDB 呼び出し (複数スレッドから加算される)"""
+
+    def __init__(self) -> None:
+        self.operations: dict[str, OperationMetrics] = defaultdict(OperationMetrics)
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, seconds: float, capacity: float) -> None:
+        with self._lock:
+            self.operations[operation].add(OperationMetrics(1, seconds, capacity))
+
+    def total(self) -> OperationMetrics:
+        total = OperationMetrics()
+        with self._lock:
+            for metrics in self.operations.values():
+                total.add(metrics)
+        return total
+
+
+_current: contextvars.ContextVar[RequestMetrics | None] = contextvars.ContextVar(
+    "dynamodb_metrics", default=None
+)
+
+
+def enabled() -> bool:
+    return DYNAMODB_METRICS_ENABLED
+
+
+@contextlib.contextmanager
+def record() -> Iterator[RequestMetrics]:
+    """with ブロック内 (と引き継いだスレッド) の DynamoDB 呼び出しを計測する"""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def propagate_context(fn: Callable[..., T]) -> Callable[..., T]:
+    """呼び出し元の contextvars (計測中のリクエスト) をワーカースレッドへ引き継ぐ
+
+    1 つの Context は同時に 1 スレッドでしか実行できないため、呼び出しごとに複製する。
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def call(*args: Any, **kwargs: Any) -> T:
+        return context.copy().run(fn, *args, **kwargs)
+
+    return call
+
+
+def register_hooks(events: Any) -> None:
+    """クライアントのイベントに計測用のフックを登録する (重複登録は無視される)"""
+    for event, handler in (
+        ("before-parameter-build.dynamodb", _request_capacity),
+        ("before-call.dynamodb", _before_call),
+        ("after-call.dynamodb", _after_call),
+        ("after-call-error.dynamodb", _after_call),
+    ):
+        events.register(event, handler, unique_id=f"{__name__}.{event}")
+
+
+def _request_capacity(params: dict, model: Any, **kwargs: Any) -> None:
+    if _current.get() is not None and "ReturnConsumedCapacity" in (
+        model.input_shape.members
+    ):
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+
+def _before_call(model: Any, context: dict, **kwargs: Any) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        context["dynamodb_metrics"] = (metrics, model.name, time.perf_counter())
+
+
+def _after_call(context: dict, parsed: dict | None = None, **kwargs: Any) -> None:
+    started = context.pop("dynamodb_metrics", None)
+    if started is None:
+        return
+    metrics, operation, start = started
+    metrics.record(operation, time.perf_counter() - start, _capacity(parsed or {}))
+
+
+def _capacity(parsed: dict) -> float:
+    # 単一アイテムの操作は dict、Batch* / Transact* はテーブルごとの list
+    consumed = parsed.get("ConsumedCapacity") or []
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return float(sum(entry.get("CapacityUnits", 0) for entry in consumed))
+
+
+def server_timing(metrics: RequestMetrics, seconds: float) -> str:
+    total = metrics.total()
+    return (
+        f'dynamodb;dur={total.seconds * 1000:.2f};desc="{total.calls} calls, '
+        f'{total.capacity:g} CU", app;dur={seconds * 1000:.2f}'
+    )
+
+
+def emf_record(
+    route: str, status: int, seconds: float, metrics: RequestMetrics
+) -> dict[str, Any]:
+    """CloudWatch Embedded Metric Format の 1 行分 (ルートをディメンションにする)"""
+    total = metrics.total()
+    return {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": DYNAMODB_METRICS_NAMESPACE,
+                    "Dimensions": [["Route"]],
+                    "Metrics": [
+                        {"Name": "Latency", "Unit": "Milliseconds"},
+                        {"Name": "DynamoDBCalls", "Unit": "Count"},
+                        {"Name": "DynamoDBLatency", "Unit": "Milliseconds"},
+                        {"Name": "DynamoDBConsumedCapacity", "Unit": "None"},
+                    ],
+                }
+            ],
+        },
+        "Route": route,
+        "StatusCode": status,
+        "Latency": round(seconds * 1000, 3),
+        "DynamoDBCalls": total.calls,
+        "DynamoDBLatency": round(total.seconds * 1000, 3),
+        "DynamoDBConsumedCapacity": total.capacity,
+        "DynamoDBOperations": {
+            operation: op.calls for operation, op in metrics.operations.items()
+        },
+    }
+
+
+class _Registry:
+    """GET /metrics 用のプロセス内の累計"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.requests: dict[tuple[str, str], int] = defaultdict(int)
+        self.request_seconds: dict[str, float] = defaultdict(float)
+        self.request_count: dict[str, int] = defaultdict(int)
+        self.operations: dict[tuple[str, str], OperationMetrics] = defaultdict(
+            OperationMetrics
+        )
+
+    def observe(
+        self, route: str, status: int, seconds: float, metrics: RequestMetrics
+    ) -> None:
+        with self._lock:
+            self.requests[route, str(status)] += 1
+            self.request_seconds[route] += seconds
+            self.request_count[route] += 1
+            for operation, op in metrics.operations.items():
+                self.operations[route, operation].add(op)
+
+    def prometheus_text(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            _family(lines, "http_requests_total", "counter", "HTTP requests")
+            for (route, status), count in sorted(self.requests.items()):
+                lines.append(
+                    _sample("http_requests_total", count, route, status=status)
+                )
+            _family(
+                lines, "http_request_duration_seconds", "summary", "Request latency"
+            )
+            for route, total in sorted(self.request_seconds.items()):
+                name = "http_request_duration_seconds"
+                lines.append(_sample(f"{name}_sum", total, route))
+                lines.append(_sample(f"{name}_count", self.request_count[route], route))
+            for name, help_text, value in (
+                ("dynamodb_calls_total", "DynamoDB API calls", "calls"),
+                (
+                    "dynamodb_call_duration_seconds_total",
+                    "Time spent in DynamoDB API calls",
+                    "seconds",
+                ),
+                (
+                    "dynamodb_consumed_capacity_total",
+                    "DynamoDB consumed capacity units",
+                    "capacity",
+                ),
+            ):
+                _family(lines, name, "counter", help_text)
+                for (route, operation), op in sorted(self.operations.items()):
+                    lines.append(
+                        _sample(name, getattr(op, value), route, operation=operation)
+                    )
+        return "\n".join(lines) + "\n"
+
+
+def _family(lines: list[str], name: str, kind: str, help_text: str) -> None:
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def _sample(name: str, value: float, route: str, **labels: str) -> str:
+    escaped = {"route": route, **labels}
+    text = ",".join(f'{key}="{_escape(label)}"' for key, label in escaped.items())
+    return f"{name}{{{text}}} {value:g}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = _Registry()
+
+
+def route_name(scope: "Scope") -> str:
+    # ラベルの種類が増えすぎないよう、実際のパスではなくルートのパターンを使う
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return f"{scope['method']} {path}" if path else _UNMATCHED_ROUTE
+
+
+class DynamoDBMetricsMiddleware:
+    """リクエストごとの DynamoDB 呼び出しを計測して出力する ASGI ミドルウェア"""
+
+    def __init__(self, app: "ASGIApp"):
+        self.app = app
+
+    async def __call__(self, scope: "Scope", receive: "Receive", send: "Send") -> None:
+        if scope["type"] != "http" or not enabled():
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        with record() as metrics:
+
+            async def send_with_timing(message: "Message") -> None:
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    timing = server_timing(metrics, time.perf_counter() - start)
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", timing.encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                emit(route_name(scope), status, time.perf_counter() - start, metrics)
+
+
+def emit(route: str, status: int, seconds: float, metrics: RequestMetrics) -> None:
+    """1 リクエスト分の計測結果を EMF のログ・GET /metrics の累計に出力する"""
+    if DYNAMODB_METRICS_EMF_ENABLED:
+        # Lambda では標準出力の JSON 行を CloudWatch Logs が EMF として取り込む
+        print(json.dumps(emf_record(route, status, seconds, metrics)), flush=True)
+    if DYNAMODB_METRICS_ENDPOINT_ENABLED:
+        registry.observe(route, status, seconds, metrics)
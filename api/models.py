@@ -1,17 +1,175 @@
 import os
+import threading
+import unicodedata
 import uuid
+import zlib
 from datetime import datetime
 from datetime import timezone
 from decimal import Decimal
+from decimal import DecimalException
+from typing import Any
+from typing import Literal
+from typing import cast
 
+from boto3.dynamodb.conditions import ConditionBase
+from boto3.dynamodb.types import DYNAMODB_CONTEXT
+from botocore.config import Config
 from dyntastic import Dyntastic
+from dyntastic import Index
 from pydantic import BaseModel
 from pydantic import ConfigDict
 from pydantic import Field
+from pydantic import computed_field
 from pydantic import field_serializer
+from pydantic import field_validator
 
+from api import metrics
+from api.codec import item_codec
 
-class Product(Dyntastic):
+# 単一商品取得のプロセス内キャッシュ (件数上限 0 で無効)
+PRODUCT_CACHE_MAX_SIZE = int(os.getenv("PRODUCT_CACHE_MAX_SIZE", "0"))
+PRODUCT_CACHE_TTL_SECONDS = float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "30"))
+# 異なる商品の同時取得を BatchGetItem にまとめる待ち時間 (0 で無効)
+PRODUCT_READ_BATCH_WINDOW_MS = float(os.getenv("PRODUCT_READ_BATCH_WINDOW_MS", "0"))
+# 商品数・価格の集計値を書き込みと同じトランザクションで更新する (GET /products/stats)
+PRODUCT_STATS_ENABLED = os.getenv("PRODUCT_STATS_ENABLED", "false").lower() == "true"
+# 一覧・価格帯検索・新着順をプロセス内の列指向スナップショットから返す
+PRODUCT_SNAPSHOT_ENABLED = (
+    os.getenv("PRODUCT_SNAPSHOT_ENABLED", "false").lower() == "true"
+)
+# 新しく作成された商品を取り込む間隔と、テーブル全体を読み直す間隔
+PRODUCT_SNAPSHOT_REFRESH_SECONDS = float(
+    os.getenv("PRODUCT_SNAPSHOT_REFRESH_SECONDS", "30")
+)
+PRODUCT_SNAPSHOT_REBUILD_SECONDS = float(
+    os.getenv("PRODUCT_SNAPSHOT_REBUILD_SECONDS", "300")
+)
+# DynamoDB 呼び出しに使うスレッド数の上限
+DYNAMODB_MAX_CONCURRENCY = int(os.getenv("DYNAMODB_MAX_CONCURRENCY", "64"))
+# 1 リクエスト内で並列に発行する呼び出し (shard ごとの Query など) のスレッド数
+DYNAMODB_FANOUT_CONCURRENCY = int(os.getenv("DYNAMODB_FANOUT_CONCURRENCY", "32"))
+
+# コンテナ内で使い回す DynamoDB クライアントの設定
+# Lambda の実行時間内に収まるよう、botocore 既定 (60 秒) より短いタイムアウトにする
+DYNAMODB_CLIENT_CONFIG = Config(
+    connect_timeout=float(os.getenv("DYNAMODB_CONNECT_TIMEOUT_SECONDS", "2")),
+    read_timeout=float(os.getenv("DYNAMODB_READ_TIMEOUT_SECONDS", "5")),
+    # 並列呼び出し用のスレッドも同時に接続を使うため、その分も確保する
+    max_pool_connections=DYNAMODB_MAX_CONCURRENCY + DYNAMODB_FANOUT_CONCURRENCY,
+    tcp_keepalive=True,
+    retries={
+        "mode": "standard",
+        "max_attempts": int(os.getenv("DYNAMODB_MAX_ATTEMPTS", "3")),
+    },
+)
+
+# version 属性を持たない (導入前に作成された) 商品も、この版として扱う
+PRODUCT_INITIAL_VERSION = 1
+
+# 検索用 GSI のパーティションキー (shard) の数
+# 書き込みが GSI の 1 パーティションに集中しないよう product_id から分散させる。
+# 変更する場合は既存アイテムの shard を書き直す必要がある
+PRODUCT_INDEX_SHARDS = 8
+# 価格帯検索用 (shard ごとに price の昇順)
+PRICE_INDEX = Index("shard", "price", index_name="price-index")
+# 名前の前方一致検索用 (shard ごとに正規化した名前の昇順)
+NAME_INDEX = Index("shard", "name_key", index_name="name-index")
+# 新着順の一覧用 (shard ごとに UTC に揃えた作成日時の順)
+CREATED_INDEX = Index("shard", "created_key", index_name="created-index")
+PRODUCT_INDEXES = (PRICE_INDEX, NAME_INDEX, CREATED_INDEX)
+
+# キー・GSI のキーになる属性の型
+_KEY_ATTRIBUTE_TYPES = {
+    "product_id": "S",
+    "shard": "N",
+    "price": "N",
+    "name_key": "S",
+    "created_key": "S",
+}
+
+_boto3_lock = threading.Lock()
+
+
+def product_shard(product_id: str) -> int:
+    """商品の shard (product_id だけで決まるため更新しても変わらない)"""
+    return zlib.crc32(product_id.encode()) % PRODUCT_INDEX_SHARDS
+
+
+def created_at_key(created_at: datetime) -> str:
+    """作成日時を文字列の順序で比較できる形にする (UTC・マイクロ秒まで固定長)"""
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def normalize_name(name: str) -> str:
+    """前方一致検索用に名前を正規化する (全角・半角と大文字・小文字を区別しない)"""
+    return unicodedata.normalize("NFKC", name).strip().casefold()
+
+
+def is_dynamodb_number(value: Decimal) -> bool:
+    """DynamoDB の数値 (38 桁・指数 -130 〜 125) として送れる値か"""
+    try:
+        DYNAMODB_CONTEXT.create_decimal(value)
+    except DecimalException:
+        return False
+    return True
+
+
+def _check_price(price: Decimal | None) -> Decimal | None:
+    # 価格は DynamoDB に数値型で保存するため、表せない値は検証エラーにする
+    if price is not None and not is_dynamodb_number(price):
+        raise ValueError("price is out of range")
+    return price
+
+
+class _DynamoDBClientMixin:
+    """DynamoDB クライアントの設定と生成を Dyntastic のモデル間で共通化する"""
+
+    @classmethod
+    def _dynamodb_boto3_kwargs(cls):
+        kwargs = super()._dynamodb_boto3_kwargs()  # type: ignore[misc]
+        return {**kwargs, "config": DYNAMODB_CLIENT_CONFIG}
+
+    @classmethod
+    def _dynamodb_resource(cls):
+        # 初回生成はスレッド間で競合し得るため、生成時だけロックして 1 つだけ作る
+        if cls._dynamodb_resource_instance is None:  # type: ignore
+            with _boto3_lock:
+                resource = super()._dynamodb_resource()  # type: ignore[misc]
+                metrics.register_hooks(resource.meta.client.meta.events)
+                return resource
+        return cls._dynamodb_resource_instance  # type: ignore
+
+    @classmethod
+    def _dynamodb_client(cls):
+        if cls._dynamodb_client_instance is None:  # type: ignore
+            with _boto3_lock:
+                client = super()._dynamodb_client()  # type: ignore[misc]
+                metrics.register_hooks(client.meta.events)
+                return client
+        return cls._dynamodb_client_instance  # type: ignore
+
+    @classmethod
+    def _dyntastic_load_model(cls, item: dict, load_full_item: bool = False):
+        # 自テーブルのアイテムは書き込み時に検証済みのため、検証せずにモデルにする
+        # (GSI の射影などで必須の属性が欠けている場合は dyntastic の処理に任せる)
+        codec = item_codec(cls)  # type: ignore[type-var]
+        model = None if load_full_item else codec.from_item(item)
+        if model is None:
+            return super()._dyntastic_load_model(  # type: ignore[misc]
+                item, load_full_item
+            )
+        return model
+
+    def save(self, *, condition: ConditionBase | None = None):
+        item = item_codec(type(self)).to_item(self)  # type: ignore[type-var]
+        return self._dyntastic_call(  # type: ignore[attr-defined]
+            "put_item", Item=item, ConditionExpression=condition
+        )
+
+
+class Product(_DynamoDBClientMixin, Dyntastic):
     __table_name__ = os.getenv("DYNAMODB_PRODUCT_TABLE_NAME", "products")
     __hash_key__ = "product_id"
     __table_host__ = os.getenv("DYNAMODB_ENDPOINT_URL", "http://dynamodb-local:8000")
@@ -26,10 +184,60 @@ class Product(Dyntastic):
     description: str | None = None
     price: Decimal
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # 更新ごとに 1 ずつ増える版 (ETag・楽観的排他制御に使う。サーバー側で管理する)
+    version: int = PRODUCT_INITIAL_VERSION
+
+    # 以下は GSI のキーとしてアイテムに書き込む属性 (レスポンスには含めない)
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def shard(self) -> int:
+        return product_shard(self.product_id)
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def name_key(self) -> str | None:
+        # 空文字は GSI のキーにできないため、属性を書き込まずインデックスから外す
+        return normalize_name(self.name) or None
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def created_key(self) -> str:
+        # created_at はタイムゾーンが混在し得るため、並べ替え用に UTC に揃える
+        return created_at_key(self.created_at)
+
+    @classmethod
+    def table_definition(cls) -> dict[str, Any]:
+        """create_table の引数 (TableName 以外。scripts/init-dynamodb.sh と同じ定義)"""
+        attributes = {cls.__hash_key__}
+        indexes = []
+        for index in PRODUCT_INDEXES:
+            attributes |= {index.hash_key, cast(str, index.range_key)}
+            indexes.append(
+                {
+                    "IndexName": index.index_name,
+                    "KeySchema": [
+                        {"AttributeName": index.hash_key, "KeyType": "HASH"},
+                        {"AttributeName": index.range_key, "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": index.projection},
+                }
+            )
+        return {
+            "KeySchema": [{"AttributeName": cls.__hash_key__, "KeyType": "HASH"}],
+            "AttributeDefinitions": [
+                {"AttributeName": name, "AttributeType": _KEY_ATTRIBUTE_TYPES[name]}
+                for name in sorted(attributes)
+            ],
+            "GlobalSecondaryIndexes": indexes,
+            "BillingMode": "PAY_PER_REQUEST",
+        }
 
-    @field_serializer("price", mode="plain")
+    validate_price = field_validator("price")(_check_price)
+
+    @field_serializer("price", mode="plain", when_used="json")
     def serialize_price(self, v: Decimal) -> str:
-        # Decimal を文字列に変換
+        # JSON では Decimal を文字列に変換
+        # (DynamoDB には数値型で保存し、価格の GSI の範囲キーとして使う)
         return str(v)
 
     @field_serializer("created_at", mode="plain")
@@ -38,11 +246,36 @@ class Product(Dyntastic):
         return v.isoformat()
 
 
+class ProductStats(_DynamoDBClientMixin, Dyntastic):
+    """商品数・価格合計のカウンタ (商品の shard ごとに 1 アイテム)"""
+
+    __table_name__ = os.getenv("DYNAMODB_PRODUCT_STATS_TABLE_NAME", "product-stats")
+    __hash_key__ = "shard"
+    __table_host__ = os.getenv("DYNAMODB_ENDPOINT_URL", "http://dynamodb-local:8000")
+
+    shard: int
+    product_count: int = 0
+    price_total: Decimal = Decimal(0)
+
+    @classmethod
+    def table_definition(cls) -> dict[str, Any]:
+        """create_table の引数 (TableName 以外。scripts/init-dynamodb.sh と同じ定義)"""
+        return {
+            "KeySchema": [{"AttributeName": cls.__hash_key__, "KeyType": "HASH"}],
+            "AttributeDefinitions": [
+                {"AttributeName": cls.__hash_key__, "AttributeType": "N"}
+            ],
+            "BillingMode": "PAY_PER_REQUEST",
+        }
+
+
 class ProductUpdate(BaseModel):
     name: str | None = None
     description: str | None = None
     price: Decimal | None = None
 
+    validate_price = field_validator("price")(_check_price)
+
 
 class ProductResponse(BaseModel):
     product_id: str
@@ -50,3 +283,25 @@ class ProductResponse(BaseModel):
     description: str | None = None
     price: Decimal
     created_at: datetime
+
+
+class ProductStatsResponse(BaseModel):
+    product_count: int
+    price_total: Decimal
+    # 商品がなければ None
+    price_average: Decimal | None = None
+
+
+class ProductBatchResult(BaseModel):
+    # リクエスト内での位置 (0 始まり)
+    index: int
+    product_id: str | None = None
+    status: Literal["created", "conflict", "invalid"]
+    detail: str | None = None
+
+
+class ProductLookup(BaseModel):
+    # 複数取得の結果 (見つからない場合は found=False, product=None)
+    product_id: str
+    found: bool
+    product: ProductResponse | None = None
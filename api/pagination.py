@@ -0,0 +1,81 @@
+import base64
+import binascii
+import json
+from collections.abc import Iterator
+
+from boto3.dynamodb.types import TypeDeserializer
+from boto3.dynamodb.types import TypeSerializer
+
+from api.models import Product
+from api.serialization import dump_ndjson
+
+# 1 ページあたりの件数 (DynamoDB の Limit に渡す)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+class InvalidCursorError(ValueError):
+    """クライアントから渡されたカーソルが不正な場合の例外"""
+
+
+def encode_cursor(last_evaluated_key: dict | None) -> str | None:
+    """LastEvaluatedKey を不透明なカーソル文字列に変換する"""
+    if not last_evaluated_key:
+        return None
+    # Decimal などを JSON 化できるよう DynamoDB の型付き表現にしてからエンコード
+    wire = {k: _serializer.serialize(v) for k, v in last_evaluated_key.items()}
+    raw = json.dumps(wire, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> dict | None:
+    """カーソル文字列を ExclusiveStartKey に戻す"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        wire = json.loads(base64.urlsafe_b64decode(padded))
+        key = {k: _deserializer.deserialize(v) for k, v in wire.items()}
+    except (binascii.Error, ValueError, TypeError, AttributeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+    return key or None
+
+
+def decode_scan_cursor(cursor: str | None) -> dict | None:
+    """一覧 (Scan) のカーソルを ExclusiveStartKey に戻す
+
+    テーブルのキー (product_id の文字列) だけからなる場合のみ受け付ける
+    (他の属性を含むと DynamoDB が ValidationException を返すため)。
+    """
+    key = decode_cursor(cursor)
+    if key is None:
+        return None
+    hash_key = Product.__hash_key__
+    if set(key) != {hash_key} or not isinstance(key[hash_key], str):
+        raise InvalidCursorError("Invalid cursor")
+    return key
+
+
+def iter_product_pages(
+    per_page: int, last_evaluated_key: dict | None = None
+) -> Iterator[list[Product]]:
+    """Scan をページ単位で遅延実行し、1 ページずつ返す"""
+    while True:
+        page = Product.scan_page(
+            per_page=per_page, last_evaluated_key=last_evaluated_key
+        )
+        yield page.items
+        if not page.has_more:
+            break
+        last_evaluated_key = page.last_evaluated_key
+
+
+def iter_ndjson(pages: Iterator[list[Product]]) -> Iterator[bytes]:
+    """ページのイテレータを NDJSON の行に変換する (メモリ使用量は 1 ページ分)"""
+    for items in pages:
+        if not items:
+            continue
+        yield dump_ndjson(items)
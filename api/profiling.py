@@ -0,0 +1,184 @@
+"""リクエスト単位のサンプリングプロファイラ
+
+PROFILING_ENABLED が有効な場合、PROFILING_SAMPLE_RATE の割合のリクエストと
+X-Profile: 1 ヘッダーを付けたリクエストを計測する。計測中は専用のスレッドが
+PROFILING_INTERVAL_MS ごとに全スレッドのスタックを記録し、レスポンスの後に
+collapsed stack 形式 ("スレッド;モジュール:関数;... 回数" の行) で
+PROFILING_OUTPUT_DIR に書き出す。flamegraph.pl・speedscope・inferno で
+そのままフレームグラフにできる。
+レスポンスの X-Profile-Id ヘッダーがファイル名の先頭になる。
+
+cProfile は有効にしたスレッドしか記録しないが、各エンドポイントは DynamoDB の呼び出しを
+スレッドプールで実行するため、全スレッドのスタックを見るサンプリング方式にしている。
+仕事を待っているだけのスレッドは除くが、同時に処理中の他のリクエストのスタックは含まれる
+(Lambda では 1 コンテナが同時に 1 リクエストしか処理しないため混ざらない)。
+無効な場合の負担はフラグの確認だけ。
+"""
+
+import contextlib
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Iterator
+from types import FrameType
+from typing import TYPE_CHECKING
+
+from api.metrics import route_name
+
+if TYPE_CHECKING:
+    from starlette.types import ASGIApp
+    from starlette.types import Message
+    from starlette.types import Receive
+    from starlette.types import Scope
+    from starlette.types import Send
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+# ヘッダーなしで計測するリクエストの割合 (0 ならヘッダーを付けたものだけ)
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_OUTPUT_DIR = os.getenv(
+    "PROFILING_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "profiles")
+)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "x-profile-id"
+
+# 仕事を待っているスレッドの (モジュール, 関数)。threading の待機を除いた末端と比べる
+_IDLE_FRAMES = {
+    ("concurrent.futures.thread", "_worker"),
+    ("queue", "get"),
+    ("selectors", "select"),
+}
+
+
+def enabled() -> bool:
+    return PROFILING_ENABLED
+
+
+def should_profile(header: str | None) -> bool:
+    """このリクエストを計測するか (X-Profile ヘッダーの値を渡す)"""
+    if not enabled():
+        return False
+    if header is not None and header.strip().lower() in ("1", "true"):
+        return True
+    return random.random() < PROFILING_SAMPLE_RATE  # nosec B311
+
+
+class Sampler:
+    """一定間隔で全スレッドのスタックを数える"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profiling-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self._thread.ident:
+                continue
+            stack = _stack(frame)
+            if stack is not None:
+                self.stacks[";".join([names.get(ident, str(ident)), *stack])] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    def _run(self) -> None:
+        # 間隔より短いリクエストも記録されるよう、開始直後に 1 回取る
+        self.sample()
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+def _stack(frame: FrameType | None) -> list[str] | None:
+    """根元から末端への "モジュール:関数" のリスト (待機中のスレッドは None)"""
+    frames = []
+    while frame is not None:
+        frames.append((frame.f_globals.get("__name__", "?"), frame.f_code))
+        frame = frame.f_back
+    busy = [(module, code) for module, code in frames if module != "threading"]
+    if busy and (busy[0][0], busy[0][1].co_name) in _IDLE_FRAMES:
+        return None
+    return [f"{module}:{code.co_qualname}" for module, code in reversed(frames)]
+
+
+class Profile:
+    def __init__(self, route: str):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.route = route
+        self.path: str | None = None
+
+
+@contextlib.contextmanager
+def profile(route: str = "") -> Iterator[Profile]:
+    """with ブロックの間の全スレッドをサンプリングし、終了時にファイルへ書き出す
+
+    ルートが後で決まる場合は、yield された Profile の route を書き換える。
+    """
+    result = Profile(route)
+    sampler = Sampler(PROFILING_INTERVAL_MS / 1000)
+    sampler.start()
+    try:
+        yield result
+    finally:
+        sampler.stop()
+        result.path = _write(result, sampler)
+
+
+def _write(result: Profile, sampler: Sampler) -> str:
+    os.makedirs(PROFILING_OUTPUT_DIR, exist_ok=True)
+    route = re.sub(r"[^0-9A-Za-z]+", "_", result.route).strip("_")
+    path = os.path.join(PROFILING_OUTPUT_DIR, f"{result.id}-{route}.folded")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(sampler.collapsed())
+    return path
+
+
+class ProfilingMiddleware:
+    """計測対象のリクエストをサンプリングする ASGI ミドルウェア"""
+
+    def __init__(self, app: "ASGIApp"):
+        self.app = app
+
+    async def __call__(self, scope: "Scope", receive: "Receive", send: "Send") -> None:
+        if scope["type"] != "http" or not enabled():
+            await self.app(scope, receive, send)
+            return
+        header = dict(scope["headers"]).get(PROFILE_HEADER.encode())
+        if not should_profile(header.decode("latin-1") if header else None):
+            await self.app(scope, receive, send)
+            return
+
+        with profile() as result:
+
+            async def send_with_id(message: "Message") -> None:
+                if message["type"] == "http.response.start":
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (PROFILE_ID_HEADER.encode(), result.id.encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                result.route = route_name(scope)
@@ -0,0 +1,86 @@
+"""?fields= による疎なフィールド選択
+
+指定されたフィールドだけを DynamoDB の ProjectionExpression で読み出し、
+ProductResponse の該当フィールドだけを持つレスポンスモデルで返す。
+レスポンスモデルはフィールドの組み合わせごとに 1 度だけ作成してキャッシュする。
+"""
+
+import functools
+from typing import Any
+
+from pydantic import BaseModel
+from pydantic import TypeAdapter
+from pydantic import create_model
+
+from api.models import Product
+from api.models import ProductResponse
+
+PRODUCT_FIELDS = tuple(ProductResponse.model_fields)
+
+
+class InvalidFieldsError(ValueError):
+    """存在しないフィールドが指定された場合の例外"""
+
+
+def parse_fields(values: list[str] | None) -> tuple[str, ...] | None:
+    """?fields=name,price (または繰り返し指定) をフィールドの組に正規化する
+
+    ハッシュキー (product_id) は常に含め、並びは ProductResponse の定義順に揃える。
+    指定がなければ None (全フィールド) を返す。
+    """
+    if not values:
+        return None
+    requested = {part.strip() for value in values for part in value.split(",")}
+    requested.discard("")
+    unknown = requested.difference(PRODUCT_FIELDS)
+    if unknown:
+        raise InvalidFieldsError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.add(Product.__hash_key__)
+    return tuple(field for field in PRODUCT_FIELDS if field in requested)
+
+
+@functools.cache
+def projection(fields: tuple[str, ...]) -> dict[str, Any]:
+    """GetItem / Scan に渡す ProjectionExpression (name などの予約語は #名前 で参照)
+
+    ETag を計算できるよう version と created_at も読み出す (指定がなければ
+    レスポンスには含めない)。
+    """
+    attributes = tuple(dict.fromkeys((*fields, "version", "created_at")))
+    return {
+        "ProjectionExpression": ", ".join(f"#{name}" for name in attributes),
+        "ExpressionAttributeNames": {f"#{name}": name for name in attributes},
+    }
+
+
+@functools.cache
+def response_model(fields: tuple[str, ...]) -> type[BaseModel]:
+    """ProductResponse から指定フィールドだけを持つモデルを作る"""
+    definitions: dict[str, Any] = {
+        name: (info.annotation, info)
+        for name, info in ProductResponse.model_fields.items()
+        if name in fields
+    }
+    return create_model(f"ProductResponse_{'_'.join(fields)}", **definitions)
+
+
+@functools.cache
+def _item_adapter(fields: tuple[str, ...]) -> TypeAdapter:
+    return TypeAdapter(response_model(fields))
+
+
+@functools.cache
+def _items_adapter(fields: tuple[str, ...]) -> TypeAdapter:
+    return TypeAdapter(list[response_model(fields)])  # type: ignore[arg-type,misc]
+
+
+def dump_item(fields: tuple[str, ...], item: dict[str, Any]) -> bytes:
+    """射影したアイテム (または商品の属性) を JSON オブジェクトにする"""
+    adapter = _item_adapter(fields)
+    return adapter.dump_json(adapter.validate_python(item))
+
+
+def dump_items(fields: tuple[str, ...], items: list[dict[str, Any]]) -> bytes:
+    """射影したアイテムの列を JSON 配列にする"""
+    adapter = _items_adapter(fields)
+    return adapter.dump_json(adapter.validate_python(items))
@@ -0,0 +1,411 @@
+import functools
+import operator
+from collections.abc import Callable
+from decimal import Decimal
+from typing import Any
+
+from botocore.exceptions import ClientError
+from dyntastic import A
+from dyntastic.attr import serialize
+from dyntastic.attr import translate_updates
+from dyntastic.exceptions import DoesNotExist
+from dyntastic.main import ResultPage
+
+from api import batch
+from api import stats
+from api.cache import product_cache
+from api.coalesce import BatchLoader
+from api.coalesce import SingleFlight
+from api.errors import ProductAlreadyExists
+from api.errors import VersionMismatch
+from api.errors import is_conditional_check_failed
+from api.etag import ItemVersion
+from api.fanout import fan_out
+from api.models import PRODUCT_INITIAL_VERSION
+from api.models import PRODUCT_READ_BATCH_WINDOW_MS
+from api.models import Product
+from api.models import ProductLookup
+from api.models import ProductResponse
+from api.models import normalize_name
+from api.projection import projection
+from api.scan import scan_segments
+from api.snapshot import product_snapshot
+
+# 各操作は DynamoDB への 1 回の往復で完結させる (事前の Get は行わない)
+# ただし集計が有効な場合の価格の更新と削除は、差分を求めるため現在の価格を読む
+
+# BatchGetItem で 1 回に取得できるキー数の上限
+BATCH_GET_MAX_KEYS = 100
+# 複数取得で一度に指定できる ID 数の上限
+MAX_LOOKUP_IDS = 500
+# 読んでから書くまでに商品が変わった場合に読み直す回数の上限
+_MAX_OPTIMISTIC_ATTEMPTS = 5
+
+
+def _key(product_id: str) -> dict:
+    return {Product.__hash_key__: product_id}
+
+
+def _batch_get(product_ids: list[str]) -> dict[str, Product]:
+    return {product.product_id: product for product in Product.batch_get(product_ids)}
+
+
+# 同一商品の同時取得は 1 回の GetItem を共有する
+product_reads: SingleFlight[str, Product] = SingleFlight()
+# 異なる商品の同時取得は時間窓内で 1 回の BatchGetItem にまとめる
+product_loader: BatchLoader[str, Product] = BatchLoader(
+    _batch_get,
+    window_seconds=PRODUCT_READ_BATCH_WINDOW_MS / 1000,
+    max_batch_size=BATCH_GET_MAX_KEYS,
+)
+
+
+def create_product(product: Product) -> Product:
+    """未存在を条件に商品を書き込む。既存なら ProductAlreadyExists"""
+    product.version = PRODUCT_INITIAL_VERSION
+    save = functools.partial(product.save, condition=A.product_id.not_exists())
+    try:
+        if stats.enabled():
+            # 商品数・価格合計のカウンタも同じトランザクションで増やす
+            stats.transact(save, stats.deltas([(product.product_id, 1, product.price)]))
+        else:
+            save()
+    except ClientError as e:
+        if is_conditional_check_failed(e):
+            raise ProductAlreadyExists(product.product_id) from e
+        raise
+    product_cache.invalidate(product.product_id)
+    product_reads.forget(product.product_id)
+    product_snapshot.apply(product)
+    return product
+
+
+def get_product(product_id: str) -> Product:
+    """商品を取得する (キャッシュ優先)。存在しなければ DoesNotExist"""
+    product = product_cache.get(product_id)
+    if product is None:
+        generation = product_cache.generation(product_id)
+        product = product_reads.do(product_id, lambda: _load_product(product_id))
+        product_cache.set(product_id, product, since=generation)
+    return product
+
+
+def _load_product(product_id: str) -> Product:
+    if not product_loader.enabled:
+        return Product.get(product_id)
+    product = product_loader.load(product_id)
+    if product is None:
+        raise DoesNotExist
+    return product
+
+
+def get_product_fields(product_id: str, fields: tuple[str, ...]) -> dict[str, Any]:
+    """指定フィールドだけを射影して取得する。存在しなければ DoesNotExist
+
+    商品全体がキャッシュにあればそこから返す (射影した結果はキャッシュしない)。
+    """
+    product = product_cache.get(product_id)
+    if product is not None:
+        return vars(product)
+    response = Product._dyntastic_call(
+        "get_item", Key=_key(product_id), **projection(fields)
+    )
+    item = response.get("Item")
+    if item is None:
+        raise DoesNotExist
+    return item
+
+
+def get_products(product_ids: list[str]) -> list[Product | None]:
+    """複数の商品をリクエスト順に取得する。見つからない商品は None
+
+    キャッシュにない ID を 100 件ずつの BatchGetItem に分けて並列に取得する。
+    UnprocessedKeys は Product.batch_get がバックオフ付きで再送する。
+    """
+    found: dict[str, Product] = {}
+    missing: dict[str, int] = {}
+    for product_id in dict.fromkeys(product_ids):
+        product = product_cache.get(product_id)
+        if product is None:
+            missing[product_id] = product_cache.generation(product_id)
+        else:
+            found[product_id] = product
+
+    missing_ids = list(missing)
+    chunks = [
+        missing_ids[i : i + BATCH_GET_MAX_KEYS]
+        for i in range(0, len(missing_ids), BATCH_GET_MAX_KEYS)
+    ]
+    for products in fan_out(_batch_get, chunks):
+        found.update(products)
+        for product_id, product in products.items():
+            product_cache.set(product_id, product, since=missing[product_id])
+    return [found.get(product_id) for product_id in product_ids]
+
+
+def lookup_products(product_ids: list[str]) -> list[ProductLookup]:
+    """複数取得の結果をリクエスト順に、見つかったかどうかと合わせて返す"""
+    products = get_products(product_ids)
+    return [
+        ProductLookup(
+            product_id=product_id,
+            found=product is not None,
+            product=(
+                ProductResponse.model_validate(product, from_attributes=True)
+                if product is not None
+                else None
+            ),
+        )
+        for product_id, product in zip(product_ids, products, strict=True)
+    ]
+
+
+def update_product(
+    product_id: str,
+    changes: dict[str, Any],
+    expected_versions: list[ItemVersion] | None = None,
+) -> Product:
+    """存在を条件に属性を更新し、更新後の商品を返す。存在しなければ DoesNotExist
+
+    ReturnValues=ALL_NEW で更新後のアイテムを受け取るため、再取得は不要。
+    expected_versions を指定すると現在の版がそのいずれかの場合だけ更新し、
+    一致しなければ VersionMismatch を送出する (If-Match による楽観的排他制御)。
+    """
+    update = _update_expression(changes)
+    if stats.enabled() and changes.get("price") is not None:
+        return _update_price_with_stats(product_id, changes, update, expected_versions)
+
+    condition = A.product_id.exists()
+    if expected_versions is not None:
+        condition &= _expected_condition(expected_versions)
+    try:
+        response = Product._dyntastic_call(
+            "update_item",
+            Key=_key(product_id),
+            ConditionExpression=condition,
+            ReturnValues="ALL_NEW",
+            # 条件に失敗した場合に既存のアイテムを返させ、404 と 412 を区別する
+            ReturnValuesOnConditionCheckFailure=(
+                "ALL_OLD" if expected_versions is not None else None
+            ),
+            **update,
+        )
+    except ClientError as e:
+        if not is_conditional_check_failed(e):
+            raise
+        product_cache.invalidate(product_id)
+        product_reads.forget(product_id)
+        if "Item" in e.response:
+            raise VersionMismatch(product_id) from e
+        raise DoesNotExist from e
+    product = Product._dyntastic_load_model(response["Attributes"])
+    product_cache.set(product_id, product)
+    product_reads.forget(product_id)
+    product_snapshot.apply(product)
+    return product
+
+
+def _update_expression(changes: dict[str, Any]) -> dict[str, Any]:
+    actions = [A(name).set(value) for name, value in changes.items()]
+    # 名前を変える場合は名前の GSI のキーも合わせて更新する
+    name_key = normalize_name(changes["name"] or "") if "name" in changes else None
+    if name_key:
+        actions.append(A.name_key.set(name_key))
+    update = serialize(translate_updates(*actions))
+    # 版を 1 つ進める (version を持たない既存の商品は初期版として扱う)
+    update["UpdateExpression"] += (
+        ", #version = if_not_exists(#version, :initial_version) + :version_step"
+    )
+    update["ExpressionAttributeNames"]["#version"] = "version"
+    update["ExpressionAttributeValues"] |= {
+        ":initial_version": PRODUCT_INITIAL_VERSION,
+        ":version_step": 1,
+    }
+    if name_key == "":
+        # 空の名前は GSI のキーにできないため、名前の GSI から外す
+        update["UpdateExpression"] += " REMOVE #name_key"
+        update["ExpressionAttributeNames"]["#name_key"] = "name_key"
+    return update
+
+
+def _update_price_with_stats(
+    product_id: str,
+    changes: dict[str, Any],
+    update: dict[str, Any],
+    expected_versions: list[ItemVersion] | None,
+) -> Product:
+    """現在の価格との差分を、版を条件にした更新と同じトランザクションで集計に加える
+
+    トランザクションでは更新後の値を受け取れないため、読んだアイテムに変更を適用して返す
+    (版を条件にしているので、読んでから書くまでに他の書き込みはない)。
+    """
+
+    def write(current: dict[str, Any]) -> None:
+        version = _item_version(current)
+        if expected_versions is not None and not _matches(current, expected_versions):
+            raise VersionMismatch(product_id)
+        price_delta = Decimal(changes["price"]) - Decimal(str(current["price"]))
+        stats.transact(
+            functools.partial(
+                Product._dyntastic_call,
+                "update_item",
+                Key=_key(product_id),
+                ConditionExpression=_current_condition(version),
+                **update,
+            ),
+            stats.deltas([(product_id, 0, price_delta)]),
+        )
+
+    try:
+        current = _write_current_item(product_id, write)
+    except (DoesNotExist, VersionMismatch):
+        product_cache.invalidate(product_id)
+        product_reads.forget(product_id)
+        raise
+    version = _item_version(current) + 1
+    product = Product._dyntastic_load_model({**current, **changes, "version": version})
+    product_cache.set(product_id, product)
+    product_reads.forget(product_id)
+    product_snapshot.apply(product)
+    return product
+
+
+def _write_current_item(
+    product_id: str, write: Callable[[dict[str, Any]], None]
+) -> dict[str, Any]:
+    """現在のアイテムを強い整合性で読み、write(item) で書き込む
+
+    存在しなければ DoesNotExist。write の条件 (読んだ版との一致) に失敗した場合は
+    読み直してやり直す。
+    """
+    for _ in range(_MAX_OPTIMISTIC_ATTEMPTS):
+        response = Product._dyntastic_call(
+            "get_item", Key=_key(product_id), ConsistentRead=True
+        )
+        current = response.get("Item")
+        if current is None:
+            raise DoesNotExist
+        try:
+            write(current)
+        except ClientError as e:
+            if is_conditional_check_failed(e):
+                continue
+            raise
+        return current
+    raise RuntimeError(
+        f"Product {product_id} changed during {_MAX_OPTIMISTIC_ATTEMPTS} attempts"
+    )
+
+
+def _item_version(item: dict[str, Any]) -> int:
+    return int(item.get("version", PRODUCT_INITIAL_VERSION))
+
+
+def _version_condition(versions: list[int]):
+    condition = A.version.is_in(versions)
+    if PRODUCT_INITIAL_VERSION in versions:
+        condition |= A.version.not_exists()
+    return condition
+
+
+def _current_condition(version: int):
+    """読んだ版のアイテムが今も存在する条件
+
+    version を持たない商品は削除後も初期版の条件に一致するため、存在も条件に加える。
+    """
+    return A.product_id.exists() & _version_condition([version])
+
+
+def _expected_condition(expected_versions: list[ItemVersion]):
+    """If-Match のいずれかの版に一致する条件
+
+    created_key を持たない (作成日時の GSI の導入前に作成された) 商品は
+    version だけで比べる。
+    """
+    return functools.reduce(
+        operator.or_,
+        (
+            _version_condition([version])
+            & ((A.created_key == created_key) | A.created_key.not_exists())
+            for created_key, version in expected_versions
+        ),
+    )
+
+
+def _matches(item: dict[str, Any], expected_versions: list[ItemVersion]) -> bool:
+    """_expected_condition と同じ判定を読み出したアイテムに対して行う"""
+    version = _item_version(item)
+    created_key = item.get("created_key")
+    return any(
+        version == expected.version and created_key in (None, expected.created_key)
+        for expected in expected_versions
+    )
+
+
+def delete_product(product_id: str) -> None:
+    """存在を条件に商品を削除する。存在しなければ DoesNotExist"""
+    try:
+        if stats.enabled():
+            _write_current_item(product_id, _delete_with_stats)
+        else:
+            Product._dyntastic_call(
+                "delete_item",
+                Key=_key(product_id),
+                ConditionExpression=A.product_id.exists(),
+            )
+    except ClientError as e:
+        if is_conditional_check_failed(e):
+            raise DoesNotExist from e
+        raise
+    finally:
+        product_cache.invalidate(product_id)
+        product_reads.forget(product_id)
+    product_snapshot.discard(product_id)
+
+
+def _delete_with_stats(current: dict[str, Any]) -> None:
+    """読んだ版を条件に削除し、同じトランザクションで商品数・価格合計を減らす"""
+    product_id = current[Product.__hash_key__]
+    price = Decimal(str(current["price"]))
+    stats.transact(
+        functools.partial(
+            Product._dyntastic_call,
+            "delete_item",
+            Key=_key(product_id),
+            ConditionExpression=_current_condition(_item_version(current)),
+        ),
+        stats.deltas([(product_id, -1, -price)]),
+    )
+
+
+def scan_page(
+    per_page: int, last_evaluated_key: dict | None = None
+) -> ResultPage[Product]:
+    """Scan を 1 ページ分だけ実行する"""
+    return Product.scan_page(per_page=per_page, last_evaluated_key=last_evaluated_key)
+
+
+def scan_page_fields(
+    per_page: int, last_evaluated_key: dict | None, fields: tuple[str, ...]
+) -> tuple[list[dict[str, Any]], dict | None]:
+    """指定フィールドだけを射影して Scan を 1 ページ分実行する"""
+    response = Product._dyntastic_call(
+        "scan",
+        Limit=per_page,
+        ExclusiveStartKey=last_evaluated_key,
+        **projection(fields),
+    )
+    return response.get("Items", []), response.get("LastEvaluatedKey")
+
+
+def clear_products() -> int:
+    """全商品を削除し、削除件数を返す"""
+    # キーのみを並列 Scan し、BatchWriteItem でまとめて削除
+    pages = scan_segments(ProjectionExpression="product_id")
+    deleted = batch.batch_delete(item for items in pages for item in items)
+    product_cache.clear()
+    product_reads.clear()
+    product_snapshot.clear()
+    if stats.enabled():
+        stats.rebuild()
+    return deleted
@@ -0,0 +1,245 @@
+"""商品のルートの処理 (FastAPI のアプリと API Gateway の直接アダプタで共有する)
+
+リクエストの解析と検証は呼び出し側で行い、ここでは検証済みの値を受け取って
+ステータスコード・ヘッダー・シリアライズ済みの本文を返す。repository を同期的に
+呼び出すため、FastAPI からは async_repository.run でスレッドプール上で実行する。
+API Gateway のアダプタから使うため FastAPI には依存しない。
+"""
+
+import functools
+import json
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from typing import Any
+
+from dyntastic.exceptions import DoesNotExist
+from pydantic import TypeAdapter
+
+from api import repository
+from api.errors import ProductAlreadyExists
+from api.errors import VersionMismatch
+from api.etag import InvalidETagError
+from api.etag import collection_etag
+from api.etag import item_etag
+from api.etag import none_match
+from api.etag import parse_if_match
+from api.models import PRODUCT_INITIAL_VERSION
+from api.models import Product
+from api.models import ProductLookup
+from api.models import ProductUpdate
+from api.pagination import InvalidCursorError
+from api.pagination import decode_scan_cursor
+from api.pagination import encode_cursor
+from api.projection import InvalidFieldsError
+from api.projection import dump_item
+from api.projection import dump_items
+from api.projection import parse_fields
+from api.repository import MAX_LOOKUP_IDS
+from api.serialization import dump_product
+from api.serialization import dump_products
+from api.snapshot import product_snapshot
+
+_JSON_CONTENT_TYPE = ("content-type", "application/json")
+
+_lookup_adapter = TypeAdapter(list[ProductLookup])
+
+
+@dataclass
+class RouteResponse:
+    status_code: int
+    headers: list[tuple[str, str]] = field(default_factory=list)
+    body: bytes = b""
+
+
+class HTTPError(Exception):
+    """FastAPI の HTTPException と同じ形式 ({"detail": ...}) で返すエラー"""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def error_response(error: HTTPError) -> RouteResponse:
+    # ctx に含まれる例外などは FastAPI と同様に文字列化する
+    content = json.dumps({"detail": error.detail}, default=str).encode()
+    return json_response(content, status_code=error.status_code)
+
+
+def json_response(
+    content: bytes,
+    headers: list[tuple[str, str]] | None = None,
+    status_code: int = 200,
+) -> RouteResponse:
+    # 検証済みの Product をシリアライズ済みのまま返す (response_model の再検証を省く)
+    return RouteResponse(status_code, [_JSON_CONTENT_TYPE, *(headers or [])], content)
+
+
+def conditional_response(
+    etag: str,
+    if_none_match: str | None,
+    dump: Callable[[], bytes],
+    headers: list[tuple[str, str]] | None = None,
+) -> RouteResponse:
+    headers = [*(headers or []), ("etag", etag)]
+    if none_match(if_none_match, etag):
+        # 変更がなければ本体をシリアライズせずに 304 Not Modified を返す
+        return RouteResponse(304, headers)
+    return json_response(dump(), headers)
+
+
+def product_page(
+    products: list[Product], next_cursor: str | None, if_none_match: str | None
+) -> RouteResponse:
+    """商品の 1 ページ分 (続きがあれば次ページのカーソルをヘッダーで返す)"""
+    headers = [("x-next-cursor", next_cursor)] if next_cursor else []
+    etags = [(product.product_id, _product_etag(product)) for product in products]
+    etag = collection_etag(etags, next_cursor)
+    dump = functools.partial(dump_products, products)
+    return conditional_response(etag, if_none_match, dump, headers)
+
+
+def select_fields(values: list[str] | None) -> tuple[str, ...] | None:
+    try:
+        return parse_fields(values)
+    except InvalidFieldsError as e:
+        raise HTTPError(400, str(e)) from e
+
+
+def start_key(cursor: str | None) -> dict | None:
+    """一覧のカーソルを Scan の再開位置に戻す"""
+    try:
+        return decode_scan_cursor(cursor)
+    except InvalidCursorError as e:
+        raise HTTPError(400, "Invalid cursor") from e
+
+
+def _product_etag(product: Product) -> str:
+    return item_etag(product.created_at, product.version)
+
+
+def _item_etag(item: dict) -> str:
+    # 射影したアイテムの created_at は文字列、キャッシュした商品の属性では datetime
+    created_at = item["created_at"]
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    return item_etag(created_at, int(item.get("version", PRODUCT_INITIAL_VERSION)))
+
+
+def create_product(product: Product) -> RouteResponse:
+    try:
+        # 未存在を条件に新しい商品を作成 (重複チェックと書き込みを 1 回の往復で行う)
+        created = repository.create_product(product)
+    except ProductAlreadyExists as e:
+        # 重複時は 409 Conflict
+        raise HTTPError(409, "Product already exists") from e
+    return json_response(dump_product(created), [("etag", _product_etag(created))])
+
+
+def list_products(
+    limit: int,
+    cursor: str | None,
+    ids: list[str] | None,
+    fields: list[str] | None,
+    if_none_match: str | None,
+) -> RouteResponse:
+    """1 ページ分の一覧、または ids 指定時は複数取得 (ストリーミングは含まない)"""
+    selected = select_fields(fields)
+    if ids:
+        if selected:
+            # フィールドの射影は 1 ページ単位の一覧と単一取得のみ対応
+            raise HTTPError(400, "fields cannot be combined with ids or stream")
+        # ?ids=a,b,c (または ids の繰り返し) 指定時は複数取得
+        return lookup_products(ids)
+
+    if selected:
+        # 指定フィールドだけを ProjectionExpression で読み出す
+        items, last_evaluated_key = repository.scan_page_fields(
+            limit, start_key(cursor), selected
+        )
+        next_cursor = encode_cursor(last_evaluated_key)
+        etags = [(item["product_id"], _item_etag(item)) for item in items]
+        dump = functools.partial(dump_items, selected, items)
+    else:
+        snapshot = product_snapshot.current()
+        if snapshot is not None:
+            # スナップショットが読み込み済みなら DynamoDB を読まない (product_id 順)
+            # カーソルは Scan のものと形式が異なり、互いの続きには使えない
+            try:
+                products, next_cursor = snapshot.list_page(limit, cursor)
+            except InvalidCursorError as e:
+                raise HTTPError(400, "Invalid cursor") from e
+        else:
+            # DynamoDB の Scan API を 1 ページ分だけ実行
+            page = repository.scan_page(limit, start_key(cursor))
+            products = page.items
+            next_cursor = encode_cursor(page.last_evaluated_key)
+        etags = [(product.product_id, _product_etag(product)) for product in products]
+        dump = functools.partial(dump_products, products)
+
+    headers = []
+    if next_cursor:
+        # 続きがある場合は次ページのカーソルをヘッダーで返す
+        headers.append(("x-next-cursor", next_cursor))
+    etag = collection_etag(etags, next_cursor, ",".join(selected or ()))
+    return conditional_response(etag, if_none_match, dump, headers)
+
+
+def lookup_products(ids: list[str]) -> RouteResponse:
+    product_ids = [part for value in ids for part in value.split(",") if part]
+    if len(product_ids) > MAX_LOOKUP_IDS:
+        raise HTTPError(400, f"Too many ids (max {MAX_LOOKUP_IDS})")
+    results = repository.lookup_products(product_ids)
+    return json_response(_lookup_adapter.dump_json(results))
+
+
+def read_product(
+    product_id: str, fields: list[str] | None, if_none_match: str | None
+) -> RouteResponse:
+    selected = select_fields(fields)
+    try:
+        if selected:
+            # 指定フィールドだけを ProjectionExpression で読み出す
+            item = repository.get_product_fields(product_id, selected)
+            etag = _item_etag(item)
+            dump = functools.partial(dump_item, selected, item)
+        else:
+            product = repository.get_product(product_id)
+            etag = _product_etag(product)
+            dump = functools.partial(dump_product, product)
+    except DoesNotExist as e:
+        raise HTTPError(404, "Product not found") from e
+    return conditional_response(etag, if_none_match, dump)
+
+
+def update_product(
+    product_id: str, update: ProductUpdate, if_match: str | None
+) -> RouteResponse:
+    # 部分更新: 明示的に設定されたフィールドのみ取得
+    changes = update.model_dump(exclude_unset=True)
+
+    # フィールドが指定されていなければエラー
+    if not changes:
+        raise HTTPError(400, "No fields to update")
+
+    try:
+        # If-Match 指定時は版の一致も条件に加える (楽観的排他制御)
+        expected_versions = parse_if_match(if_match)
+        # 存在を条件に 1 回の UpdateItem で更新し、更新後の値をそのまま返す
+        updated = repository.update_product(product_id, changes, expected_versions)
+    except DoesNotExist as e:
+        raise HTTPError(404, "Product not found") from e
+    except (InvalidETagError, VersionMismatch) as e:
+        raise HTTPError(412, "Precondition failed") from e
+    return json_response(dump_product(updated), [("etag", _product_etag(updated))])
+
+
+def delete_product(product_id: str) -> RouteResponse:
+    try:
+        # 存在を条件に 1 回の DeleteItem で削除
+        repository.delete_product(product_id)
+    except DoesNotExist as e:
+        raise HTTPError(404, "Product not found") from e
+    return RouteResponse(204)
@@ -0,0 +1,134 @@
+import os
+import queue
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from api.metrics import propagate_context
+from api.models import Product
+
+# 並列 Scan のセグメント数 (DynamoDB の TotalSegments)
+DEFAULT_SCAN_SEGMENTS = int(os.getenv("DYNAMODB_SCAN_SEGMENTS", "4"))
+MAX_SCAN_SEGMENTS = 64
+
+# セグメントのワーカーが先読みしておけるページ数の上限
+_PREFETCH_PAGES_PER_SEGMENT = 2
+_QUEUE_POLL_SECONDS = 0.1
+
+_DONE = object()
+
+
+def _scan_segment(
+    segment: int,
+    total_segments: int,
+    per_page: int | None,
+    scan_kwargs: dict[str, Any],
+) -> Iterator[list[dict]]:
+    """1 セグメント分の Scan をページ単位で順に実行する"""
+    last_evaluated_key = None
+    while True:
+        response = Product._dyntastic_call(
+            "scan",
+            Segment=segment if total_segments > 1 else None,
+            TotalSegments=total_segments if total_segments > 1 else None,
+            Limit=per_page,
+            ExclusiveStartKey=last_evaluated_key,
+            **scan_kwargs,
+        )
+        yield response.get("Items", [])
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if not last_evaluated_key:
+            break
+
+
+def _put(pages: queue.Queue, value: object, stop: threading.Event) -> bool:
+    """消費側が止まっていれば諦めつつ、キューが空くまで待って投入する"""
+    while not stop.is_set():
+        try:
+            pages.put(value, timeout=_QUEUE_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _segment_worker(
+    segment: int,
+    total_segments: int,
+    per_page: int | None,
+    scan_kwargs: dict[str, Any],
+    pages: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    try:
+        for items in _scan_segment(segment, total_segments, per_page, scan_kwargs):
+            if not _put(pages, items, stop):
+                return
+    except Exception as e:  # 消費側で再送出する
+        _put(pages, e, stop)
+    finally:
+        _put(pages, _DONE, stop)
+
+
+def scan_segments(
+    total_segments: int = DEFAULT_SCAN_SEGMENTS,
+    *,
+    per_page: int | None = None,
+    max_workers: int | None = None,
+    **scan_kwargs: Any,
+) -> Iterator[list[dict]]:
+    """Segment/TotalSegments でテーブル全体を並列 Scan し、生アイテムをページで返す
+
+    各セグメントはスレッドプール上で並行に読み進め、到着順にページを流す。
+    キューは有界なので、消費が遅い場合でも保持するのは数ページ分だけになる。
+    scan_kwargs (ProjectionExpression など) はそのまま Scan API に渡す。
+    """
+    if total_segments <= 1:
+        yield from _scan_segment(0, 1, per_page, scan_kwargs)
+        return
+
+    pages: queue.Queue = queue.Queue(
+        maxsize=total_segments * _PREFETCH_PAGES_PER_SEGMENT
+    )
+    stop = threading.Event()
+    workers = min(max_workers or total_segments, total_segments)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    worker = propagate_context(_segment_worker)
+    for segment in range(total_segments):
+        executor.submit(
+            worker,
+            segment,
+            total_segments,
+            per_page,
+            scan_kwargs,
+            pages,
+            stop,
+        )
+    try:
+        remaining = total_segments
+        while remaining:
+            value = pages.get()
+            if value is _DONE:
+                remaining -= 1
+            elif isinstance(value, Exception):
+                raise value
+            else:
+                yield value  # type: ignore[misc]
+    finally:
+        # 途中で打ち切られた場合もワーカーを止めてから抜ける
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def scan_products(
+    total_segments: int = DEFAULT_SCAN_SEGMENTS,
+    *,
+    per_page: int | None = None,
+    max_workers: int | None = None,
+) -> Iterator[list[Product]]:
+    """並列 Scan の結果を Product のページとして返す"""
+    for items in scan_segments(
+        total_segments, per_page=per_page, max_workers=max_workers
+    ):
+        yield [Product._dyntastic_load_model(item) for item in items]
@@ -0,0 +1,191 @@
+"""GSI を使った商品の検索 (価格帯・名前の前方一致) と新着順の一覧
+
+GSI のパーティションキーは shard (PRODUCT_INDEX_SHARDS 個) なので、全 shard を
+並列に Query し、範囲キーの順にマージして 1 ページ分を返す。
+カーソルには shard ごとの再開位置 (ExclusiveStartKey) を持たせる。
+"""
+
+import heapq
+import itertools
+from collections import Counter
+from decimal import Decimal
+from typing import Any
+from typing import cast
+
+from boto3.dynamodb.conditions import ConditionBase
+from boto3.dynamodb.conditions import Key
+from dyntastic import Index
+
+from api.fanout import fan_out
+from api.models import CREATED_INDEX
+from api.models import NAME_INDEX
+from api.models import PRICE_INDEX
+from api.models import PRODUCT_INDEX_SHARDS
+from api.models import Product
+from api.models import is_dynamodb_number
+from api.models import normalize_name
+from api.pagination import InvalidCursorError
+from api.pagination import decode_cursor
+from api.pagination import encode_cursor
+
+# shard ごとの再開位置 (未読の shard は None、読み終えた shard は含めない)
+ShardPositions = dict[int, dict | None]
+
+
+class InvalidSearchError(ValueError):
+    """検索条件が不正な場合の例外"""
+
+
+def search_products(
+    *,
+    min_price: Decimal | None = None,
+    max_price: Decimal | None = None,
+    name_prefix: str | None = None,
+    limit: int,
+    cursor: str | None = None,
+) -> tuple[list[Product], str | None]:
+    """条件に合う商品を 1 ページ分と次ページのカーソルを返す
+
+    name_prefix 指定時は名前の GSI を前方一致で Query し (価格は絞り込み条件)、
+    名前順に返す。それ以外は価格の GSI を価格帯で Query し、価格順に返す。
+    """
+    check_price_range(min_price, max_price)
+    price = _price_condition(min_price, max_price)
+    if name_prefix is None:
+        index, key_condition, filter_condition = PRICE_INDEX, price, None
+    else:
+        prefix = normalize_name(name_prefix)
+        if not prefix:
+            raise InvalidSearchError("name_prefix must not be blank")
+        key_condition = Key(NAME_INDEX.range_key).begins_with(prefix)
+        index, filter_condition = NAME_INDEX, price
+
+    positions = decode_positions(cursor, index)
+    items, positions = query_shards(
+        index, key_condition, limit, positions, filter_condition=filter_condition
+    )
+    products = [Product._dyntastic_load_model(item) for item in items]
+    return products, encode_positions(positions)
+
+
+def latest_products(
+    *, limit: int, cursor: str | None = None
+) -> tuple[list[Product], str | None]:
+    """作成日時の新しい順に 1 ページ分と次ページのカーソルを返す"""
+    positions = decode_positions(cursor, CREATED_INDEX)
+    items, positions = query_shards(
+        CREATED_INDEX, None, limit, positions, ascending=False
+    )
+    products = [Product._dyntastic_load_model(item) for item in items]
+    return products, encode_positions(positions)
+
+
+def check_price_range(min_price: Decimal | None, max_price: Decimal | None) -> None:
+    for name, price in (("min_price", min_price), ("max_price", max_price)):
+        if price is not None and not is_dynamodb_number(price):
+            raise InvalidSearchError(f"{name} is out of range")
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise InvalidSearchError("min_price must not exceed max_price")
+
+
+def _price_condition(
+    min_price: Decimal | None, max_price: Decimal | None
+) -> ConditionBase | None:
+    price = Key(PRICE_INDEX.range_key)
+    if min_price is not None and max_price is not None:
+        return price.between(min_price, max_price)
+    if min_price is not None:
+        return price.gte(min_price)
+    if max_price is not None:
+        return price.lte(max_price)
+    return None
+
+
+def query_shards(
+    index: Index,
+    range_condition: ConditionBase | None,
+    limit: int,
+    positions: ShardPositions | None = None,
+    *,
+    filter_condition: ConditionBase | None = None,
+    ascending: bool = True,
+) -> tuple[list[dict[str, Any]], ShardPositions]:
+    """全 shard を並列に Query し、範囲キーの順にマージした先頭 limit 件を返す
+
+    各 shard から最大 limit 件ずつ読み、使わなかった分は次ページで読み直す。
+    戻り値の再開位置が空なら全 shard を読み終えている。
+    """
+    if positions is None:
+        positions = dict.fromkeys(range(PRODUCT_INDEX_SHARDS))
+    # 検索に使う GSI はすべて範囲キーを持つ
+    range_key = cast(str, index.range_key)
+
+    def query(shard: int) -> tuple[list[dict[str, Any]], dict | None]:
+        key_condition = Key(index.hash_key).eq(shard)
+        if range_condition is not None:
+            key_condition &= range_condition
+        response = Product._dyntastic_call(
+            "query",
+            IndexName=index.index_name,
+            KeyConditionExpression=key_condition,
+            FilterExpression=filter_condition,
+            Limit=limit,
+            ExclusiveStartKey=positions[shard],
+            ScanIndexForward=ascending,
+        )
+        return response.get("Items", []), response.get("LastEvaluatedKey")
+
+    shards = sorted(positions)
+    if not shards:
+        return [], {}
+    results = dict(zip(shards, fan_out(query, shards), strict=True))
+
+    merged = heapq.merge(
+        *(zip(itertools.repeat(shard), items) for shard, (items, _) in results.items()),
+        key=lambda entry: entry[1][range_key],
+        reverse=not ascending,
+    )
+    page = list(itertools.islice(merged, limit))
+    consumed = Counter(shard for shard, _ in page)
+    last_consumed = dict(page)
+
+    next_positions: ShardPositions = {}
+    for shard, (items, last_evaluated_key) in results.items():
+        if consumed[shard] == len(items):
+            # 読んだ分を使い切った shard は Query の続きから (続きがなければ完了)
+            if last_evaluated_key:
+                next_positions[shard] = last_evaluated_key
+        elif shard in last_consumed:
+            next_positions[shard] = _index_key(index, last_consumed[shard])
+        else:
+            next_positions[shard] = positions[shard]
+    return [item for _, item in page], next_positions
+
+
+def _key_names(index: Index) -> set[str]:
+    # GSI の ExclusiveStartKey にはテーブルのキーと GSI のキーが必要
+    return {cast(str, Product.__hash_key__), index.hash_key, cast(str, index.range_key)}
+
+
+def _index_key(index: Index, item: dict[str, Any]) -> dict[str, Any]:
+    return {name: item[name] for name in _key_names(index)}
+
+
+def encode_positions(positions: ShardPositions) -> str | None:
+    return encode_cursor({str(shard): key for shard, key in positions.items()})
+
+
+def decode_positions(cursor: str | None, index: Index) -> ShardPositions | None:
+    decoded = decode_cursor(cursor)
+    if decoded is None:
+        return None
+    names = _key_names(index)
+    positions: ShardPositions = {}
+    for shard, key in decoded.items():
+        # 別の検索 (GSI) のカーソルや改ざんされたカーソルは受け付けない
+        if not shard.isdigit() or int(shard) >= PRODUCT_INDEX_SHARDS:
+            raise InvalidCursorError("Invalid cursor")
+        if key is not None and (not isinstance(key, dict) or set(key) != names):
+            raise InvalidCursorError("Invalid cursor")
+        positions[int(shard)] = key
+    return positions
@@ -0,0 +1,51 @@
+"""商品レスポンスの高速シリアライズ
+
+自テーブルから読んだ Product は読み込み時に検証済みのため、ProductResponse への
+再検証を行わず、Product のフィールド値を pydantic-core で JSON バイト列に直接変換する。
+Product の field_serializer (Python 関数) も経由しないため、件数の多い一覧で効く。
+出力は ProductResponse.model_dump_json() と同じ。
+"""
+
+from collections.abc import Iterable
+from datetime import datetime
+from decimal import Decimal
+from typing import TypedDict
+
+from pydantic import TypeAdapter
+
+from api.models import Product
+
+
+class _ProductFields(TypedDict):
+    # ProductResponse と同じフィールド・型 (余分な属性は出力しない)
+    product_id: str
+    name: str
+    description: str | None
+    price: Decimal
+    created_at: datetime
+
+
+_product_adapter = TypeAdapter(_ProductFields)
+_products_adapter = TypeAdapter(list[_ProductFields])
+
+
+def dump_product(product: Product) -> bytes:
+    """1 件を JSON オブジェクトにする"""
+    return _product_adapter.dump_json(vars(product))  # type: ignore[arg-type]
+
+
+def dump_products(products: Iterable[Product]) -> bytes:
+    """複数件を JSON 配列にする"""
+    fields = [vars(product) for product in products]
+    return _products_adapter.dump_json(fields)  # type: ignore[arg-type]
+
+
+def dump_ndjson(products: Iterable[Product]) -> bytes:
+    """複数件を NDJSON (1 行 1 件) にする"""
+    return b"".join(dump_product(product) + b"\n" for product in products)
+
+
+def jsonable_products(products: Iterable[Product]) -> list[dict]:
+    """複数件を JSON と同じ表現 (価格・日時は文字列) の dict にする"""
+    fields = [vars(product) for product in products]
+    return _products_adapter.dump_python(fields, mode="json")  # type: ignore[arg-type]
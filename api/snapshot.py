@@ -0,0 +1,561 @@
+"""一覧・価格帯検索・新着順のためのプロセス内の列指向スナップショット
+
+読み取りの多いカタログの閲覧向けに、商品テーブル全体を Product のリストではなく
+型付きの配列 (array) の列で保持する。
+- 文字列 (product_id・名前・説明) は UTF-8 の連結バイト列と各行の終端オフセット
+- 価格は PRICE_DECIMALS 桁の固定小数点の整数と、表記を復元するための指数
+- 作成日時は UTC のエポックマイクロ秒と UTC オフセット (秒)
+並び順 (product_id 順・価格順・作成日時の新しい順) は行番号の配列で持ち、
+価格帯の範囲とページの開始位置は二分探索 (bisect) で求める。
+Product はレスポンスにするページ分だけ組み立てる。
+
+価格帯検索・新着順のカーソルは GSI を読む場合と同じ形式 (shard ごとの再開位置) にし、
+読み込みの前後やコンテナ間で持ち越しても使えるようにする。
+一覧は Scan (ハッシュ順) ではなく product_id 順になるため、カーソルは Scan の
+LastEvaluatedKey と別の形式にし、互いのカーソルは不正なカーソルとして扱う。
+
+更新はバックグラウンドのスレッドで行う。PRODUCT_SNAPSHOT_REFRESH_SECONDS ごとに
+作成日時の GSI から新しく作成された商品だけを取り込み、
+PRODUCT_SNAPSHOT_REBUILD_SECONDS ごとにテーブル全体を並列 Scan で読み直す
+(他のコンテナでの更新・削除はこの読み直しで反映される)。
+このプロセスでの作成・更新・削除は、その場でスナップショットにも反映する。
+"""
+
+import bisect
+import functools
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Callable
+from collections.abc import Iterable
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from decimal import ROUND_CEILING
+from decimal import ROUND_FLOOR
+from decimal import Decimal
+from decimal import InvalidOperation
+from typing import Any
+from typing import cast
+
+from boto3.dynamodb.conditions import Key
+from dyntastic import Index
+
+from api import models
+from api.codec import item_codec
+from api.models import CREATED_INDEX
+from api.models import PRICE_INDEX
+from api.models import PRODUCT_INDEX_SHARDS
+from api.models import Product
+from api.models import created_at_key
+from api.models import product_shard
+from api.pagination import InvalidCursorError
+from api.pagination import decode_cursor
+from api.pagination import encode_cursor
+from api.scan import scan_segments
+from api.search import ShardPositions
+from api.search import check_price_range
+from api.search import decode_positions
+from api.search import encode_positions
+from api.search import query_shards
+
+# 価格の固定小数点の桁数 (これより細かい価格の商品があるとスナップショットを使わない)
+PRICE_DECIMALS = 6
+# 新しく作成された商品を取り込む際の shard ごとの Query の件数
+_CATCH_UP_PAGE_SIZE = 1000
+_INT64_MAX = 2**63 - 1
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# タイムゾーンなしの作成日時の UTC オフセット (並べ替えでは UTC とみなす)
+_NAIVE = -(2**31)
+# 一覧のカーソルに持たせる直前の product_id のキー (Scan のカーソルと区別する)
+_LIST_CURSOR_KEY = "snapshot_after"
+
+_codec = item_codec(Product)
+
+
+class UnsupportedValueError(ValueError):
+    """列に格納できない値 (桁数の多い価格など) の場合の例外"""
+
+
+def enabled() -> bool:
+    return models.PRODUCT_SNAPSHOT_ENABLED
+
+
+def _fixed_price(price: Decimal) -> tuple[int, int]:
+    """価格を固定小数点の整数と元の指数にする"""
+    exponent = price.as_tuple().exponent
+    if not isinstance(exponent, int) or not -PRICE_DECIMALS <= exponent <= 127:
+        raise UnsupportedValueError(f"Unsupported price: {price}")
+    value = int(price.scaleb(PRICE_DECIMALS))
+    if abs(value) > _INT64_MAX:
+        raise UnsupportedValueError(f"Unsupported price: {price}")
+    return value, exponent
+
+
+def _price(value: int, exponent: int) -> Decimal:
+    # 元の指数で組み立て、保存された値と同じ表記 ("1.5"・"10" など) に戻す
+    return Decimal(value // 10 ** (PRICE_DECIMALS + exponent)).scaleb(exponent)
+
+
+def _price_bound(price: Decimal, rounding: str) -> int:
+    return int(price.scaleb(PRICE_DECIMALS).to_integral_value(rounding=rounding))
+
+
+def _epoch(created_at: datetime) -> tuple[int, int]:
+    """作成日時をエポックマイクロ秒と UTC オフセット (秒) にする"""
+    offset = created_at.utcoffset()
+    if offset is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    delta = created_at - _EPOCH
+    micros = (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return micros, _NAIVE if offset is None else offset // timedelta(seconds=1)
+
+
+def _datetime(micros: int, offset: int = 0) -> datetime:
+    created_at = _EPOCH + timedelta(microseconds=micros)
+    if offset == _NAIVE:
+        return created_at.replace(tzinfo=None)
+    return created_at.astimezone(timezone(timedelta(seconds=offset)))
+
+
+class _Strings:
+    """UTF-8 の連結バイト列と各行の終端オフセットで持つ文字列の列"""
+
+    def __init__(self) -> None:
+        self._data = bytearray()
+        self._ends = array("q")
+        # None の行 (説明なし) は 1
+        self._nulls = bytearray()
+
+    def append(self, value: str | None) -> None:
+        if value is not None:
+            self._data += value.encode()
+        self._ends.append(len(self._data))
+        self._nulls.append(value is None)
+
+    def key(self, row: int) -> bytes:
+        # UTF-8 のバイト列の順序は str・DynamoDB の文字列の順序と一致する
+        start = self._ends[row - 1] if row else 0
+        return bytes(memoryview(self._data)[start : self._ends[row]])
+
+    def __getitem__(self, row: int) -> str | None:
+        return None if self._nulls[row] else self.key(row).decode()
+
+    def nbytes(self) -> int:
+        return sum(map(sys.getsizeof, (self._data, self._ends, self._nulls)))
+
+
+class ProductSnapshot:
+    """商品テーブルの列指向のスナップショット (スレッドセーフ)
+
+    行は追加のみで、更新・削除された商品の行は並び順から外す
+    (領域はテーブル全体を読み直すまで残る)。
+    """
+
+    def __init__(self, products: Iterable[Product] = ()):
+        self._lock = threading.RLock()
+        self._ids = _Strings()
+        self._names = _Strings()
+        self._descriptions = _Strings()
+        self._prices = array("q")
+        self._price_exponents = array("b")
+        self._created = array("q")
+        self._offsets = array("i")
+        self._versions = array("q")
+        self._shards = array("B")
+        for product in products:
+            self._append(product)
+        rows = range(len(self._prices))
+        self._by_id = array("I", sorted(rows, key=self._ids.key))
+        self._by_price = array("I", sorted(rows, key=self._price_key))
+        self._by_created = array("I", sorted(rows, key=self._created_key))
+
+    @classmethod
+    def scan(cls) -> "ProductSnapshot":
+        """テーブル全体を並列 Scan して作る (Product はページごとに列に移して捨てる)"""
+        items = (item for page in scan_segments() for item in page)
+        return cls(filter(None, map(_codec.from_item, items)))
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def memory_bytes(self) -> int:
+        """列と並び順が確保しているバイト数"""
+        strings = (self._ids, self._names, self._descriptions)
+        arrays = (
+            self._prices,
+            self._price_exponents,
+            self._created,
+            self._offsets,
+            self._versions,
+            self._shards,
+            self._by_id,
+            self._by_price,
+            self._by_created,
+        )
+        return sum(column.nbytes() for column in strings) + sum(
+            map(sys.getsizeof, arrays)
+        )
+
+    def watermark(self) -> str | None:
+        """最も新しい作成日時 (作成日時の GSI の範囲キーの形式)"""
+        with self._lock:
+            if not self._by_created:
+                return None
+            return created_at_key(_datetime(self._created[self._by_created[0]]))
+
+    def apply(self, product: Product) -> None:
+        """作成・更新された商品を反映する (より新しい版を反映済みなら何もしない)"""
+        # 格納できない値は並び順を変える前に検出する
+        _fixed_price(product.price)
+        with self._lock:
+            row = self._find(product.product_id)
+            if row is not None:
+                if self._versions[row] > product.version:
+                    return
+                self._remove(row)
+            row = self._append(product)
+            for order, key in self._orders():
+                bisect.insort(order, row, key=key)
+
+    def apply_item(self, item: dict[str, Any]) -> None:
+        product = _codec.from_item(item)
+        if product is not None:
+            self.apply(product)
+
+    def discard(self, product_id: str) -> None:
+        """削除された商品を並び順から外す"""
+        with self._lock:
+            row = self._find(product_id)
+            if row is not None:
+                self._remove(row)
+
+    def clear(self) -> None:
+        with self._lock:
+            for order, _ in self._orders():
+                del order[:]
+
+    def list_page(
+        self, limit: int, cursor: str | None = None
+    ) -> tuple[list[Product], str | None]:
+        """product_id 順に 1 ページ分と、次ページのカーソルを返す"""
+        after = _list_after(cursor)
+        with self._lock:
+            order = self._by_id
+            start = 0
+            if after is not None:
+                start = bisect.bisect_right(order, after, key=self._ids.key)
+            products = [self._product(row) for row in order[start : start + limit]]
+            more = start + limit < len(order)
+        if not more:
+            return products, None
+        return products, encode_cursor({_LIST_CURSOR_KEY: products[-1].product_id})
+
+    def search(
+        self,
+        *,
+        min_price: Decimal | None = None,
+        max_price: Decimal | None = None,
+        limit: int,
+        cursor: str | None = None,
+    ) -> tuple[list[Product], str | None]:
+        """価格帯の検索 (api.search.search_products の name_prefix なしと同じ形式)"""
+        check_price_range(min_price, max_price)
+        positions = decode_positions(cursor, PRICE_INDEX)
+        with self._lock:
+            order = self._by_price
+            start, stop = 0, len(order)
+            if min_price is not None:
+                low = (_price_bound(min_price, ROUND_CEILING), b"")
+                start = bisect.bisect_left(order, low, key=self._price_key)
+            if max_price is not None:
+                high = (_price_bound(max_price, ROUND_FLOOR) + 1, b"")
+                stop = bisect.bisect_left(order, high, key=self._price_key)
+            return self._shard_page(PRICE_INDEX, order, start, stop, limit, positions)
+
+    def latest(
+        self, *, limit: int, cursor: str | None = None
+    ) -> tuple[list[Product], str | None]:
+        """作成日時の新しい順 (api.search.latest_products と同じ形式)"""
+        positions = decode_positions(cursor, CREATED_INDEX)
+        with self._lock:
+            order = self._by_created
+            return self._shard_page(
+                CREATED_INDEX, order, 0, len(order), limit, positions
+            )
+
+    def _shard_page(
+        self,
+        index: Index,
+        order: array,
+        start: int,
+        stop: int,
+        limit: int,
+        positions: ShardPositions | None,
+    ) -> tuple[list[Product], str | None]:
+        """order[start:stop] のうち、shard ごとの再開位置より後の行を limit 件返す
+
+        再開位置は api.search.query_shards と同じ意味 (未読の shard は None、
+        読み終えた shard は含めない) で、GSI を読んで返したカーソルも受け付ける。
+        """
+        if positions is None:
+            positions = dict.fromkeys(range(PRODUCT_INDEX_SHARDS))
+        key = self._price_key if index is PRICE_INDEX else self._created_key
+        resume = {
+            shard: _position_key(index, position)
+            for shard, position in positions.items()
+            if position is not None
+        }
+        if resume and len(resume) == len(positions):
+            # どの shard の再開位置よりも前の行は読み済み
+            # (未読の shard があればその shard の行は先頭から返すため飛ばさない)
+            lowest = min(resume.values())
+            start = max(start, bisect.bisect_right(order, lowest, key=key))
+
+        rows: list[int] = []
+        last: dict[int, int] = {}
+        i = start
+        while i < stop and len(rows) < limit:
+            row = order[i]
+            i += 1
+            shard = self._shards[row]
+            if shard in positions and (shard not in resume or key(row) > resume[shard]):
+                rows.append(row)
+                last[shard] = row
+        products = [self._product(row) for row in rows]
+        if i >= stop:
+            return products, None
+        next_positions = positions | {
+            shard: self._index_key(index, row) for shard, row in last.items()
+        }
+        return products, encode_positions(next_positions)
+
+    def _append(self, product: Product) -> int:
+        values = vars(product)
+        price, exponent = _fixed_price(values["price"])
+        micros, offset = _epoch(values["created_at"])
+        row = len(self._prices)
+        self._ids.append(values["product_id"])
+        self._names.append(values["name"])
+        self._descriptions.append(values["description"])
+        self._prices.append(price)
+        self._price_exponents.append(exponent)
+        self._created.append(micros)
+        self._offsets.append(offset)
+        self._versions.append(values["version"])
+        self._shards.append(product_shard(values["product_id"]))
+        return row
+
+    def _orders(self) -> list[tuple[array, Callable[[int], Any]]]:
+        return [
+            (self._by_id, self._ids.key),
+            (self._by_price, self._price_key),
+            (self._by_created, self._created_key),
+        ]
+
+    def _find(self, product_id: str) -> int | None:
+        target = product_id.encode()
+        i = bisect.bisect_left(self._by_id, target, key=self._ids.key)
+        if i < len(self._by_id) and self._ids.key(self._by_id[i]) == target:
+            return self._by_id[i]
+        return None
+
+    def _remove(self, row: int) -> None:
+        for order, key in self._orders():
+            del order[bisect.bisect_left(order, key(row), key=key)]
+
+    def _price_key(self, row: int) -> tuple[int, bytes]:
+        return self._prices[row], self._ids.key(row)
+
+    def _created_key(self, row: int) -> tuple[int, bytes]:
+        return -self._created[row], self._ids.key(row)
+
+    def _index_key(self, index: Index, row: int) -> dict[str, Any]:
+        # GSI の LastEvaluatedKey と同じ属性 (テーブルのキーと GSI のキー)
+        key: dict[str, Any] = {
+            Product.__hash_key__: self._ids[row],
+            index.hash_key: self._shards[row],
+        }
+        if index is PRICE_INDEX:
+            key["price"] = _price(self._prices[row], self._price_exponents[row])
+        else:
+            key["created_key"] = created_at_key(_datetime(self._created[row]))
+        return key
+
+    def _product(self, row: int) -> Product:
+        created_at = _datetime(self._created[row], self._offsets[row])
+        product = _codec.from_item(
+            {
+                "product_id": self._ids[row],
+                "name": self._names[row],
+                "description": self._descriptions[row],
+                "price": _price(self._prices[row], self._price_exponents[row]),
+                "created_at": created_at.isoformat(),
+                "version": self._versions[row],
+            }
+        )
+        return cast(Product, product)
+
+
+def _list_after(cursor: str | None) -> bytes | None:
+    key = decode_cursor(cursor)
+    if key is None:
+        return None
+    after = key.get(_LIST_CURSOR_KEY)
+    if len(key) != 1 or not isinstance(after, str):
+        # Scan のカーソルは並び順が異なるため続きとして使えない
+        raise InvalidCursorError("Invalid cursor")
+    return after.encode()
+
+
+def _position_key(index: Index, position: dict[str, Any]) -> tuple[int, bytes]:
+    """GSI の再開位置を並び順のキーにする"""
+    try:
+        product_id = position[Product.__hash_key__].encode()
+        if index is PRICE_INDEX:
+            return _price_bound(Decimal(position["price"]), ROUND_FLOOR), product_id
+        created_at = datetime.fromisoformat(position["created_key"])
+        return -_epoch(created_at)[0], product_id
+    except (AttributeError, TypeError, ValueError, InvalidOperation) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+
+class SnapshotRefresher:
+    """スナップショットをバックグラウンドのスレッドで読み込み・更新する
+
+    最初に current() が呼ばれた時点でスレッドを起動し、読み込みが終わるまでは
+    None を返す (呼び出し側は DynamoDB を読む)。
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.snapshot: ProductSnapshot | None = None
+        # 直近の更新の失敗 (次の周期で再試行する)
+        self.last_error: Exception | None = None
+        self._clock = clock
+        # 直近にテーブル全体を読んだ (または読めないと判定した) 時刻
+        self._rebuilt_at: float | None = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # テーブル全体を読み直している間の変更 (読み直した結果にも反映し直す)
+        self._pending: list[Callable[[ProductSnapshot], None]] | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def current(self) -> ProductSnapshot | None:
+        """読み込み済みのスナップショット (無効・読み込み中は None)"""
+        if not enabled():
+            return None
+        if self._thread is None:
+            self.start()
+        return self.snapshot
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="product-snapshot", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self) -> None:
+        """スレッドを止め、スナップショットを破棄する"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            self._thread = None
+            self.snapshot = None
+            self._rebuilt_at = None
+
+    def refresh(self) -> None:
+        """読み直しの時期ならテーブル全体を、それ以外は新しい商品だけを読む"""
+        with self._refresh_lock:
+            rebuilt_at = self._rebuilt_at
+            interval = models.PRODUCT_SNAPSHOT_REBUILD_SECONDS
+            if rebuilt_at is None or self._clock() - rebuilt_at >= interval:
+                self._rebuild()
+            elif self.snapshot is not None:
+                self._catch_up(self.snapshot)
+
+    def rebuild(self) -> None:
+        with self._refresh_lock:
+            self._rebuild()
+
+    def apply(self, product: Product) -> None:
+        self._change(lambda snapshot: snapshot.apply(product))
+
+    def discard(self, product_id: str) -> None:
+        self._change(lambda snapshot: snapshot.discard(product_id))
+
+    def clear(self) -> None:
+        self._change(ProductSnapshot.clear)
+
+    def _change(self, change: Callable[[ProductSnapshot], None]) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(change)
+            if self.snapshot is None:
+                return
+            try:
+                change(self.snapshot)
+            except UnsupportedValueError:
+                # 反映できない商品がある間は使わない (次の読み直しで再判定する)
+                self.snapshot = None
+
+    def _rebuild(self) -> None:
+        started = self._clock()
+        with self._lock:
+            self._pending = []
+        try:
+            snapshot = ProductSnapshot.scan()
+            with self._lock:
+                for change in self._pending:
+                    change(snapshot)
+                self.snapshot = snapshot
+        except UnsupportedValueError:
+            with self._lock:
+                self.snapshot = None
+            # 読み直しても同じ結果になるため、次の読み直しの時期まで待つ
+            self._rebuilt_at = started
+            raise
+        finally:
+            with self._lock:
+                self._pending = None
+        self._rebuilt_at = started
+
+    def _catch_up(self, snapshot: ProductSnapshot) -> None:
+        """前回読んだ最新の作成日時以降の商品を作成日時の GSI から取り込む
+
+        作成日時を過去に指定して作成された商品は、次の読み直しで反映される。
+        """
+        watermark = snapshot.watermark()
+        condition = None
+        if watermark is not None:
+            condition = Key(cast(str, CREATED_INDEX.range_key)).gte(watermark)
+        positions: ShardPositions | None = None
+        while True:
+            items, positions = query_shards(
+                CREATED_INDEX, condition, _CATCH_UP_PAGE_SIZE, positions
+            )
+            for item in items:
+                self._change(functools.partial(ProductSnapshot.apply_item, item=item))
+            if not positions:
+                return
+
+    def _run(self) -> None:
+        # 読み込み済み (rebuild() を直接呼んだ場合) なら最初の更新は 1 周期後
+        delay = (
+            0.0 if self.snapshot is None else models.PRODUCT_SNAPSHOT_REFRESH_SECONDS
+        )
+        while not self._stop.wait(delay):
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:  # 次の周期で再試行する
+                self.last_error = e
+            delay = models.PRODUCT_SNAPSHOT_REFRESH_SECONDS
+
+
+product_snapshot = SnapshotRefresher()
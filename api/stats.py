@@ -0,0 +1,128 @@
+"""商品数・価格の集計値 (GET /products/stats)
+
+PRODUCT_STATS_ENABLED が有効な場合、商品の作成・更新・削除と同じトランザクションで
+集計用テーブルのカウンタを UpdateItem の ADD で増減する。カウンタは商品の shard
+ごとのアイテムに分け、別々の商品への同時書き込みが同じアイテムで競合
+(TransactionConflict) しにくくする。読み出しは全 shard のカウンタを合計する。
+"""
+
+import random
+import time
+from collections.abc import Callable
+from collections.abc import Iterable
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+from dyntastic import A
+from dyntastic import transaction
+
+from api import models
+from api.errors import CONDITIONAL_CHECK_FAILED
+from api.errors import TRANSACTION_CANCELED
+from api.errors import error_code
+from api.models import PRODUCT_INDEX_SHARDS
+from api.models import ProductStats
+from api.models import ProductStatsResponse
+from api.models import product_shard
+from api.scan import scan_segments
+
+# shard ごとの (商品数の増減, 価格合計の増減)
+Deltas = dict[int, tuple[int, Decimal]]
+
+_MAX_ATTEMPTS = 5
+_BASE_BACKOFF_SECONDS = 0.05
+
+
+def enabled() -> bool:
+    return models.PRODUCT_STATS_ENABLED
+
+
+def deltas(changes: Iterable[tuple[str, int, Decimal]]) -> Deltas:
+    """(product_id, 商品数の増減, 価格合計の増減) を shard ごとに合計する"""
+    totals: Deltas = {}
+    for product_id, count, price in changes:
+        shard = product_shard(product_id)
+        total_count, total_price = totals.get(shard, (0, Decimal(0)))
+        totals[shard] = (total_count + count, total_price + price)
+    return totals
+
+
+def add(changes: Deltas) -> None:
+    """実行中のトランザクションにカウンタの ADD を加える"""
+    for shard, (count, price) in sorted(changes.items()):
+        actions = []
+        if count:
+            actions.append(A.product_count.add(count))
+        if price:
+            actions.append(A.price_total.add(price))
+        if actions:
+            ProductStats(shard=shard).update(*actions, refresh=False)
+
+
+def transact(write: Callable[[], None], changes: Deltas) -> None:
+    """商品への 1 件の書き込みとカウンタの増減を 1 つのトランザクションで行う
+
+    商品側の条件に失敗した場合は、トランザクションを使わない書き込みと同様に
+    ConditionalCheckFailedException の ClientError を送出する。
+    他のトランザクションとの競合は待ってから再送する。
+    """
+    for attempt in range(_MAX_ATTEMPTS):
+        try:
+            with transaction():
+                write()
+                add(changes)
+            return
+        except ClientError as e:
+            if error_code(e) != TRANSACTION_CANCELED:
+                raise
+            reasons = e.response.get("CancellationReasons", [])
+            if reasons and reasons[0].get("Code") == "ConditionalCheckFailed":
+                raise _conditional_check_failed(e, reasons[0]) from e
+            time.sleep(
+                random.uniform(0, _BASE_BACKOFF_SECONDS * 2**attempt)  # nosec B311
+            )
+    raise RuntimeError(f"Transaction did not succeed after {_MAX_ATTEMPTS} attempts")
+
+
+def _conditional_check_failed(error: ClientError, reason: dict) -> ClientError:
+    response: dict = {
+        "Error": {"Code": CONDITIONAL_CHECK_FAILED, "Message": reason.get("Message")}
+    }
+    if "Item" in reason:
+        # ReturnValuesOnConditionCheckFailure で返された既存のアイテム
+        response["Item"] = reason["Item"]
+    return ClientError(response, error.operation_name)
+
+
+def read() -> ProductStatsResponse:
+    """全 shard のカウンタを BatchGetItem で取得して合計する"""
+    counters = ProductStats.batch_get(list(range(PRODUCT_INDEX_SHARDS)))
+    count = sum(counter.product_count for counter in counters)
+    total = sum((counter.price_total for counter in counters), Decimal(0))
+    return ProductStatsResponse(
+        product_count=count,
+        price_total=total,
+        price_average=total / count if count else None,
+    )
+
+
+def rebuild() -> ProductStatsResponse:
+    """商品テーブル全体を Scan してカウンタを作り直す
+
+    集計を有効にする前から存在する商品の取り込みや、全件削除後の初期化に使う。
+    Scan 中の書き込みは反映されない場合があるため、書き込みを止めて実行する。
+    """
+    pages = scan_segments(
+        ProjectionExpression="#product_id, #price",
+        ExpressionAttributeNames={"#product_id": "product_id", "#price": "price"},
+    )
+    totals = deltas(
+        (item["product_id"], 1, Decimal(str(item["price"])))
+        for items in pages
+        for item in items
+    )
+    with ProductStats.batch_writer():
+        for shard in range(PRODUCT_INDEX_SHARDS):
+            count, total = totals.get(shard, (0, Decimal(0)))
+            ProductStats(shard=shard, product_count=count, price_total=total).save()
+    return read()
@@ -0,0 +1,133 @@
+"""同期ハンドラと非同期ハンドラのスループット比較 (固定同時実行数での req/s)
+
+    uv run python -m benchmarks.async_throughput --concurrency 200 --latency-ms 20
+
+同期版は FastAPI 既定のスレッドプール (40 スレッド) で boto3 を呼び出し、
+非同期版は api.async_repository の専用プールで呼び出す。--latency-ms を指定すると
+DynamoDB への送信ごとに待ち時間を入れ、実環境のネットワーク往復を模擬する。
+結果の peak_in_flight_dynamodb_calls で、同時に待てる DynamoDB 呼び出し数を確認できる。
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+from dyntastic.exceptions import DoesNotExist
+from fastapi import FastAPI
+from fastapi import HTTPException
+
+from api import repository
+from api.main import app as async_app
+from api.models import Product
+from api.models import ProductResponse
+from benchmarks.common import add_common_arguments
+from benchmarks.common import dynamodb_endpoint
+from benchmarks.common import make_item
+from benchmarks.common import recreate_table
+from benchmarks.common import seed_products
+from benchmarks.common import use_table
+from benchmarks.common import write_results
+
+sync_app = FastAPI()
+
+
+@sync_app.get("/products/{product_id}")
+def read_product(product_id: str) -> ProductResponse:
+    try:
+        return repository.get_product(product_id)  # type: ignore
+    except DoesNotExist as e:
+        raise HTTPException(status_code=404, detail="Product not found") from e
+
+
+class InFlight:
+    """DynamoDB への送信中リクエスト数のピークを記録し、必要なら遅延を入れる"""
+
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, **kwargs) -> None:
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            self.active -= 1
+
+    def register(self) -> None:
+        Product._dynamodb_resource().meta.client.meta.events.register(
+            "before-send.dynamodb", self
+        )
+
+
+async def run(mode: str, app: FastAPI, paths: list[str], concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+
+        async def worker() -> None:
+            while not queue.empty():
+                resp = await c.get(queue.get_nowait())
+                assert resp.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        seconds = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "requests": len(paths),
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(len(paths) / seconds),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    paths = [
+        f"/products/{make_item(rng.randrange(args.products))['product_id']}"
+        for _ in range(args.requests)
+    ]
+
+    with dynamodb_endpoint(args.endpoint_url) as endpoint_url:
+        use_table(endpoint_url, args.table_name)
+        recreate_table(args.table_name)
+        seed_products(args.products)
+        in_flight = InFlight(args.latency_ms)
+        in_flight.register()
+
+        runs = []
+        for mode, app in (("sync", sync_app), ("async", async_app)):
+            in_flight.peak = 0
+            result = asyncio.run(run(mode, app, paths, args.concurrency))
+            result["peak_in_flight_dynamodb_calls"] = in_flight.peak
+            runs.append(result)
+        write_results(
+            args.output,
+            {
+                "endpoint_url": endpoint_url,
+                "latency_ms": args.latency_ms,
+                "runs": runs,
+            },
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""一括作成 POST /products/batch と単件 POST /products/ のスループット比較
+
+uv run python -m benchmarks.bulk_create --items 5000
+"""
+
+import argparse
+import json
+
+from fastapi.testclient import TestClient
+
+from api.bulk import MAX_BATCH_CREATE_ITEMS
+from api.main import app
+from benchmarks.common import add_common_arguments
+from benchmarks.common import dynamodb_endpoint
+from benchmarks.common import make_item
+from benchmarks.common import recreate_table
+from benchmarks.common import stopwatch
+from benchmarks.common import use_table
+from benchmarks.common import write_results
+
+
+def _payloads(count: int, offset: int) -> list[dict]:
+    return [
+        json.loads(json.dumps(make_item(offset + i), default=str)) for i in range(count)
+    ]
+
+
+def run_single(client: TestClient, payloads: list[dict]) -> dict:
+    with stopwatch() as elapsed:
+        for payload in payloads:
+            assert client.post("/products/", json=payload).status_code == 200
+    return _summary("single", len(payloads), elapsed["seconds"])
+
+
+def run_batch(client: TestClient, payloads: list[dict], batch_size: int) -> dict:
+    with stopwatch() as elapsed:
+        for i in range(0, len(payloads), batch_size):
+            resp = client.post("/products/batch", json=payloads[i : i + batch_size])
+            assert resp.status_code == 200
+            assert all(r["status"] == "created" for r in resp.json())
+    return _summary("batch", len(payloads), elapsed["seconds"])
+
+
+def _summary(mode: str, count: int, seconds: float) -> dict:
+    return {
+        "mode": mode,
+        "items": count,
+        "seconds": round(seconds, 3),
+        "items_per_second": round(count / seconds),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_CREATE_ITEMS)
+    args = parser.parse_args()
+
+    with dynamodb_endpoint(args.endpoint_url) as endpoint_url:
+        use_table(endpoint_url, args.table_name)
+        recreate_table(args.table_name)
+        client = TestClient(app)
+        single = run_single(client, _payloads(args.items, 0))
+        batch = run_batch(client, _payloads(args.items, args.items), args.batch_size)
+        batch["speedup"] = round(
+            batch["items_per_second"] / single["items_per_second"], 2
+        )
+        write_results(
+            args.output, {"endpoint_url": endpoint_url, "runs": [single, batch]}
+        )
+
+
+if __name__ == "__main__":
+    main()
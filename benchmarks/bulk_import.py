@@ -0,0 +1,75 @@
+"""NDJSON からのインポート (python -m api.importer) のスループット
+
+uv run python -m benchmarks.bulk_import --items 50000 --workers 1 4 8 16
+
+make_item の商品を NDJSON (gzip) に書き出し、ワーカー数ごとにテーブルを作り直して
+取り込む。チェックポイントを有効にした場合の速度も記録する。
+"""
+
+import argparse
+import gzip
+import json
+import os
+import tempfile
+
+from api.importer import import_products
+from benchmarks.common import add_common_arguments
+from benchmarks.common import dynamodb_endpoint
+from benchmarks.common import make_item
+from benchmarks.common import recreate_table
+from benchmarks.common import use_table
+from benchmarks.common import write_results
+
+
+def write_source(path: str, count: int) -> None:
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps(make_item(i), default=str) + "\n")
+
+
+def run_import(
+    table_name: str, source: str, workers: int, checkpoint: str | None
+) -> dict:
+    recreate_table(table_name)
+    result = import_products(source, max_workers=workers, checkpoint=checkpoint)
+    if checkpoint:
+        os.remove(checkpoint)
+    return {
+        "workers": workers,
+        "checkpoint": checkpoint is not None,
+        "items": result.written,
+        "seconds": round(result.seconds, 3),
+        "items_per_second": round(result.items_per_second),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        dynamodb_endpoint(args.endpoint_url) as endpoint_url,
+    ):
+        source = os.path.join(tmp, "products.ndjson.gz")
+        write_source(source, args.items)
+        use_table(endpoint_url, args.table_name)
+
+        runs = [run_import(args.table_name, source, n, None) for n in args.workers]
+        checkpoint = os.path.join(tmp, "checkpoint.json")
+        runs.append(run_import(args.table_name, source, max(args.workers), checkpoint))
+        write_results(
+            args.output,
+            {
+                "endpoint_url": endpoint_url,
+                "source_bytes": os.path.getsize(source),
+                "runs": runs,
+            },
+        )
+
+
+if __name__ == "__main__":
+    main()
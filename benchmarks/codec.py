@@ -0,0 +1,139 @@
+"""Product と DynamoDB のアイテムの変換コストの比較 (1 件あたりの µs)
+
+uv run python -m benchmarks.codec --sizes 10000 100000
+
+読み込み (DynamoDB API の型付きの属性 → Product):
+- dyntastic: TypeDeserializer + dyntastic 既定の _dyntastic_load_model (model_validate)
+- model_construct: TypeDeserializer + 値を変換して Product.model_construct
+- codec_item: TypeDeserializer + api.codec の from_item (リソース層を使う現在の経路)
+- codec_wire: api.codec の from_wire (型付きの属性から直接)
+
+書き込み (Product → 型付きの属性):
+- dyntastic: model_dump + attr.serialize + TypeSerializer (dyntastic 既定の save)
+- codec_item: api.codec の to_item + TypeSerializer (現在の save)
+- codec_wire: api.codec の to_wire
+"""
+
+import argparse
+import timeit
+from datetime import datetime
+
+from boto3.dynamodb.types import TypeDeserializer
+from boto3.dynamodb.types import TypeSerializer
+from dyntastic import Dyntastic
+from dyntastic.attr import serialize
+
+from api.codec import item_codec
+from api.models import Product
+from benchmarks.common import make_item
+from benchmarks.common import write_results
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+_codec = item_codec(Product)
+
+
+def _deserialize(wire: dict) -> dict:
+    return {k: _deserializer.deserialize(v) for k, v in wire.items()}
+
+
+def _serialize(item: dict) -> dict:
+    return {k: _serializer.serialize(v) for k, v in item.items()}
+
+
+def decode_dyntastic(wires: list[dict]) -> list[Product]:
+    load = Dyntastic._dyntastic_load_model.__func__  # type: ignore[attr-defined]
+    return [load(Product, _deserialize(wire)) for wire in wires]
+
+
+def decode_model_construct(wires: list[dict]) -> list[Product]:
+    products = []
+    for wire in wires:
+        item = _deserialize(wire)
+        products.append(
+            Product.model_construct(
+                product_id=item["product_id"],
+                name=item["name"],
+                description=item.get("description"),
+                price=item["price"],
+                created_at=datetime.fromisoformat(item["created_at"]),
+                version=int(item["version"]),
+            )
+        )
+    return products
+
+
+def decode_codec_item(wires: list[dict]) -> list[Product | None]:
+    return [_codec.from_item(_deserialize(wire)) for wire in wires]
+
+
+def decode_codec_wire(wires: list[dict]) -> list[Product | None]:
+    return [_codec.from_wire(wire) for wire in wires]
+
+
+def encode_dyntastic(products: list[Product]) -> list[dict]:
+    return [_serialize(serialize(p.model_dump(by_alias=True))) for p in products]
+
+
+def encode_codec_item(products: list[Product]) -> list[dict]:
+    return [_serialize(_codec.to_item(product)) for product in products]
+
+
+def encode_codec_wire(products: list[Product]) -> list[dict]:
+    return [_codec.to_wire(product) for product in products]
+
+
+DECODERS = {
+    "dyntastic": decode_dyntastic,
+    "model_construct": decode_model_construct,
+    "codec_item": decode_codec_item,
+    "codec_wire": decode_codec_wire,
+}
+ENCODERS = {
+    "dyntastic": encode_dyntastic,
+    "codec_item": encode_codec_item,
+    "codec_wire": encode_codec_wire,
+}
+
+
+def best_seconds(fn, values: list, repeat: int) -> float:
+    return min(timeit.repeat(lambda: fn(values), number=1, repeat=repeat))
+
+
+def run(modes: dict, values: list, repeat: int) -> dict:
+    outputs = [fn(values) for fn in modes.values()]
+    assert all(output == outputs[0] for output in outputs), "outputs differ"
+    timings = {mode: best_seconds(fn, values, repeat) for mode, fn in modes.items()}
+    per_item = {
+        f"{mode}_us": round(seconds / len(values) * 1e6, 2)
+        for mode, seconds in timings.items()
+    }
+    return {
+        **per_item,
+        "speedup_vs_dyntastic": round(timings["dyntastic"] / timings["codec_wire"], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="結果を JSON で書き出すパス")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        products = [Product(**make_item(i)) for i in range(size)]
+        wires = encode_dyntastic(products)
+        results.append(
+            {
+                "items": size,
+                "decode": run(DECODERS, wires, args.repeat),
+                "encode": run(ENCODERS, products, args.repeat),
+            }
+        )
+    write_results(args.output, {"results": results})
+
+
+if __name__ == "__main__":
+    main()
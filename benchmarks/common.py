@@ -0,0 +1,148 @@
+"""ベンチマーク共通のヘルパー
+
+接続先は DynamoDB Local (docker-compose.dev.yml) などを --endpoint-url で指定する。
+省略時は moto[server] が利用可能であれば moto サーバーをサブプロセスで起動する。
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import socket
+import subprocess  # nosec B404
+import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from decimal import Decimal
+
+from api.models import Product
+from api.models import created_at_key
+from api.models import normalize_name
+from api.models import product_shard
+
+BENCH_TABLE_NAME = "products-bench"
+
+# ダミー認証情報 (DynamoDB Local / moto では検証されない)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+
+def add_common_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--endpoint-url",
+        default=os.getenv("DYNAMODB_ENDPOINT_URL") or None,
+        help="DynamoDB のエンドポイント (省略時は moto サーバーを起動)",
+    )
+    parser.add_argument("--table-name", default=BENCH_TABLE_NAME)
+    parser.add_argument("--output", help="結果を JSON で書き出すパス")
+
+
+@contextlib.contextmanager
+def dynamodb_endpoint(endpoint_url: str | None) -> Iterator[str]:
+    """指定がなければ moto サーバーを別プロセスで起動し、そのエンドポイントを返す"""
+    if endpoint_url:
+        yield endpoint_url
+        return
+    if importlib.util.find_spec("flask") is None:
+        raise SystemExit(
+            "--endpoint-url を指定するか moto[server] をインストールしてください"
+        )
+    # 計測対象と GIL を共有しないよう、moto サーバーはサブプロセスで動かす
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(  # nosec B603
+        [sys.executable, "-m", "moto.server", "-H", "127.0.0.1", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port(port)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with (
+            contextlib.suppress(OSError),
+            socket.create_connection(("127.0.0.1", port), timeout=1),
+        ):
+            return
+        time.sleep(0.1)
+    raise SystemExit("moto サーバーが起動しませんでした")
+
+
+def use_table(endpoint_url: str, table_name: str) -> None:
+    """Product モデルの接続先をベンチマーク用テーブルに切り替える"""
+    Product.__table_host__ = endpoint_url
+    Product.__table_name__ = table_name
+    Product._clear_boto3_state()
+
+
+def recreate_table(table_name: str) -> None:
+    """ベンチマーク用テーブルを作り直す (スキーマは scripts/init-dynamodb.sh と同じ)"""
+    client = Product._dynamodb_client()
+    with contextlib.suppress(client.exceptions.ResourceNotFoundException):
+        client.delete_table(TableName=table_name)
+        client.get_waiter("table_not_exists").wait(TableName=table_name)
+    client.create_table(TableName=table_name, **Product.table_definition())
+    client.get_waiter("table_exists").wait(TableName=table_name)
+
+
+def make_item(i: int) -> dict:
+    product_id = f"bench-{i:08}"
+    name = f"Product {i}"
+    created_at = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=i)
+    return {
+        "product_id": product_id,
+        "name": name,
+        "description": f"Benchmark product number {i}",
+        "price": Decimal(i % 10_000) / 100,
+        "created_at": created_at.isoformat(),
+        # 検索用 GSI のキー (Product を経由して保存した場合と同じ値)
+        "shard": product_shard(product_id),
+        "name_key": normalize_name(name),
+        "created_key": created_at_key(created_at),
+    }
+
+
+def seed_products(count: int, workers: int = 8) -> None:
+    """BatchWriteItem を並列に発行して count 件を投入する"""
+    table = Product._dynamodb_table()
+
+    def write(start: int) -> None:
+        with table.batch_writer() as writer:
+            for i in range(start, min(start + 1000, count)):
+                writer.put_item(Item=make_item(i))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(write, range(0, count, 1000)))
+
+
+@contextlib.contextmanager
+def stopwatch() -> Iterator[dict]:
+    """with ブロックの経過秒を result["seconds"] に格納する"""
+    result: dict = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
+
+
+def write_results(path: str | None, results: dict) -> None:
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
@@ -0,0 +1,98 @@
+"""エクスポートのベンチマーク (形式ごとの件数/秒・出力サイズ・ピークメモリ)
+
+uv run python -m benchmarks.export --products 20000 --formats ndjson csv parquet
+
+各形式でテーブル全体を一時ファイルへ書き出し、件数/秒と書き込んだバイト数、
+tracemalloc で計測した Python ヒープのピークを記録する。
+比較として、全件を Product のリストに読み込んでから NDJSON にする方法
+(GET /products/ のページを全部たどるのと同じく全件をメモリに載せる) も計測する。
+ピークメモリは件数に比例せず、ページ数枚分で一定になることを確認できる。
+"""
+
+import argparse
+import gzip
+import importlib.util
+import tempfile
+import tracemalloc
+
+from api.export import export_products
+from api.models import Product
+from api.serialization import dump_ndjson
+from benchmarks.common import add_common_arguments
+from benchmarks.common import dynamodb_endpoint
+from benchmarks.common import recreate_table
+from benchmarks.common import seed_products
+from benchmarks.common import stopwatch
+from benchmarks.common import use_table
+from benchmarks.common import write_results
+
+# 全件 Scan の 1 ページの件数 (1 MB 単位で読むと moto では読み取りタイムアウトになる)
+_SCAN_PAGE_SIZE = 1000
+
+
+def run_export(export_format: str, segments: int) -> dict:
+    with tempfile.TemporaryFile() as f:
+        tracemalloc.start()
+        try:
+            result = export_products(
+                f, export_format, total_segments=segments, per_page=_SCAN_PAGE_SIZE
+            )
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        "mode": export_format,
+        "items": result.items,
+        "bytes_written": result.bytes_written,
+        "seconds": round(result.seconds, 3),
+        "items_per_second": round(result.items_per_second),
+        "peak_memory_bytes": peak,
+    }
+
+
+def run_materialized() -> dict:
+    with tempfile.TemporaryFile() as f:
+        tracemalloc.start()
+        try:
+            with stopwatch() as elapsed:
+                products = list(Product.scan(per_page=_SCAN_PAGE_SIZE))
+                written = f.write(gzip.compress(dump_ndjson(products)))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        "mode": "materialized_ndjson",
+        "items": len(products),
+        "bytes_written": written,
+        "seconds": round(elapsed["seconds"], 3),
+        "items_per_second": round(len(products) / elapsed["seconds"]),
+        "peak_memory_bytes": peak,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--formats", nargs="+", default=["ndjson", "csv", "parquet"])
+    parser.add_argument("--segments", type=int, default=4)
+    args = parser.parse_args()
+    if importlib.util.find_spec("pyarrow") is None and "parquet" in args.formats:
+        print("pyarrow is not installed; skipping parquet")
+        args.formats.remove("parquet")
+
+    with dynamodb_endpoint(args.endpoint_url) as endpoint_url:
+        use_table(endpoint_url, args.table_name)
+        recreate_table(args.table_name)
+        seed_products(args.products)
+
+        runs = [run_export(fmt, args.segments) for fmt in args.formats]
+        runs.append(run_materialized())
+        write_results(
+            args.output,
+            {"endpoint_url": endpoint_url, "products": args.products, "runs": runs},
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Lambda の 1 呼び出しあたりのオーバーヘッド比較 (直接アダプタ vs ASGI ブリッジ)
+
+uv run python -m benchmarks.lambda_adapter --iterations 2000
+
+DynamoDB の待ち時間を除いた純粋なオーバーヘッドを測るため、repository の関数を
+固定値を返すスタブに差し替え、api.apigw.handler と api.lambda_handler.handler に
+同じ API Gateway イベントを渡して 1 呼び出しあたりの時間を比べる。
+あわせて新しいプロセスで、各エントリポイントの準備 (import) にかかる時間を測る。
+"""
+
+import argparse
+import json
+import statistics
+import subprocess  # nosec B404
+import sys
+import timeit
+from datetime import datetime
+from datetime import timezone
+from decimal import Decimal
+
+from api import apigw
+from api import lambda_handler
+from api import repository
+from api.models import Product
+from benchmarks.common import write_results
+
+PRODUCT = Product(
+    product_id="p1",
+    name="Prod1",
+    description="Desc1",
+    price=Decimal("10"),
+    created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+)
+
+# 新しいプロセスでエントリポイントを用意し、最初の呼び出しができるまでの時間
+_PREPARE = {
+    "direct": "import api.apigw",
+    "asgi": "import api.lambda_handler as m; m._app()",
+}
+
+
+def stub_repository() -> None:
+    repository.get_product = lambda product_id: PRODUCT  # type: ignore
+    repository.create_product = lambda product: product  # type: ignore
+    repository.update_product = lambda product_id, changes, versions: PRODUCT  # type: ignore
+
+
+def event(method: str, path: str, body=None) -> dict:
+    return {
+        "version": "2.0",
+        "rawPath": path,
+        "rawQueryString": "",
+        "headers": {"content-type": "application/json"},
+        "requestContext": {"http": {"method": method}},
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+EVENTS = {
+    "get": event("GET", "/products/p1"),
+    "create": event(
+        "POST", "/products/", {"product_id": "p1", "name": "Prod1", "price": 10}
+    ),
+    "update": event("PATCH", "/products/p1", {"price": 20}),
+}
+
+
+def per_call_us(handler, event: dict, iterations: int) -> float:
+    timer = timeit.Timer(lambda: handler(event, None))
+    return min(timer.repeat(repeat=5, number=iterations)) / iterations * 1e6
+
+
+def prepare_ms(code: str, runs: int) -> float:
+    script = f"import time; s = time.perf_counter(); {code}; "
+    script += "print(time.perf_counter() - s)"
+    timings = [
+        float(
+            subprocess.run(  # nosec B603
+                [sys.executable, "-c", script],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+        )
+        for _ in range(runs)
+    ]
+    return round(statistics.median(timings) * 1000, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=5, help="import 計測の回数")
+    parser.add_argument("--output", help="結果を JSON で書き出すパス")
+    args = parser.parse_args()
+
+    stub_repository()
+    handlers = {"direct": apigw.handler, "asgi": lambda_handler.handler}
+    overhead = {}
+    for name, ev in EVENTS.items():
+        timings = {
+            mode: per_call_us(handler, ev, args.iterations)
+            for mode, handler in handlers.items()
+        }
+        overhead[name] = {
+            "direct_us": round(timings["direct"], 1),
+            "asgi_us": round(timings["asgi"], 1),
+            "speedup": round(timings["asgi"] / timings["direct"], 2),
+        }
+
+    write_results(
+        args.output,
+        {
+            "iterations": args.iterations,
+            "per_invocation": overhead,
+            "prepare_ms": {
+                mode: prepare_ms(code, args.runs) for mode, code in _PREPARE.items()
+            },
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
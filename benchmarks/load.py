@@ -0,0 +1,312 @@
+"""API 全ルートの負荷試験 (レイテンシ分位点・req/s・DynamoDB 呼び出し数)
+
+uv run python -m benchmarks.load --requests 500 --concurrency 32 --output load.json
+uv run python -m benchmarks.load --baseline load.json --max-regression 0.2
+
+api/main.py の各ルートについて、固定の同時実行数でリクエストを送り続け、
+p50 / p95 / p99 レイテンシ、req/s、リクエストあたりの DynamoDB 呼び出し数を記録する。
+アプリは httpx の ASGITransport でプロセス内から呼び出し、DynamoDB は moto サーバー
+または DynamoDB Local (--endpoint-url) を使う。
+--baseline に以前の結果 (--output の JSON) を渡すと、p95 レイテンシ・req/s が
+--max-regression の割合を超えて悪化したルートや、DynamoDB 呼び出し数が増えたルートを
+一覧にして終了コード 1 で終了する。想定外のステータスが返った場合も失敗とする。
+全件削除 (DELETE /test/clear-table) はテスト用のため対象外。
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+from api import models
+from api import stats
+from api.main import app
+from api.models import Product
+from api.models import ProductStats
+from benchmarks.common import add_common_arguments
+from benchmarks.common import dynamodb_endpoint
+from benchmarks.common import make_item
+from benchmarks.common import recreate_table
+from benchmarks.common import seed_products
+from benchmarks.common import use_table
+from benchmarks.common import write_results
+
+# (メソッド, パス, JSON ボディ)
+Request = tuple[str, str, Any]
+
+# DynamoDB の呼び出し数は実行ごとに変わらないため、わずかな増加も悪化とみなす
+_CALLS_TOLERANCE = 0.01
+
+
+@dataclass
+class Scenario:
+    name: str
+    make_request: Callable[[int, random.Random], Request]
+    expected_status: int = 200
+    # --requests に対するリクエスト数の比率 (重いルートは少なくする)
+    weight: float = 1.0
+    # moto サーバーは TransactWriteItems のたびにテーブル全体を複製して遅いため、
+    # 並行に送ると読み取りタイムアウトになる。moto では 1 件ずつ送る
+    serial_on_moto: bool = False
+
+
+def _product_id(products: int, rng: random.Random) -> str:
+    return make_item(rng.randrange(products))["product_id"]
+
+
+def scenarios(products: int, stats_enabled: bool) -> list[Scenario]:
+    """ルートごとのシナリオ (作成したものを後のシナリオで更新・削除する順に並べる)"""
+
+    def new_product(i: int) -> dict:
+        return {"product_id": f"load-{i:08}", "name": f"Load {i}", "price": "9.99"}
+
+    return [
+        Scenario("health", lambda i, rng: ("GET", "/health", None)),
+        Scenario("create", lambda i, rng: ("POST", "/products/", new_product(i))),
+        Scenario(
+            "batch_create",
+            lambda i, rng: (
+                "POST",
+                "/products/batch",
+                [new_product(1_000_000 + i * 25 + j) for j in range(25)],
+            ),
+            weight=0.1,
+            serial_on_moto=True,
+        ),
+        Scenario(
+            "read",
+            lambda i, rng: ("GET", f"/products/{_product_id(products, rng)}", None),
+        ),
+        Scenario(
+            "read_fields",
+            lambda i, rng: (
+                "GET",
+                f"/products/{_product_id(products, rng)}?fields=name,price",
+                None,
+            ),
+        ),
+        Scenario(
+            "lookup",
+            lambda i, rng: (
+                "GET",
+                "/products/?ids="
+                + ",".join(_product_id(products, rng) for _ in range(10)),
+                None,
+            ),
+        ),
+        Scenario("list", lambda i, rng: ("GET", "/products/?limit=50", None)),
+        Scenario(
+            "stream",
+            lambda i, rng: ("GET", "/products/?stream=true&limit=1000", None),
+            weight=0.02,
+        ),
+        Scenario(
+            "search_price",
+            lambda i, rng: (
+                "GET",
+                f"/products/search?min_price={(p := rng.randrange(100))}"
+                f"&max_price={p + 1}&limit=20",
+                None,
+            ),
+        ),
+        Scenario(
+            "search_name",
+            lambda i, rng: (
+                "GET",
+                f"/products/search?name_prefix=product%20{rng.randrange(10)}&limit=20",
+                None,
+            ),
+        ),
+        Scenario("latest", lambda i, rng: ("GET", "/products/latest?limit=20", None)),
+        Scenario(
+            "stats",
+            lambda i, rng: ("GET", "/products/stats", None),
+            expected_status=200 if stats_enabled else 404,
+        ),
+        Scenario(
+            "update",
+            lambda i, rng: (
+                "PATCH",
+                f"/products/{_product_id(products, rng)}",
+                {"price": str(rng.randrange(10_000) / 100)},
+            ),
+        ),
+        Scenario(
+            "delete",
+            lambda i, rng: ("DELETE", f"/products/load-{i:08}", None),
+            expected_status=204,
+        ),
+    ]
+
+
+class DynamoDBCalls:
+    """DynamoDB API の呼び出し回数を数える"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = threading.Lock()
+        emitters = {}
+        for model in (Product, ProductStats):
+            for client in (
+                model._dynamodb_client(),
+                model._dynamodb_resource().meta.client,
+            ):
+                emitters[id(client.meta.events)] = client.meta.events
+        for events in emitters.values():
+            events.register("before-call.dynamodb", self)
+
+    def __call__(self, **kwargs) -> None:
+        with self._lock:
+            self.count += 1
+
+
+async def run_scenario(
+    scenario: Scenario, requests: int, concurrency: int, calls: DynamoDBCalls
+) -> dict:
+    count = max(1, round(requests * scenario.weight))
+    rng = random.Random(scenario.name)
+    planned = [scenario.make_request(i, rng) for i in range(count)]
+    latencies: list[float] = []
+    errors = 0
+    # 例外は 500 として数え、1 件の失敗で計測全体を止めない
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+
+        async def worker(indexes: range) -> None:
+            nonlocal errors
+            for i in indexes:
+                method, path, body = planned[i]
+                start = time.perf_counter()
+                resp = await client.request(method, path, json=body)
+                latencies.append(time.perf_counter() - start)
+                if resp.status_code != scenario.expected_status:
+                    errors += 1
+
+        workers = min(concurrency, count)
+        calls_before = calls.count
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(worker(range(w, count, workers)) for w in range(workers))
+        )
+        seconds = time.perf_counter() - start
+
+    cuts = statistics.quantiles(latencies, n=100) if count > 1 else latencies * 99
+    return {
+        "requests": count,
+        "concurrency": workers,
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(count / seconds, 1),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+        "dynamodb_calls_per_request": round((calls.count - calls_before) / count, 2),
+    }
+
+
+def regressions(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """ベースラインより悪化したルートの説明を返す"""
+    found = []
+    for name, run in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        if run["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            found.append(f"{name}: p95 {base['p95_ms']}ms -> {run['p95_ms']}ms")
+        rps, base_rps = run["requests_per_second"], base["requests_per_second"]
+        if rps < base_rps * (1 - max_regression):
+            found.append(f"{name}: req/s {base_rps} -> {rps}")
+        per_request = run["dynamodb_calls_per_request"]
+        base_per_request = base["dynamodb_calls_per_request"]
+        if per_request > base_per_request + _CALLS_TOLERANCE:
+            found.append(
+                f"{name}: DynamoDB calls/request {base_per_request} -> {per_request}"
+            )
+    return found
+
+
+def enable_stats(endpoint_url: str, table_name: str) -> None:
+    """集計を有効にし、ベンチマーク用の集計テーブルを作り直す"""
+    models.PRODUCT_STATS_ENABLED = True
+    ProductStats.__table_host__ = endpoint_url
+    ProductStats.__table_name__ = f"{table_name}-stats"
+    ProductStats._clear_boto3_state()
+    client = ProductStats._dynamodb_client()
+    if ProductStats.__table_name__ in client.list_tables()["TableNames"]:
+        client.delete_table(TableName=ProductStats.__table_name__)
+        client.get_waiter("table_not_exists").wait(
+            TableName=ProductStats.__table_name__
+        )
+    client.create_table(
+        TableName=ProductStats.__table_name__, **ProductStats.table_definition()
+    )
+    client.get_waiter("table_exists").wait(TableName=ProductStats.__table_name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--scenarios", nargs="+", help="実行するシナリオ名")
+    parser.add_argument("--stats", action="store_true", help="集計を有効にする")
+    parser.add_argument("--baseline", help="比較する以前の結果 (JSON)")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with dynamodb_endpoint(args.endpoint_url) as endpoint_url:
+        use_table(endpoint_url, args.table_name)
+        recreate_table(args.table_name)
+        seed_products(args.products)
+        if args.stats:
+            enable_stats(endpoint_url, args.table_name)
+            stats.rebuild()
+        calls = DynamoDBCalls()
+
+        results: dict = {
+            "endpoint_url": endpoint_url,
+            "products": args.products,
+            "config": {
+                "product_cache_max_size": models.PRODUCT_CACHE_MAX_SIZE,
+                "product_read_batch_window_ms": models.PRODUCT_READ_BATCH_WINDOW_MS,
+                "product_stats_enabled": stats.enabled(),
+            },
+            "scenarios": {},
+        }
+        for scenario in scenarios(args.products, stats.enabled()):
+            if args.scenarios and scenario.name not in args.scenarios:
+                continue
+            on_moto = args.endpoint_url is None
+            concurrency = 1 if scenario.serial_on_moto and on_moto else args.concurrency
+            results["scenarios"][scenario.name] = asyncio.run(
+                run_scenario(scenario, args.requests, concurrency, calls)
+            )
+        write_results(args.output, results)
+
+    failures = [
+        f"{name}: {run['errors']} unexpected responses"
+        for name, run in results["scenarios"].items()
+        if run["errors"]
+    ]
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures += regressions(results, baseline, args.max_regression)
+    if failures:
+        raise SystemExit("Regressions:\n" + "\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
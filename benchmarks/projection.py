@@ -0,0 +1,93 @@
+"""?fields= による射影の効果 (DynamoDB からの転送量・レスポンスサイズ・時間)
+
+uv run python -m benchmarks.projection --products 5000 --description-bytes 2000
+
+説明文の大きい商品を投入し、全件をページ送りで一覧する時間と転送量を
+全フィールドと fields=name,price で比べる。DynamoDB の RCU はアイテム全体の
+サイズで計算されるため射影では減らない点に注意 (減るのは転送量と変換コスト)。
+"""
+
+import argparse
+
+from fastapi.testclient import TestClient
+
+from api.batch import batch_put
+from api.main import app
+from api.models import Product
+from benchmarks.common import add_common_arguments
+from benchmarks.common import dynamodb_endpoint
+from benchmarks.common import make_item
+from benchmarks.common import recreate_table
+from benchmarks.common import stopwatch
+from benchmarks.common import use_table
+from benchmarks.common import write_results
+
+
+def count_bytes() -> dict:
+    """DynamoDB から受け取ったレスポンスボディのバイト数を数える"""
+    received = {"bytes": 0}
+
+    def record(http_response, **kwargs):
+        received["bytes"] += len(http_response.content)
+
+    Product._dynamodb_resource().meta.client.meta.events.register(
+        "after-call.dynamodb", record
+    )
+    return received
+
+
+def list_all(client: TestClient, params: dict) -> tuple[int, int]:
+    """カーソルを辿って全ページを取得し、(件数, レスポンスバイト数) を返す"""
+    items = size = 0
+    cursor = None
+    while True:
+        resp = client.get("/products/", params={**params, "cursor": cursor or ""})
+        assert resp.status_code == 200
+        items += len(resp.json())
+        size += len(resp.content)
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            return items, size
+
+
+def run(mode: str, params: dict, received: dict) -> dict:
+    client = TestClient(app)
+    received["bytes"] = 0
+    with stopwatch() as elapsed:
+        items, size = list_all(client, params)
+    return {
+        "mode": mode,
+        "items": items,
+        "dynamodb_response_bytes": received["bytes"],
+        "api_response_bytes": size,
+        "seconds": round(elapsed["seconds"], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--description-bytes", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with dynamodb_endpoint(args.endpoint_url) as endpoint_url:
+        use_table(endpoint_url, args.table_name)
+        recreate_table(args.table_name)
+        batch_put(
+            {**make_item(i), "description": "x" * args.description_bytes}
+            for i in range(args.products)
+        )
+        received = count_bytes()
+
+        limit = {"limit": args.page_size}
+        runs = [
+            run("all_fields", limit, received),
+            run("fields=name,price", {**limit, "fields": "name,price"}, received),
+        ]
+        write_results(args.output, {"endpoint_url": endpoint_url, "runs": runs})
+
+
+if __name__ == "__main__":
+    main()
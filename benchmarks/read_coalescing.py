@@ -0,0 +1,103 @@
+"""同時読み取りの集約 (single-flight / BatchGetItem) による DynamoDB 呼び出し数の比較
+
+uv run python -m benchmarks.read_coalescing --requests 2000 --concurrency 32
+"""
+
+import argparse
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from api import repository
+from api.coalesce import BatchLoader
+from api.coalesce import SingleFlight
+from api.main import app
+from api.models import Product
+from benchmarks.common import add_common_arguments
+from benchmarks.common import dynamodb_endpoint
+from benchmarks.common import make_item
+from benchmarks.common import recreate_table
+from benchmarks.common import seed_products
+from benchmarks.common import stopwatch
+from benchmarks.common import use_table
+from benchmarks.common import write_results
+
+
+class NoFlight(SingleFlight):
+    """集約を行わない比較用の実装"""
+
+    def do(self, key, fn):
+        return fn()
+
+
+def count_calls() -> list[str]:
+    calls: list[str] = []
+    Product._dynamodb_resource().meta.client.meta.events.register(
+        "before-call.dynamodb", lambda model, **kwargs: calls.append(model.name)
+    )
+    return calls
+
+
+def run(mode: str, paths: list[str], concurrency: int, calls: list[str]) -> dict:
+    client = TestClient(app)
+    calls.clear()
+    with stopwatch() as elapsed:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            statuses = list(executor.map(lambda p: client.get(p).status_code, paths))
+    assert set(statuses) == {200}
+    return {
+        "mode": mode,
+        "requests": len(paths),
+        "dynamodb_calls": len(calls),
+        "calls_per_request": round(len(calls) / len(paths), 3),
+        "requests_per_second": round(len(paths) / elapsed["seconds"]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--hot-products", type=int, default=5)
+    parser.add_argument("--hot-ratio", type=float, default=0.8)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    # 一部の商品に読み取りが偏ったアクセスパターン
+    rng = random.Random(0)
+    ids = [make_item(i)["product_id"] for i in range(args.products)]
+    paths = [
+        "/products/"
+        + (
+            rng.choice(ids[: args.hot_products])
+            if rng.random() < args.hot_ratio
+            else rng.choice(ids)
+        )
+        for _ in range(args.requests)
+    ]
+
+    with dynamodb_endpoint(args.endpoint_url) as endpoint_url:
+        use_table(endpoint_url, args.table_name)
+        recreate_table(args.table_name)
+        seed_products(args.products)
+        calls = count_calls()
+
+        repository.product_reads = NoFlight()
+        baseline = run("none", paths, args.concurrency, calls)
+        repository.product_reads = SingleFlight()
+        single_flight = run("single_flight", paths, args.concurrency, calls)
+        repository.product_loader = BatchLoader(
+            repository._batch_get, window_seconds=args.window_ms / 1000
+        )
+        batched = run("single_flight+batch_get", paths, args.concurrency, calls)
+        write_results(
+            args.output,
+            {"endpoint_url": endpoint_url, "runs": [baseline, single_flight, batched]},
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""並列セグメント Scan のベンチマーク (1 セグメント vs N セグメント)
+
+uv run python -m benchmarks.scan_segments --items 100000 --segments 1 4 8
+"""
+
+import argparse
+
+from api.scan import scan_segments
+from benchmarks.common import add_common_arguments
+from benchmarks.common import dynamodb_endpoint
+from benchmarks.common import recreate_table
+from benchmarks.common import seed_products
+from benchmarks.common import stopwatch
+from benchmarks.common import use_table
+from benchmarks.common import write_results
+
+
+def run_scan(total_segments: int, per_page: int | None) -> dict:
+    with stopwatch() as elapsed:
+        count = sum(
+            len(page) for page in scan_segments(total_segments, per_page=per_page)
+        )
+    return {
+        "segments": total_segments,
+        "items": count,
+        "seconds": round(elapsed["seconds"], 3),
+        "items_per_second": round(count / elapsed["seconds"]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--per-page", type=int, default=None)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    with dynamodb_endpoint(args.endpoint_url) as endpoint_url:
+        use_table(endpoint_url, args.table_name)
+        if not args.skip_seed:
+            recreate_table(args.table_name)
+            with stopwatch() as seeding:
+                seed_products(args.items)
+            print(f"seeded {args.items} items in {seeding['seconds']:.1f}s")
+
+        runs = [run_scan(n, args.per_page) for n in args.segments]
+        baseline = runs[0]["seconds"]
+        for run in runs:
+            run["speedup"] = round(baseline / run["seconds"], 2)
+        write_results(args.output, {"endpoint_url": endpoint_url, "scans": runs})
+
+
+if __name__ == "__main__":
+    main()
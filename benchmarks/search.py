@@ -0,0 +1,175 @@
+"""GSI への Query と Scan の比較 (読み取り件数・消費キャパシティ・時間)
+
+uv run python -m benchmarks.search --products 20000 --min-price 10 --max-price 12
+
+- 価格帯の検索: 価格の GSI を shard ごとに Query する検索
+  (GET /products/search と同じ処理) と、テーブル全体のフィルタ付き Scan
+- 新着順の先頭ページ: 作成日時の GSI への Query (GET /products/latest と同じ処理) と、
+  テーブル全体を Scan してから作成日時で並べ替える方法
+DynamoDB の読み取りキャパシティはフィルタ前に読んだアイテムのサイズで決まるため、
+ConsumedCapacity (ReturnConsumedCapacity=TOTAL) と、読んだ件数 (ScannedCount) と
+平均アイテムサイズから見積もった RCU (結果整合性読み込み) を両方記録する。
+moto は ConsumedCapacity に固定値を返すため、moto では見積もりの方を参照する。
+"""
+
+import argparse
+import math
+from decimal import Decimal
+
+from dyntastic import A
+
+from api.models import Product
+from api.search import latest_products
+from api.search import search_products
+from benchmarks.common import add_common_arguments
+from benchmarks.common import dynamodb_endpoint
+from benchmarks.common import make_item
+from benchmarks.common import recreate_table
+from benchmarks.common import seed_products
+from benchmarks.common import stopwatch
+from benchmarks.common import use_table
+from benchmarks.common import write_results
+
+# 結果整合性読み込み 1 RCU あたりのバイト数 (4 KB を 0.5 RCU で読む)
+_READ_UNIT_BYTES = 4096
+# 全件 Scan の 1 ページの件数 (1 MB 単位で読むと moto では読み取りタイムアウトになる)
+_SCAN_PAGE_SIZE = 1000
+
+
+def item_size(item: dict) -> int:
+    """DynamoDB のアイテムサイズの概算 (属性名 + 値。数値は 2 桁あたり 1 バイト)"""
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode())
+        if isinstance(value, str):
+            size += len(value.encode())
+        else:
+            size += math.ceil(len(str(value).lstrip("-").replace(".", "")) / 2) + 1
+    return size
+
+
+class ReadStats:
+    """Query / Scan の呼び出し回数・読んだ件数・消費キャパシティを集計する"""
+
+    def __init__(self, average_item_bytes: float):
+        self.average_item_bytes = average_item_bytes
+        self.reset()
+        events = Product._dynamodb_resource().meta.client.meta.events
+        for operation in ("Query", "Scan"):
+            events.register(
+                f"before-parameter-build.dynamodb.{operation}", self.request_capacity
+            )
+            events.register(f"after-call.dynamodb.{operation}", self.record)
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.scanned = 0
+        self.consumed_capacity = 0.0
+        self.estimated_rcu = 0.0
+
+    def request_capacity(self, params: dict, **kwargs) -> None:
+        params["ReturnConsumedCapacity"] = "TOTAL"
+
+    def record(self, parsed: dict, **kwargs) -> None:
+        scanned = parsed.get("ScannedCount", 0)
+        self.calls += 1
+        self.scanned += scanned
+        self.consumed_capacity += parsed.get("ConsumedCapacity", {}).get(
+            "CapacityUnits", 0
+        )
+        read_bytes = scanned * self.average_item_bytes
+        self.estimated_rcu += max(math.ceil(read_bytes / _READ_UNIT_BYTES), 1) / 2
+
+    def result(self, mode: str, items: int, seconds: float) -> dict:
+        return {
+            "mode": mode,
+            "items": items,
+            "calls": self.calls,
+            "scanned_items": self.scanned,
+            "consumed_capacity": round(self.consumed_capacity, 1),
+            "estimated_rcu": self.estimated_rcu,
+            "seconds": round(seconds, 3),
+        }
+
+
+def query_index(min_price: Decimal, max_price: Decimal, page_size: int) -> int:
+    items = 0
+    cursor = None
+    while True:
+        products, cursor = search_products(
+            min_price=min_price, max_price=max_price, limit=page_size, cursor=cursor
+        )
+        items += len(products)
+        if cursor is None:
+            return items
+
+
+def filtered_scan(min_price: Decimal, max_price: Decimal, page_size: int) -> int:
+    items = 0
+    last_evaluated_key = None
+    while True:
+        response = Product._dyntastic_call(
+            "scan",
+            FilterExpression=A.price.between(min_price, max_price),
+            Limit=page_size,
+            ExclusiveStartKey=last_evaluated_key,
+        )
+        items += len(response.get("Items", []))
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if not last_evaluated_key:
+            return items
+
+
+def latest_page(page_size: int) -> list[str]:
+    products, _ = latest_products(limit=page_size)
+    return [product.product_id for product in products]
+
+
+def scan_and_sort(page_size: int) -> list[str]:
+    products = list(Product.scan(per_page=_SCAN_PAGE_SIZE))
+    products.sort(key=lambda product: product.created_at, reverse=True)
+    return [product.product_id for product in products[:page_size]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--min-price", type=Decimal, default=Decimal(10))
+    parser.add_argument("--max-price", type=Decimal, default=Decimal(12))
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    with dynamodb_endpoint(args.endpoint_url) as endpoint_url:
+        use_table(endpoint_url, args.table_name)
+        recreate_table(args.table_name)
+        seed_products(args.products)
+        sample = [make_item(i) for i in range(min(args.products, 1000))]
+        stats = ReadStats(sum(map(item_size, sample)) / len(sample))
+
+        runs = []
+        for mode, fn in (("gsi_query", query_index), ("filtered_scan", filtered_scan)):
+            stats.reset()
+            with stopwatch() as elapsed:
+                items = fn(args.min_price, args.max_price, args.page_size)
+            runs.append(stats.result(mode, items, elapsed["seconds"]))
+        assert runs[0]["items"] == runs[1]["items"], "query and scan results differ"
+
+        pages = {}
+        for mode, latest in (
+            ("latest_query", latest_page),
+            ("scan_sort", scan_and_sort),
+        ):
+            stats.reset()
+            with stopwatch() as elapsed:
+                pages[mode] = latest(args.page_size)
+            runs.append(stats.result(mode, len(pages[mode]), elapsed["seconds"]))
+        assert pages["latest_query"] == pages["scan_sort"], "latest pages differ"
+        write_results(
+            args.output,
+            {"endpoint_url": endpoint_url, "products": args.products, "runs": runs},
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""一覧レスポンスのシリアライズ時間の比較 (1k / 10k / 100k 件)
+
+uv run python -m benchmarks.serialization --sizes 1000 10000 100000
+
+- fastapi: response_model (list[ProductResponse]) による検証とシリアライズ
+  (FastAPI がルートの戻り値に対して行う処理そのもの)
+- validate_dump: ProductResponse に検証し直してから dump_json
+- fast: api.serialization (再検証なしで pydantic-core が直接バイト列にする)
+"""
+
+import argparse
+import asyncio
+import timeit
+
+from fastapi.routing import APIRoute
+from fastapi.routing import serialize_response
+from pydantic import TypeAdapter
+
+from api.main import app
+from api.models import Product
+from api.models import ProductResponse
+from api.serialization import dump_products
+from benchmarks.common import make_item
+from benchmarks.common import write_results
+
+_response_adapter = TypeAdapter(list[ProductResponse])
+
+
+def list_response_field():
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.name == "list_products":
+            return route.response_field
+    raise LookupError("list_products route not found")
+
+
+def fastapi_serialize(products: list[Product]) -> bytes:
+    return asyncio.run(
+        serialize_response(
+            field=list_response_field(), response_content=products, dump_json=True
+        )
+    )
+
+
+def validate_dump(products: list[Product]) -> bytes:
+    validated = _response_adapter.validate_python(products, from_attributes=True)
+    return _response_adapter.dump_json(validated)
+
+
+MODES = {
+    "fastapi": fastapi_serialize,
+    "validate_dump": validate_dump,
+    "fast": dump_products,
+}
+
+
+def best_seconds(fn, products: list[Product], repeat: int) -> float:
+    return min(timeit.repeat(lambda: fn(products), number=1, repeat=repeat))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="結果を JSON で書き出すパス")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        products = [Product(**make_item(i)) for i in range(size)]
+        outputs = {mode: fn(products) for mode, fn in MODES.items()}
+        assert len(set(outputs.values())) == 1, "outputs differ between modes"
+
+        timings = {
+            mode: best_seconds(fn, products, args.repeat) for mode, fn in MODES.items()
+        }
+        results.append(
+            {
+                "items": size,
+                "bytes": len(outputs["fast"]),
+                **{f"{mode}_ms": round(t * 1000, 2) for mode, t in timings.items()},
+                "speedup_vs_fastapi": round(timings["fastapi"] / timings["fast"], 1),
+            }
+        )
+    write_results(args.output, {"results": results})
+
+
+if __name__ == "__main__":
+    main()
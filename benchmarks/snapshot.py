@@ -0,0 +1,162 @@
+"""商品一覧の保持形式の比較 (メモリと 1 ページ分の処理時間)
+
+uv run python -m benchmarks.snapshot --sizes 10000 100000
+
+- products: list(Product.scan()) と同じ Product のリスト
+- snapshot: api.snapshot.ProductSnapshot (型付きの配列の列と並び順)
+
+メモリは tracemalloc で測った保持量を 10 万件あたりに換算して比較する。
+処理時間は 1 ページ (100 件) 分の µs で、Product のリストでは毎回の絞り込み・並べ替え、
+スナップショットでは並び順の二分探索になる。
+- list_page: product_id 順で中ほどのページ
+- price_range: 価格帯 (全体の約 10%) の先頭ページ
+- latest: 作成日時の新しい順の先頭ページ
+"""
+
+import argparse
+import bisect
+import functools
+import gc
+import heapq
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from decimal import Decimal
+
+from api.codec import item_codec
+from api.models import Product
+from api.models import created_at_key
+from api.snapshot import ProductSnapshot
+from benchmarks.common import make_item
+from benchmarks.common import stopwatch
+from benchmarks.common import write_results
+
+PAGE_SIZE = 100
+MIN_PRICE = Decimal(10)
+MAX_PRICE = Decimal("19.99")
+_codec = item_codec(Product)
+
+
+def load_products(size: int) -> list[Product]:
+    # Scan で読んだ場合と同じく、アイテムからモデルにする
+    return [_codec.from_item(make_item(i)) for i in range(size)]  # type: ignore[misc]
+
+
+def build_snapshot(size: int) -> ProductSnapshot:
+    # Product はアイテムごとに列に移し、リストとしては保持しない
+    return ProductSnapshot(_codec.from_item(make_item(i)) for i in range(size))  # type: ignore[misc]
+
+
+def retained_bytes(build: Callable[[], object]) -> tuple[object, int]:
+    """build() の結果が保持しているメモリ (一時的な割り当ては含めない)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def list_pages(products: list[Product], snapshot: ProductSnapshot) -> dict:
+    ids = sorted(product.product_id for product in products)
+    after = ids[len(ids) // 2]
+    # 中ほどの商品の次から始まるページのカーソル
+    cursor = snapshot.list_page(len(ids) // 2 + 1)[1]
+
+    def from_products() -> list[Product]:
+        ordered = sorted(products, key=lambda product: product.product_id)
+        start = bisect.bisect_right(ordered, after, key=lambda p: p.product_id)
+        return ordered[start : start + PAGE_SIZE]
+
+    def from_snapshot() -> list[Product]:
+        return snapshot.list_page(PAGE_SIZE, cursor)[0]
+
+    return {"products": from_products, "snapshot": from_snapshot}
+
+
+def price_range_pages(products: list[Product], snapshot: ProductSnapshot) -> dict:
+    def from_products() -> list[Product]:
+        matched = [p for p in products if MIN_PRICE <= p.price <= MAX_PRICE]
+        return heapq.nsmallest(
+            PAGE_SIZE, matched, key=lambda p: (p.price, p.product_id)
+        )
+
+    def from_snapshot() -> list[Product]:
+        return snapshot.search(
+            min_price=MIN_PRICE, max_price=MAX_PRICE, limit=PAGE_SIZE
+        )[0]
+
+    return {"products": from_products, "snapshot": from_snapshot}
+
+
+def latest_pages(products: list[Product], snapshot: ProductSnapshot) -> dict:
+    def from_products() -> list[Product]:
+        return heapq.nlargest(
+            PAGE_SIZE, products, key=lambda p: created_at_key(p.created_at)
+        )
+
+    def from_snapshot() -> list[Product]:
+        return snapshot.latest(limit=PAGE_SIZE)[0]
+
+    return {"products": from_products, "snapshot": from_snapshot}
+
+
+def compare(modes: dict[str, Callable[[], list[Product]]], repeat: int) -> dict:
+    outputs = {mode: fn() for mode, fn in modes.items()}
+    # 同じ価格・作成日時の並びは実装ごとに異なり得るため、ID の集合で比べる
+    ids = [{p.product_id for p in output} for output in outputs.values()]
+    assert all(found == ids[0] for found in ids), "outputs differ"
+    timings = {
+        mode: min(timeit.repeat(fn, number=1, repeat=repeat))
+        for mode, fn in modes.items()
+    }
+    return {
+        **{f"{mode}_us": round(seconds * 1e6, 1) for mode, seconds in timings.items()},
+        "speedup": round(timings["products"] / timings["snapshot"], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="結果を JSON で書き出すパス")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        products, products_bytes = retained_bytes(
+            functools.partial(load_products, size)
+        )
+        snapshot, snapshot_bytes = retained_bytes(
+            functools.partial(build_snapshot, size)
+        )
+        assert isinstance(products, list) and isinstance(snapshot, ProductSnapshot)
+        with stopwatch() as build:
+            ProductSnapshot(products)
+        per_100k = 100_000 / size / 2**20
+        results.append(
+            {
+                "items": size,
+                "memory_per_100k_mib": {
+                    "products": round(products_bytes * per_100k, 1),
+                    "snapshot": round(snapshot_bytes * per_100k, 1),
+                    "ratio": round(products_bytes / snapshot_bytes, 1),
+                },
+                "snapshot_build_seconds": round(build["seconds"], 2),
+                "list_page": compare(list_pages(products, snapshot), args.repeat),
+                "price_range": compare(
+                    price_range_pages(products, snapshot), args.repeat
+                ),
+                "latest": compare(latest_pages(products, snapshot), args.repeat),
+            }
+        )
+        del products, snapshot
+    write_results(args.output, {"results": results})
+
+
+if __name__ == "__main__":
+    main()
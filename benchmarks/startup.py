@@ -0,0 +1,131 @@
+"""Lambda のコールドスタート計測 (import 時間と初回・2 回目以降のリクエスト時間)
+
+uv run python -m benchmarks.startup --runs 5
+
+新しいコンテナを模擬するため、計測ごとに新しい Python プロセスで
+api.lambda_handler を import し、同じ GET リクエストを連続で呼び出す。
+あわせて python -X importtime で api.main の import に時間のかかるモジュールを集計する。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess  # nosec B404
+import sys
+
+from benchmarks.common import add_common_arguments
+from benchmarks.common import dynamodb_endpoint
+from benchmarks.common import make_item
+from benchmarks.common import recreate_table
+from benchmarks.common import seed_products
+from benchmarks.common import use_table
+from benchmarks.common import write_results
+
+# 子プロセスで実行する計測コード (新しいコンテナでの 1 回分)
+_COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+from api.lambda_handler import handler
+imported = time.perf_counter()
+event = json.loads(sys.argv[1])
+timings = []
+for _ in range(int(sys.argv[2])):
+    begin = time.perf_counter()
+    response = handler(event, None)
+    assert response["statusCode"] == 200, response
+    timings.append(time.perf_counter() - begin)
+print(json.dumps({"import": imported - start, "requests": timings}))
+"""
+
+
+def http_api_event(path: str) -> dict:
+    return {
+        "version": "2.0",
+        "rawPath": path,
+        "rawQueryString": "",
+        "headers": {},
+        "requestContext": {"http": {"method": "GET"}},
+        "isBase64Encoded": False,
+    }
+
+
+def cold_start(env: dict, event: dict, requests: int) -> dict:
+    result = subprocess.run(  # nosec B603
+        [sys.executable, "-c", _COLD_START, json.dumps(event), str(requests)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def import_profile(env: dict, module: str, top: int) -> list[dict]:
+    """-X importtime の出力から累積時間の大きいモジュールを返す"""
+    result = subprocess.run(  # nosec B603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        rows.append(
+            {
+                "module": name.strip(),
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            }
+        )
+    return sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)[:top]
+
+
+def ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_common_arguments(parser)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    with dynamodb_endpoint(args.endpoint_url) as endpoint_url:
+        use_table(endpoint_url, args.table_name)
+        recreate_table(args.table_name)
+        seed_products(1)
+
+        env = {
+            **os.environ,
+            "DYNAMODB_ENDPOINT_URL": endpoint_url,
+            "DYNAMODB_PRODUCT_TABLE_NAME": args.table_name,
+        }
+        event = http_api_event(f"/products/{make_item(0)['product_id']}")
+        runs = [cold_start(env, event, args.requests) for _ in range(args.runs)]
+
+        write_results(
+            args.output,
+            {
+                "endpoint_url": endpoint_url,
+                "runs": args.runs,
+                "handler_import_ms": ms(statistics.median(r["import"] for r in runs)),
+                "first_request_ms": ms(
+                    statistics.median(r["requests"][0] for r in runs)
+                ),
+                "warm_request_ms": ms(
+                    statistics.median(t for r in runs for t in r["requests"][1:])
+                ),
+                "slowest_imports": import_profile(env, "api.main", args.top),
+            },
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,53 @@ until aws dynamodb list-tables --endpoint-url http://dynamodb-local:8000 > /dev/
 done
 
 # テーブル作成（存在する場合はエラー無視）
+# GSI は api/models.py の Product.table_definition() と同じ定義にする
 aws dynamodb create-table \
     --table-name products \
-    --attribute-definitions AttributeName=product_id,AttributeType=S \
+    --attribute-definitions \
+        AttributeName=product_id,AttributeType=S \
+        AttributeName=shard,AttributeType=N \
+        AttributeName=price,AttributeType=N \
+        AttributeName=name_key,AttributeType=S \
+        AttributeName=created_key,AttributeType=S \
     --key-schema AttributeName=product_id,KeyType=HASH \
+    --global-secondary-indexes '[
+        {
+            "IndexName": "price-index",
+            "KeySchema": [
+                {"AttributeName": "shard", "KeyType": "HASH"},
+                {"AttributeName": "price", "KeyType": "RANGE"}
+            ],
+            "Projection": {"ProjectionType": "ALL"}
+        },
+        {
+            "IndexName": "name-index",
+            "KeySchema": [
+                {"AttributeName": "shard", "KeyType": "HASH"},
+                {"AttributeName": "name_key", "KeyType": "RANGE"}
+            ],
+            "Projection": {"ProjectionType": "ALL"}
+        },
+        {
+            "IndexName": "created-index",
+            "KeySchema": [
+                {"AttributeName": "shard", "KeyType": "HASH"},
+                {"AttributeName": "created_key", "KeyType": "RANGE"}
+            ],
+            "Projection": {"ProjectionType": "ALL"}
+        }
+    ]' \
     --billing-mode PAY_PER_REQUEST \
     --endpoint-url http://dynamodb-local:8000 \
     || true
 
-echo "DynamoDB table 'products' is ready."
+# 集計用テーブル (PRODUCT_STATS_ENABLED=true の場合に使用)
+aws dynamodb create-table \
+    --table-name product-stats \
+    --attribute-definitions AttributeName=shard,AttributeType=N \
+    --key-schema AttributeName=shard,KeyType=HASH \
+    --billing-mode PAY_PER_REQUEST \
+    --endpoint-url http://dynamodb-local:8000 \
+    || true
+
+echo "DynamoDB tables 'products' and 'product-stats' are ready."
@@ -0,0 +1,71 @@
+import functools
+import threading
+
+import boto3
+import pytest
+from moto import mock_aws
+from moto.dynamodb.models import DynamoDBBackend
+
+from api import models
+from api.models import Product
+from api.models import ProductStats
+
+
+@pytest.fixture
+def products_table():
+    with mock_aws():
+        # テーブル作成
+        dynamodb = boto3.resource("dynamodb")
+        yield dynamodb.create_table(TableName="products", **Product.table_definition())
+
+
+@pytest.fixture
+def atomic_writes(monkeypatch):
+    """moto の条件付き書き込みを DynamoDB と同様にアイテム単位で不可分にする
+
+    moto は条件の評価と書き込みの間でスレッドが切り替わり得るため、
+    並行書き込みのテストでは書き込み系の API をロックで直列化する。
+    transact_write_items は内部で put_item などを呼ぶため再入可能なロックを使う。
+    """
+    lock = threading.RLock()
+
+    def locked(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with lock:
+                return method(*args, **kwargs)
+
+        return wrapper
+
+    for name in ("put_item", "update_item", "delete_item", "transact_write_items"):
+        monkeypatch.setattr(
+            DynamoDBBackend, name, locked(getattr(DynamoDBBackend, name))
+        )
+
+
+@pytest.fixture
+def product_stats(products_table, monkeypatch):
+    """商品数・価格の集計を有効にし、集計用テーブルを作成する"""
+    monkeypatch.setattr(models, "PRODUCT_STATS_ENABLED", True)
+    boto3.resource("dynamodb").create_table(
+        TableName=ProductStats.__table_name__, **ProductStats.table_definition()
+    )
+
+
+@pytest.fixture
+def dynamodb_calls(products_table):
+    """Product から発行された DynamoDB API の操作名を記録する"""
+    calls: list[str] = []
+
+    def record(model, **kwargs):
+        calls.append(model.name)
+
+    clients = {
+        Product._dynamodb_resource().meta.client,
+        Product._dynamodb_client(),
+    }
+    for client in clients:
+        client.meta.events.register("before-call.dynamodb", record)
+    yield calls
+    for client in clients:
+        client.meta.events.unregister("before-call.dynamodb", record)
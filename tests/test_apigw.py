@@ -0,0 +1,146 @@
+import json
+import subprocess  # nosec B404
+import sys
+
+import pytest
+
+from api import apigw
+from api import lambda_handler
+from api.models import Product
+
+PRODUCT = {"product_id": "p1", "name": "Prod1", "description": "Desc1", "price": 10}
+
+
+@pytest.fixture
+def reset_clients(products_table):
+    # モックテーブル用のクライアントで初期化し直す
+    Product._clear_boto3_state()
+    lambda_handler._app.cache_clear()
+    yield
+    lambda_handler._app.cache_clear()
+
+
+def event(method: str, path: str, query: str = "", body=None, headers=None) -> dict:
+    return {
+        "version": "2.0",
+        "rawPath": path,
+        "rawQueryString": query,
+        "headers": {"content-type": "application/json", **(headers or {})},
+        "requestContext": {"http": {"method": method}},
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+def invoke(handler, *args, **kwargs) -> tuple[int, object]:
+    response = handler(event(*args, **kwargs), None)
+    body = json.loads(response["body"]) if response["body"] else None
+    return response["statusCode"], body
+
+
+# 正常系: ASGI ブリッジと同じステータス・レスポンスを返す
+@pytest.mark.usefixtures("reset_clients")
+def test_matches_asgi_bridge():
+    status, created = invoke(apigw.handler, "POST", "/products/", body=PRODUCT)
+    assert status == 200
+    assert created == invoke(lambda_handler.handler, "GET", "/products/p1")[1]
+
+    requests = [
+        ("POST", "/products/", "", PRODUCT),
+        ("POST", "/products/", "", {"name": "no price"}),
+        ("GET", "/products/p1"),
+        ("GET", "/products/missing"),
+        ("GET", "/products/", "limit=0"),
+        ("GET", "/products/", "cursor=broken"),
+        ("GET", "/products/", "ids=p1,missing"),
+        ("GET", "/products/p1", "fields=name,price"),
+        ("GET", "/products/", "fields=description"),
+        ("GET", "/products/", "fields=secret"),
+        ("GET", "/products/", "ids=p1&fields=name"),
+        ("PATCH", "/products/p1", "", {}),
+        ("PATCH", "/products/missing", "", {"price": 5}),
+        ("DELETE", "/products/missing"),
+    ]
+    for request in requests:
+        expected = invoke(lambda_handler.handler, *request)
+        assert invoke(apigw.handler, *request) == expected, request
+
+    # 更新・削除は状態を変えるため、結果を読み直して比べる
+    updated = invoke(apigw.handler, "PATCH", "/products/p1", body={"price": 5})
+    assert updated == invoke(lambda_handler.handler, "GET", "/products/p1")
+    assert updated[1]["price"] == "5"  # type: ignore[index]
+    assert invoke(apigw.handler, "DELETE", "/products/p1") == (204, None)
+    assert invoke(lambda_handler.handler, "GET", "/products/p1")[0] == 404
+
+
+# 正常系: 一覧はページサイズとカーソルを解釈する
+@pytest.mark.usefixtures("reset_clients")
+def test_list_pagination():
+    for i in range(3):
+        invoke(
+            apigw.handler, "POST", "/products/", body={**PRODUCT, "product_id": f"p{i}"}
+        )
+
+    response = apigw.handler(event("GET", "/products/", "limit=2"), None)
+    assert len(json.loads(response["body"])) == 2
+    cursor = response["headers"]["x-next-cursor"]
+
+    status, rest = invoke(apigw.handler, "GET", "/products/", f"cursor={cursor}")
+    assert status == 200
+    assert len(rest) == 1
+
+
+# 正常系: 対象外のルートは ASGI ブリッジに委譲する
+@pytest.mark.usefixtures("reset_clients")
+def test_delegates_other_routes():
+    status, body = invoke(apigw.handler, "GET", "/health")
+    assert (status, body) == (200, {"status": "healthy"})
+
+    invoke(apigw.handler, "POST", "/products/", body=PRODUCT)
+    response = apigw.handler(event("GET", "/products/", "stream=true"), None)
+    assert response["headers"]["content-type"] == "application/x-ndjson"
+    assert json.loads(response["body"])["product_id"] == "p1"
+
+    # /products/search は商品 ID として扱わず検索に委譲する
+    status, body = invoke(apigw.handler, "GET", "/products/search", "name_prefix=p")
+    assert (status, [item["product_id"] for item in body]) == (200, ["p1"])
+
+
+# 正常系: 直接処理するルートだけなら FastAPI を import しない
+def test_does_not_import_fastapi():
+    code = "import sys, api.apigw; print('fastapi' in sys.modules)"
+    result = subprocess.run(  # nosec B603
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
+
+
+# 正常系: ETag・条件付きリクエストも ASGI ブリッジと同じに扱う
+@pytest.mark.usefixtures("reset_clients")
+def test_conditional_requests():
+    created = apigw.handler(event("POST", "/products/", body=PRODUCT), None)
+    etag = created["headers"]["etag"]
+    assert etag.startswith('"1-')
+
+    for path in ("/products/p1", "/products/"):
+        page_etag = apigw.handler(event("GET", path), None)["headers"]["etag"]
+        assert (
+            page_etag
+            == lambda_handler.handler(event("GET", path), None)["headers"]["etag"]
+        )
+        cached = apigw.handler(
+            event("GET", path, headers={"if-none-match": page_etag}), None
+        )
+        assert (cached["statusCode"], cached["body"]) == (304, "")
+
+    stale = event(
+        "PATCH",
+        "/products/p1",
+        body={"price": 1},
+        headers={"if-match": etag.replace('"1-', '"0-')},
+    )
+    assert apigw.handler(stale, None)["statusCode"] == 412
+    fresh = event(
+        "PATCH", "/products/p1", body={"price": 1}, headers={"if-match": etag}
+    )
+    assert apigw.handler(fresh, None)["headers"]["etag"] == etag.replace('"1-', '"2-')
@@ -0,0 +1,94 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+from api import async_repository
+
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id")
+
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    monkeypatch.setattr(async_repository, "DYNAMODB_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(async_repository, "_executor", None)
+    yield
+    async_repository.executor().shutdown()
+
+
+# 正常系: contextvars がスレッドプール側に引き継がれる
+def test_run_propagates_context():
+    async def main():
+        request_id.set("req-1")
+        return await async_repository.run(request_id.get)
+
+    assert asyncio.run(main()) == "req-1"
+
+
+# 正常系: 同時実行数はプールの上限で抑えられる
+def test_run_is_bounded(small_pool):
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def work():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.pop()
+
+    async def main():
+        await asyncio.gather(*(async_repository.run(work) for _ in range(6)))
+
+    asyncio.run(main())
+    assert max(peak) == 2
+
+
+# 正常系: 初回の同時利用でもスレッドプールは 1 つだけ作る
+def test_executor_created_once(small_pool, monkeypatch):
+    created = []
+    pool_class = async_repository.ThreadPoolExecutor
+
+    def slow_pool(**kwargs):
+        time.sleep(0.05)
+        created.append(pool_class(**kwargs))
+        return created[-1]
+
+    monkeypatch.setattr(async_repository, "ThreadPoolExecutor", slow_pool)
+    pools = []
+    threads = [
+        threading.Thread(target=lambda: pools.append(async_repository.executor()))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert all(pool is created[0] for pool in pools)
+
+
+# 正常系: 途中で打ち切ると元のイテレータも閉じられる
+def test_iterate_closes_iterator():
+    closed = []
+
+    def numbers():
+        try:
+            yield from range(10)
+        finally:
+            closed.append(True)
+
+    async def main():
+        items = []
+        async for item in async_repository.iterate(numbers()):
+            items.append(item)
+            if item == 2:
+                break
+        return items
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    assert closed == [True]
@@ -0,0 +1,61 @@
+import pytest
+
+from api import batch
+from api.batch import UnprocessedItemsError
+from api.batch import batch_delete
+from api.batch import batch_put
+from api.models import Product
+
+
+def _items(count: int) -> list[dict]:
+    return [
+        {"product_id": f"p{i:03}", "name": f"Prod{i}", "price": i} for i in range(count)
+    ]
+
+
+# 正常系: 25 件を超える書き込み・削除をまとめて処理できる
+def test_batch_put_and_delete(products_table):
+    assert batch_put(_items(120), max_workers=1) == 120
+    assert products_table.scan()["Count"] == 120
+
+    keys = ({"product_id": f"p{i:03}"} for i in range(100))
+    assert batch_delete(keys, max_workers=2) == 100
+    remaining = {item["product_id"] for item in products_table.scan()["Items"]}
+    assert remaining == {f"p{i:03}" for i in range(100, 120)}
+
+
+# 正常系: UnprocessedItems はバックオフ後に再送される
+def test_unprocessed_items_are_retried(products_table, monkeypatch):
+    resource = Product._dynamodb_resource()
+    original = resource.batch_write_item
+    calls = []
+
+    def flaky_batch_write_item(RequestItems):
+        calls.append(RequestItems)
+        if len(calls) == 1:
+            # 1 回目は最後の 1 件だけ未処理として返す
+            table, requests = next(iter(RequestItems.items()))
+            original(RequestItems={table: requests[:-1]})
+            return {"UnprocessedItems": {table: requests[-1:]}}
+        return original(RequestItems=RequestItems)
+
+    monkeypatch.setattr(resource, "batch_write_item", flaky_batch_write_item)
+    monkeypatch.setattr(batch, "_backoff", lambda attempt: 0)
+
+    assert batch_put(_items(3)) == 3
+    assert len(calls) == 2
+    assert products_table.scan()["Count"] == 3
+
+
+# 異常系: リトライ上限を超えると例外
+def test_unprocessed_items_give_up(products_table, monkeypatch):
+    resource = Product._dynamodb_resource()
+    monkeypatch.setattr(
+        resource,
+        "batch_write_item",
+        lambda RequestItems: {"UnprocessedItems": RequestItems},
+    )
+    monkeypatch.setattr(batch, "_backoff", lambda attempt: 0)
+
+    with pytest.raises(UnprocessedItemsError):
+        batch_put(_items(30))
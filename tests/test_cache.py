@@ -0,0 +1,149 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import repository
+from api.cache import TTLCache
+from api.main import app
+from api.models import Product
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+# 正常系: 件数上限を超えると最も古く参照されたものから追い出す
+def test_lru_eviction():
+    cache: TTLCache[str, int] = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a を最近参照済みにする
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {
+        "hits": 3,
+        "misses": 1,
+        "evictions": 1,
+        "size": 2,
+        "max_size": 2,
+    }
+
+
+# 正常系: 有効期限を過ぎたエントリはミスになる
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache: TTLCache[str, int] = TTLCache(max_size=10, ttl_seconds=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+# 正常系: 上限 0 の場合は無効
+def test_disabled_cache():
+    cache: TTLCache[str, int] = TTLCache(max_size=0, ttl_seconds=60)
+    cache.set("a", 1)
+    assert not cache.enabled
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 0
+
+
+# 正常系: 読み込み開始後に同じキーへ書き込まれた場合、読み込んだ値は保持しない
+def test_set_since_generation():
+    cache: TTLCache[str, int] = TTLCache(max_size=1, ttl_seconds=60)
+    since = cache.generation("a")
+    cache.set("a", 2)
+    cache.set("a", 1, since=since)
+    assert cache.get("a") == 2
+
+    since = cache.generation("a")
+    cache.invalidate("a")
+    cache.set("a", 1, since=since)
+    assert cache.get("a") is None
+
+    # 書き込みの記録を追い出した後も、それ以前に始めた読み込みは保持しない
+    since = cache.generation("a")
+    cache.invalidate("a")
+    cache.invalidate("b")
+    cache.set("a", 1, since=since)
+    assert cache.get("a") is None
+
+    since = cache.generation("a")
+    cache.clear()
+    cache.set("a", 1, since=since)
+    assert cache.get("a") is None
+    cache.set("a", 1, since=cache.generation("a"))
+    assert cache.get("a") == 1
+
+
+@pytest.fixture
+def cached_client(products_table, monkeypatch):
+    cache: TTLCache = TTLCache(max_size=100, ttl_seconds=60)
+    monkeypatch.setattr(repository, "product_cache", cache)
+    yield TestClient(app), cache
+
+
+# 正常系: 2 回目以降の取得はキャッシュから返り、書き込みで無効化される
+def test_read_through_and_invalidation(cached_client, dynamodb_calls):
+    client, cache = cached_client
+    client.post("/products/", json={"product_id": "p1", "name": "A", "price": 1})
+
+    dynamodb_calls.clear()
+    assert client.get("/products/p1").json()["name"] == "A"
+    assert client.get("/products/p1").json()["name"] == "A"
+    assert dynamodb_calls == ["GetItem"]
+    assert cache.stats()["hits"] == 1
+
+    # 更新後は新しい値が返る (UpdateItem の結果で置き換え)
+    client.patch("/products/p1", json={"name": "B"})
+    dynamodb_calls.clear()
+    assert client.get("/products/p1").json()["name"] == "B"
+    assert dynamodb_calls == []
+
+    # 削除後は 404
+    client.delete("/products/p1")
+    assert client.get("/products/p1").status_code == 404
+
+
+# 異常系: 取得中に更新・削除されても、取得した古い商品をキャッシュに残さない
+@pytest.mark.parametrize("write", ["update", "delete"])
+def test_read_during_write(cached_client, monkeypatch, write):
+    client, cache = cached_client
+    client.post("/products/", json={"product_id": "p1", "name": "A", "price": 1})
+    loaded = threading.Event()
+    resume = threading.Event()
+    get = Product.get
+
+    def slow_get(product_id, **kwargs):
+        product = get(product_id, **kwargs)
+        loaded.set()
+        resume.wait(5)
+        return product
+
+    monkeypatch.setattr(Product, "get", slow_get)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        read = executor.submit(repository.get_product, "p1")
+        assert loaded.wait(5)
+        if write == "update":
+            repository.update_product("p1", {"name": "B"})
+        else:
+            repository.delete_product("p1")
+        resume.set()
+        assert read.result().name == "A"
+
+    monkeypatch.setattr(Product, "get", get)
+    if write == "update":
+        assert cache.get("p1").name == "B"
+    else:
+        assert cache.get("p1") is None
+        assert client.get("/products/p1").status_code == 404
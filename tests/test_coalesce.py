@@ -0,0 +1,185 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import repository
+from api.coalesce import BatchLoader
+from api.coalesce import SingleFlight
+from api.main import app
+from api.models import Product
+
+CONCURRENCY = 16
+
+
+def _run_concurrently(fn, args):
+    barrier = threading.Barrier(len(args))
+
+    def call(arg):
+        barrier.wait()
+        return fn(arg)
+
+    with ThreadPoolExecutor(max_workers=len(args)) as executor:
+        return list(executor.map(call, args))
+
+
+# 正常系: 同一キーの同時呼び出しは 1 回だけ実行される
+def test_single_flight_shares_result():
+    flight: SingleFlight[str, int] = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return 42
+
+    results = _run_concurrently(lambda _: flight.do("k", fetch), range(CONCURRENCY))
+    assert results == [42] * CONCURRENCY
+    assert len(calls) == 1
+    # 完了後は改めて実行される
+    assert flight.do("k", lambda: 7) == 7
+
+
+# 異常系: 例外も待機中の呼び出しと共有される
+def test_single_flight_shares_exception():
+    flight: SingleFlight[str, int] = SingleFlight()
+
+    def fail():
+        time.sleep(0.1)
+        raise KeyError("missing")
+
+    def call(_):
+        with pytest.raises(KeyError):
+            flight.do("k", fail)
+
+    _run_concurrently(call, range(4))
+
+
+# 正常系: forget 後の呼び出しは実行中の呼び出しを共有せず、改めて実行する
+def test_single_flight_forget():
+    flight: SingleFlight[str, str] = SingleFlight()
+    started = {name: threading.Event() for name in ["old", "new"]}
+    resume = {name: threading.Event() for name in ["old", "new"]}
+
+    def fetch(name):
+        started[name].set()
+        resume[name].wait(5)
+        return name
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        old = executor.submit(flight.do, "k", lambda: fetch("old"))
+        assert started["old"].wait(5)
+        flight.forget("k")
+        new = executor.submit(flight.do, "k", lambda: fetch("new"))
+        assert started["new"].wait(5)
+        resume["old"].set()
+        assert old.result() == "old"
+        # 古い実行が完了しても、新しい実行中の呼び出しは共有される
+        joined = executor.submit(flight.do, "k", lambda: "unused")
+        time.sleep(0.1)
+        resume["new"].set()
+        assert new.result() == joined.result() == "new"
+
+
+# 正常系: 時間窓内の異なるキーは 1 回の一括取得にまとまる
+def test_batch_loader_merges_keys():
+    batches = []
+
+    def load_many(keys):
+        batches.append(sorted(keys))
+        return {key: key.upper() for key in keys if key != "missing"}
+
+    loader: BatchLoader[str, str] = BatchLoader(load_many, window_seconds=0.05)
+    keys = [f"k{i}" for i in range(10)] + ["missing"]
+    assert _run_concurrently(loader.load, keys) == [k.upper() for k in keys[:-1]] + [
+        None
+    ]
+    assert batches == [sorted(keys)]
+
+
+# 正常系: 件数上限に達すると時間窓を待たずに送信する
+def test_batch_loader_flushes_full_batch():
+    batches = []
+
+    def load_many(keys):
+        batches.append(len(keys))
+        return {key: key for key in keys}
+
+    loader: BatchLoader[int, int] = BatchLoader(
+        load_many, window_seconds=10, max_batch_size=4
+    )
+    start = time.perf_counter()
+    assert sorted(_run_concurrently(loader.load, range(8))) == list(range(8))
+    assert time.perf_counter() - start < 5
+    assert batches == [4, 4]
+
+
+@pytest.fixture
+def slow_reads(products_table, monkeypatch):
+    """DynamoDB の読み取りに遅延を入れ、同時リクエストを重ならせる"""
+    for name in ("get", "batch_get"):
+        original = getattr(Product, name)
+
+        def slow(cls, *args, _original=original, **kwargs):
+            time.sleep(0.05)
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(Product, name, classmethod(slow))
+
+
+# 負荷試験: 同一商品の同時取得で GetItem の回数が減る
+def test_concurrent_reads_of_same_product_are_coalesced(slow_reads, dynamodb_calls):
+    client = TestClient(app)
+    client.post("/products/", json={"product_id": "hot", "name": "Hot", "price": 1})
+
+    dynamodb_calls.clear()
+    statuses = _run_concurrently(
+        lambda _: client.get("/products/hot").status_code, range(CONCURRENCY)
+    )
+    assert statuses == [200] * CONCURRENCY
+    assert dynamodb_calls.count("GetItem") < CONCURRENCY // 2
+
+
+# 負荷試験: 異なる商品の同時取得は BatchGetItem にまとまる
+def test_concurrent_reads_are_batched(slow_reads, dynamodb_calls, monkeypatch):
+    loader = BatchLoader(repository._batch_get, window_seconds=0.05)
+    monkeypatch.setattr(repository, "product_loader", loader)
+    client = TestClient(app)
+    for i in range(CONCURRENCY):
+        client.post("/products/", json={"product_id": f"p{i}", "name": "N", "price": 1})
+
+    dynamodb_calls.clear()
+    paths = [f"/products/p{i}" for i in range(CONCURRENCY)] + ["/products/missing"]
+    statuses = _run_concurrently(lambda path: client.get(path).status_code, paths)
+    assert statuses == [200] * CONCURRENCY + [404]
+    assert "GetItem" not in dynamodb_calls
+    assert dynamodb_calls.count("BatchGetItem") < CONCURRENCY // 2
+
+
+# 正常系: 更新後に到着した取得は、更新前に始まった GetItem の結果を共有しない
+def test_read_after_write_is_not_coalesced(products_table, monkeypatch):
+    client = TestClient(app)
+    client.post("/products/", json={"product_id": "p1", "name": "A", "price": 1})
+    loaded = threading.Event()
+    resume = threading.Event()
+    get = Product.get
+
+    def slow_get(product_id, **kwargs):
+        product = get(product_id, **kwargs)
+        if not loaded.is_set():
+            loaded.set()
+            resume.wait(5)
+        return product
+
+    monkeypatch.setattr(Product, "get", slow_get)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        stale = executor.submit(repository.get_product, "p1")
+        assert loaded.wait(5)
+        client.patch("/products/p1", json={"name": "B"})
+        try:
+            assert client.get("/products/p1").json()["name"] == "B"
+        finally:
+            resume.set()
+        assert stale.result().name == "A"
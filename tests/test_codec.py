@@ -0,0 +1,92 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+from dyntastic import Dyntastic
+from dyntastic.attr import serialize
+from pydantic import BaseModel
+
+from api.codec import ItemCodec
+from api.codec import item_codec
+from api.models import Product
+from api.models import ProductStats
+
+codec = item_codec(Product)
+
+PRODUCTS = [
+    Product(product_id="p1", name="Apple", description="Red", price=Decimal("1.5")),
+    # description なし・名前の GSI から外れる空の名前・タイムゾーンなしの日時
+    Product(product_id="p2", name=" ", price=3, created_at=datetime(2024, 1, 1)),
+]
+
+
+def dyntastic_item(model: BaseModel) -> dict:
+    return serialize(model.model_dump(by_alias=True))
+
+
+def dyntastic_load(item: dict) -> Product:
+    return Dyntastic._dyntastic_load_model.__func__(Product, item)
+
+
+# 正常系: dyntastic の既定の変換と同じアイテムを書き込み、同じモデルを読み込む
+@pytest.mark.parametrize("product", PRODUCTS)
+def test_matches_dyntastic(product: Product):
+    item = codec.to_item(product)
+    assert item == dyntastic_item(product)
+
+    loaded = codec.from_item(item)
+    expected = dyntastic_load(item)
+    assert loaded == expected
+    assert loaded.model_fields_set == expected.model_fields_set
+    assert loaded.name_key == expected.name_key
+    assert loaded.model_dump_json() == expected.model_dump_json()
+
+
+# 正常系: 型付きの属性は TypeSerializer と同じ表現になり、読み戻せる
+@pytest.mark.parametrize("product", PRODUCTS)
+def test_wire_round_trip(product: Product):
+    wire = codec.to_wire(product)
+    serializer = TypeSerializer()
+    expected = {k: serializer.serialize(v) for k, v in codec.to_item(product).items()}
+    assert wire == expected
+    assert codec.from_wire(wire) == product
+
+
+# 正常系: 省略された属性は既定値、文字列で保存された価格は Decimal にする
+def test_defaults_and_legacy_values():
+    product = codec.from_item(
+        {"product_id": "p1", "name": "Old", "price": "5", "created_at": "2024-01-01"}
+    )
+    assert (product.version, product.description) == (1, None)
+    assert product.price == Decimal(5) and isinstance(product.price, Decimal)
+    assert product.model_fields_set == {"product_id", "name", "price", "created_at"}
+
+    # 読み込んだモデルは通常どおり変更・保存できる
+    product.version = 2
+    assert codec.to_item(product)["version"] == 2
+
+
+# 正常系: 必須の属性が欠けたアイテム (GSI の射影など) は dyntastic の処理に任せる
+def test_partial_item():
+    assert codec.from_item({"product_id": "p1", "shard": 1}) is None
+    assert codec.from_wire({"product_id": {"S": "p1"}}) is None
+    product = Product._dyntastic_load_model({"product_id": "p1", "price": 1})
+    assert product._dyntastic_missing_attributes_from_index
+
+
+# 正常系: ProductStats も同じ変換を使う
+def test_product_stats():
+    stats = ProductStats(shard=3, product_count=2, price_total=Decimal("4.5"))
+    stats_codec = item_codec(ProductStats)
+    assert stats_codec.to_item(stats) == dyntastic_item(stats)
+    assert stats_codec.from_wire(stats_codec.to_wire(stats)) == stats
+
+
+# 異常系: 対応していない型のフィールドはモデルの組み立て時に検出する
+def test_unsupported_type():
+    class Tagged(BaseModel):
+        tags: list[str]
+
+    with pytest.raises(TypeError, match="Unsupported attribute type"):
+        ItemCodec(Tagged)
@@ -0,0 +1,92 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from api.export import ExportFormatError
+from api.export import export_products
+from api.export import main
+
+
+@pytest.fixture
+def seeded_products(products_table):
+    with products_table.batch_writer() as writer:
+        for i in range(30):
+            item = {
+                "product_id": f"p{i:02}",
+                "name": f"Prod{i}",
+                "price": i,
+                "created_at": "2025-01-01T00:00:00+00:00",
+            }
+            if i % 2:
+                item["description"] = f'説明, "{i}"'
+            writer.put_item(Item=item)
+    return {f"p{i:02}" for i in range(30)}
+
+
+# 正常系: gzip 圧縮した NDJSON に全件を書き出す
+@pytest.mark.parametrize("total_segments", [1, 4])
+def test_export_ndjson(seeded_products, total_segments):
+    out = io.BytesIO()
+    result = export_products(out, "ndjson", total_segments=total_segments, per_page=7)
+
+    rows = [json.loads(line) for line in gzip.decompress(out.getvalue()).splitlines()]
+    assert {row["product_id"] for row in rows} == seeded_products
+    assert rows[0].keys() == {
+        "product_id",
+        "name",
+        "description",
+        "price",
+        "created_at",
+    }
+    assert result.items == 30
+    assert result.bytes_written == len(out.getvalue())
+    assert result.items_per_second > 0
+
+
+# 正常系: CSV は NDJSON と同じ表現の値を書き出す (圧縮なし)
+def test_export_csv(seeded_products):
+    out = io.BytesIO()
+    result = export_products(out, "csv", compress=False)
+
+    rows = list(csv.DictReader(io.StringIO(out.getvalue().decode())))
+    assert result.items == len(rows) == 30
+    row = next(row for row in rows if row["product_id"] == "p03")
+    assert row == {
+        "product_id": "p03",
+        "name": "Prod3",
+        "description": '説明, "3"',
+        "price": "3",
+        "created_at": "2025-01-01T00:00:00Z",
+    }
+
+
+# 正常系: Parquet (pyarrow がある場合のみ)
+def test_export_parquet(seeded_products):
+    pq = pytest.importorskip("pyarrow.parquet")
+    out = io.BytesIO()
+    result = export_products(out, "parquet", per_page=10)
+
+    table = pq.read_table(io.BytesIO(out.getvalue()))
+    assert result.items == table.num_rows == 30
+    assert set(table.column("product_id").to_pylist()) == seeded_products
+
+
+# 異常系: 未対応の形式
+def test_export_rejects_unknown_format(products_table):
+    with pytest.raises(ExportFormatError):
+        export_products(io.BytesIO(), "xml")
+
+
+# 正常系: コマンドはファイルに書き出し、件数とバイト数を標準エラー出力に書く
+def test_export_command(seeded_products, tmp_path, capsys):
+    path = tmp_path / "products.ndjson.gz"
+    main([str(path), "--format", "ndjson", "--segments", "2"])
+
+    report = json.loads(capsys.readouterr().err)
+    assert report["items"] == 30
+    assert report["bytes_written"] == path.stat().st_size
+    with gzip.open(path) as f:
+        assert len(f.readlines()) == 30
@@ -0,0 +1,42 @@
+import threading
+
+from api import fanout
+from api import repository
+from api import search
+from api.models import Product
+
+
+# 正常系: 複数取得の BatchGetItem は共有のスレッドプールで並列に発行する
+def test_get_products_uses_shared_pool(products_table, monkeypatch):
+    threads = []
+    batch_get = repository._batch_get
+
+    def record(product_ids):
+        threads.append(threading.current_thread().name)
+        return batch_get(product_ids)
+
+    monkeypatch.setattr(repository, "_batch_get", record)
+    Product(product_id="p1", name="A", price=1).save()
+    product_ids = [f"p{i}" for i in range(250)]
+    for _ in range(2):
+        products = repository.get_products(product_ids)
+        assert [p.name for p in products if p is not None] == ["A"]
+
+    assert len(threads) == 6
+    assert all(name.startswith("dynamodb-fanout") for name in threads)
+    assert fanout.executor() is fanout.executor()
+
+
+# 正常系: 検索の shard ごとの Query も共有のスレッドプールで発行する
+def test_search_uses_shared_pool(products_table, monkeypatch):
+    threads = set()
+    call = Product._dyntastic_call
+
+    def record(*args, **kwargs):
+        threads.add(threading.current_thread().name.rsplit("_", 1)[0])
+        return call(*args, **kwargs)
+
+    Product(product_id="p1", name="A", price=1).save()
+    monkeypatch.setattr(Product, "_dyntastic_call", record)
+    assert [p.product_id for p in search.search_products(limit=10)[0]] == ["p1"]
+    assert threads == {"dynamodb-fanout"}
@@ -0,0 +1,138 @@
+import gzip
+import json
+
+import pytest
+
+from api import importer
+from api import stats
+from api.export import export_products
+from api.importer import ImportSourceError
+from api.importer import import_products
+from api.importer import main
+from api.models import Product
+from api.search import search_products
+
+
+def _write_ndjson(path, rows: list) -> str:
+    lines = [row if isinstance(row, str) else json.dumps(row) for row in rows]
+    data = ("\n".join(lines) + "\n").encode()
+    path.write_bytes(gzip.compress(data) if path.suffix == ".gz" else data)
+    return str(path)
+
+
+def _rows(count: int) -> list[dict]:
+    return [
+        {"product_id": f"p{i:03}", "name": f"Prod{i}", "price": i} for i in range(count)
+    ]
+
+
+# 正常系: 有効な行だけを書き込み、無効な行は位置と理由を返す
+def test_import_ndjson(products_table, tmp_path):
+    path = _write_ndjson(
+        tmp_path / "products.ndjson.gz",
+        [
+            {"product_id": "p1", "name": "Apple", "price": 1},
+            "",
+            "{broken",
+            {"name": "No ID", "price": 1},
+            {"product_id": "p2", "name": "Bad", "price": "abc"},
+            {"product_id": "p3", "name": "Banana", "price": 3},
+            {"product_id": "p1", "name": "Apricot", "price": 2},
+        ],
+    )
+    errors: list[dict] = []
+    result = import_products(path, on_invalid=errors.append)
+
+    assert (result.rows, result.written, result.invalid) == (7, 2, 3)
+    assert [error["row"] for error in errors] == [2, 3, 4]
+    assert errors[2]["product_id"] == "p2"
+    # 後の行が優先され、GSI のキーも書き込まれる
+    assert Product.get("p1").name == "Apricot"
+    products, _ = search_products(name_prefix="ban", limit=10)
+    assert [product.product_id for product in products] == ["p3"]
+
+
+# 異常系: DynamoDB の数値として表せない価格の行は無効として扱う
+def test_import_price_out_of_range(products_table, tmp_path):
+    rows = [*_rows(2), {"product_id": "big", "name": "Big", "price": "1e400"}]
+    path = _write_ndjson(tmp_path / "products.ndjson", rows)
+    errors: list[dict] = []
+    result = import_products(path, on_invalid=errors.append)
+
+    assert (result.written, result.invalid) == (2, 1)
+    assert errors[0]["product_id"] == "big"
+    assert "price" in errors[0]["detail"]
+    assert Product.safe_get("big") is None
+
+
+# 正常系: エクスポートした CSV をそのまま取り込める
+def test_import_csv_from_export(products_table, tmp_path):
+    path = _write_ndjson(tmp_path / "seed.ndjson", _rows(60))
+    import_products(path)
+    exported = tmp_path / "products.csv.gz"
+    with open(exported, "wb") as f:
+        export_products(f, "csv")
+    before = [product.model_dump() for product in Product.scan()]
+
+    with products_table.batch_writer() as writer:
+        for product in before:
+            writer.delete_item(Key={"product_id": product["product_id"]})
+    result = import_products(str(exported))
+
+    assert result.written == 60
+    after = {product.product_id: product.model_dump() for product in Product.scan()}
+    assert after == {product["product_id"]: product for product in before}
+
+
+# 正常系: 失敗したところからチェックポイントで再開できる
+def test_import_resumes_from_checkpoint(products_table, tmp_path, monkeypatch):
+    path = _write_ndjson(tmp_path / "products.ndjson", _rows(100))
+    checkpoint = str(tmp_path / "checkpoint.json")
+    write_batch = importer.write_batch
+
+    def fail_on_p050(batch: list[dict]) -> None:
+        if any(r["PutRequest"]["Item"]["product_id"] == "p050" for r in batch):
+            raise RuntimeError("boom")
+        write_batch(batch)
+
+    monkeypatch.setattr(importer, "write_batch", fail_on_p050)
+    with pytest.raises(RuntimeError, match="boom"):
+        import_products(path, chunk_rows=10, max_workers=2, checkpoint=checkpoint)
+    with open(checkpoint) as f:
+        saved = json.load(f)["rows"]
+    assert saved <= 50
+
+    monkeypatch.setattr(importer, "write_batch", write_batch)
+    result = import_products(path, chunk_rows=10, checkpoint=checkpoint)
+    assert (result.skipped, result.rows) == (saved, 100 - saved)
+    assert products_table.scan()["Count"] == 100
+    with open(checkpoint) as f:
+        assert json.load(f)["rows"] == 100
+
+
+# 異常系: 別の入力ファイルのチェックポイントは使わない
+def test_import_rejects_other_checkpoint(products_table, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    checkpoint.write_text(json.dumps({"source": "/other.ndjson", "rows": 1}))
+    path = _write_ndjson(tmp_path / "products.ndjson", _rows(1))
+    with pytest.raises(ImportSourceError):
+        import_products(path, checkpoint=str(checkpoint))
+
+
+# 正常系: 集計が有効な場合は取り込み後にカウンタを作り直す
+def test_import_rebuilds_stats(product_stats, tmp_path):
+    path = _write_ndjson(tmp_path / "products.ndjson", _rows(10))
+    import_products(path)
+    assert stats.read().product_count == 10
+
+
+# 正常系: コマンドは無効な行をファイルに書き出し、件数を標準エラー出力に書く
+def test_import_command(products_table, tmp_path, capsys):
+    path = _write_ndjson(tmp_path / "products.ndjson", [*_rows(3), "{broken"])
+    errors = tmp_path / "errors.ndjson"
+    main([path, "--errors", str(errors), "--workers", "2"])
+
+    report = json.loads(capsys.readouterr().err)
+    assert (report["written"], report["invalid"]) == (3, 1)
+    lines = errors.read_text().splitlines()
+    assert json.loads(lines[0])["row"] == 3
@@ -0,0 +1,93 @@
+import json
+import subprocess  # nosec B404
+import sys
+
+import pytest
+
+from api import lambda_handler
+from api.models import Product
+
+PRODUCT = {"product_id": "p1", "name": "Prod1", "price": 10}
+
+
+@pytest.fixture
+def handler(products_table):
+    # モックテーブル用のクライアントで初期化し直す
+    Product._clear_boto3_state()
+    lambda_handler._app.cache_clear()
+    yield lambda_handler.handler
+    lambda_handler._app.cache_clear()
+
+
+def http_api_event(method: str, path: str, query: str = "", body=None) -> dict:
+    return {
+        "version": "2.0",
+        "rawPath": path,
+        "rawQueryString": query,
+        "headers": {"content-type": "application/json"},
+        "requestContext": {"http": {"method": method}},
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+def rest_api_event(method: str, path: str, query: dict | None = None) -> dict:
+    return {
+        "httpMethod": method,
+        "path": path,
+        "multiValueQueryStringParameters": query,
+        "multiValueHeaders": {"Accept": ["application/json"]},
+        "body": None,
+        "isBase64Encoded": False,
+    }
+
+
+# 正常系: HTTP API (ペイロード 2.0) で作成・取得できる
+def test_http_api_event(handler):
+    created = handler(http_api_event("POST", "/products/", body=PRODUCT), None)
+    assert created["statusCode"] == 200
+    assert created["headers"]["content-type"] == "application/json"
+    assert not created["isBase64Encoded"]
+
+    read = handler(http_api_event("GET", "/products/p1"), None)
+    assert read["statusCode"] == 200
+    assert json.loads(read["body"])["name"] == "Prod1"
+
+    missing = handler(http_api_event("GET", "/products/none"), None)
+    assert missing["statusCode"] == 404
+
+
+# 正常系: REST API (ペイロード 1.0) のクエリ・ヘッダーを変換できる
+def test_rest_api_event(handler):
+    handler(http_api_event("POST", "/products/", body=PRODUCT), None)
+
+    resp = handler(rest_api_event("GET", "/products/", {"ids": ["p1", "p2"]}), None)
+    assert resp["statusCode"] == 200
+    assert resp["multiValueHeaders"]["content-type"] == ["application/json"]
+    assert [item["found"] for item in json.loads(resp["body"])] == [True, False]
+
+
+# 正常系: クライアントは呼び出しをまたいで使い回す
+def test_reuses_client_across_invocations(handler):
+    handler(http_api_event("GET", "/products/p1"), None)
+    client = Product._dynamodb_client()
+    resource = Product._dynamodb_resource()
+
+    handler(http_api_event("GET", "/products/p1"), None)
+    assert Product._dynamodb_client() is client
+    assert Product._dynamodb_resource() is resource
+    config = client.meta.config
+    assert config.max_pool_connections >= 64
+    assert config.tcp_keepalive
+
+
+# 正常系: モジュールの import 時点ではアプリや boto3 を読み込まない
+def test_import_is_lazy():
+    code = (
+        "import sys, api.lambda_handler;"
+        "print(any(m in sys.modules for m in ('fastapi', 'boto3', 'api.main')))"
+    )
+    result = subprocess.run(  # nosec B603
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
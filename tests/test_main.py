@@ -1,31 +1,28 @@
-import boto3
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import timezone
+
 import pytest
 from fastapi.testclient import TestClient
-from moto import mock_aws
 
+from api import batch
+from api.etag import item_etag
 from api.main import app
+from api.models import Product
+from api.pagination import encode_cursor
 
 
 @pytest.fixture
-def client():
-    with mock_aws():
-        # テーブル作成
-        dynamodb = boto3.resource("dynamodb")
-        dynamodb.create_table(
-            TableName="products",
-            KeySchema=[{"AttributeName": "product_id", "KeyType": "HASH"}],
-            AttributeDefinitions=[
-                {"AttributeName": "product_id", "AttributeType": "S"}
-            ],
-            BillingMode="PAY_PER_REQUEST",
-        )
-        # モデルにモックテーブルを差し替え
-        yield TestClient(app)
+def client(products_table):
+    # モデルにモックテーブルを差し替え
+    yield TestClient(app)
 
 
 # テストデータ（リクエスト用）
 PRODUCT_1 = {"product_id": "p1", "name": "Prod1", "description": "Desc1", "price": 10}
 PRODUCT_2 = {"product_id": "p2", "name": "Prod2", "description": "Desc2", "price": 20}
+CREATED_AT = "2025-01-01T09:00:00+09:00"
 
 # テストデータ（レスポンス検証用）
 PRODUCT_1_RESPONSE = {
@@ -131,3 +128,463 @@ def test_partial_update_multiple_fields(client: TestClient):
     assert updated["price"] == "99"
     # name は元のまま
     assert updated["name"] == PRODUCT_2["name"]
+
+
+# 正常系: limit とカーソルによるページング
+def test_list_products_pagination(client: TestClient):
+    client.post("/products/", json=PRODUCT_1)
+    client.post("/products/", json=PRODUCT_2)
+
+    resp_first = client.get("/products/", params={"limit": 1})
+    assert resp_first.status_code == 200
+    assert len(resp_first.json()) == 1
+    cursor = resp_first.headers["X-Next-Cursor"]
+
+    seen = [resp_first.json()[0]["product_id"]]
+    while cursor:
+        resp = client.get("/products/", params={"limit": 1, "cursor": cursor})
+        assert resp.status_code == 200
+        seen.extend(item["product_id"] for item in resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+    assert sorted(seen) == ["p1", "p2"]
+
+
+# 異常系: 不正なカーソル・範囲外の limit
+def test_list_products_invalid_params(client: TestClient):
+    assert client.get("/products/", params={"cursor": "!!"}).status_code == 400
+    assert client.get("/products/", params={"cursor": "e30"}).status_code == 200
+    assert client.get("/products/", params={"limit": 0}).status_code == 422
+
+    # テーブルのキー以外を含むカーソルは DynamoDB に渡さない
+    client.post("/products/", json=PRODUCT_1)
+    for key in [{"foo": "x"}, {"product_id": 1}, {"product_id": "p1", "foo": "x"}]:
+        cursor = encode_cursor(key)
+        assert client.get("/products/", params={"cursor": cursor}).status_code == 400
+        stream = client.get("/products/", params={"cursor": cursor, "stream": True})
+        assert stream.status_code == 400
+
+
+# 正常系: NDJSON ストリーミング
+def test_list_products_stream_ndjson(client: TestClient):
+    client.post("/products/", json=PRODUCT_1)
+    client.post("/products/", json=PRODUCT_2)
+    resp = client.get("/products/", params={"stream": True, "limit": 1})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert {line["product_id"] for line in lines} == {"p1", "p2"}
+    assert all(line["price"] in ("10", "20") for line in lines)
+
+
+# 正常系: 並列セグメント Scan によるストリーミング
+def test_list_products_stream_parallel_segments(client: TestClient):
+    for i in range(10):
+        client.post("/products/", json={**PRODUCT_1, "product_id": f"p{i}"})
+    resp = client.get("/products/", params={"stream": True, "segments": 4})
+    assert resp.status_code == 200
+    ids = [json.loads(line)["product_id"] for line in resp.text.splitlines()]
+    assert sorted(ids) == sorted(f"p{i}" for i in range(10))
+
+    # 並列 Scan は単一ページ取得・カーソルとは併用できない
+    assert client.get("/products/", params={"segments": 4}).status_code == 400
+    cursor = client.get("/products/", params={"limit": 1}).headers["X-Next-Cursor"]
+    resp_cursor = client.get(
+        "/products/", params={"stream": True, "segments": 4, "cursor": cursor}
+    )
+    assert resp_cursor.status_code == 400
+
+
+# 正常系: テスト用エンドポイントでテーブルを空にできる
+def test_clear_table(client: TestClient):
+    for i in range(30):
+        client.post("/products/", json={**PRODUCT_1, "product_id": f"p{i}"})
+    resp = client.delete("/test/clear-table")
+    assert resp.status_code == 204
+    assert client.get("/products/").json() == []
+
+
+# 正常系/異常系: 一括作成は行ごとに結果を返す
+def test_create_products_batch(client: TestClient, monkeypatch):
+    # moto の TransactWriteItems はスレッドセーフではないため直列で実行
+    monkeypatch.setattr(batch, "DEFAULT_BATCH_WORKERS", 1)
+    client.post("/products/", json=PRODUCT_1)
+    payload = [
+        PRODUCT_1,  # 既存と重複
+        PRODUCT_2,
+        {"product_id": "p3", "name": "Prod3"},  # price 欠落
+        *({**PRODUCT_2, "product_id": f"bulk{i}"} for i in range(150)),
+        {**PRODUCT_2, "product_id": "bulk0"},  # リクエスト内で重複
+    ]
+    resp = client.post("/products/batch", json=payload)
+    assert resp.status_code == 200
+    results = resp.json()
+    assert [r["index"] for r in results] == list(range(len(payload)))
+    statuses = [r["status"] for r in results]
+    assert statuses[:3] == ["conflict", "created", "invalid"]
+    assert statuses[3:-1] == ["created"] * 150
+    assert statuses[-1] == "conflict"
+    assert "price" in results[2]["detail"]
+
+    assert client.get("/products/p2").status_code == 200
+    assert client.get("/products/p3").status_code == 404
+    assert len(client.get("/products/", params={"limit": 1000}).json()) == 152
+
+
+# 正常系/異常系: NDJSON での一括作成と不正なボディ
+def test_create_products_batch_ndjson(client: TestClient):
+    body = "\n".join([json.dumps(PRODUCT_1), "{broken", "", json.dumps(PRODUCT_2)])
+    resp = client.post(
+        "/products/batch",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    assert [r["status"] for r in resp.json()] == ["created", "invalid", "created"]
+
+    assert client.post("/products/batch", content="{").status_code == 400
+    assert client.post("/products/batch", json={"a": 1}).status_code == 400
+    too_many = [PRODUCT_1] * 1001
+    assert client.post("/products/batch", json=too_many).status_code == 400
+
+
+# 異常系: DynamoDB の数値の範囲・精度を超える価格は書き込まない
+def test_write_price_out_of_range(client: TestClient):
+    client.post("/products/", json=PRODUCT_1)
+    for price in ("1e400", "1" * 39):
+        resp = client.post("/products/", json={**PRODUCT_2, "price": price})
+        assert resp.status_code == 422
+        assert "price is out of range" in resp.json()["detail"][0]["msg"]
+        resp = client.patch("/products/p1", json={"price": price})
+        assert resp.status_code == 422
+
+        payload = [{**PRODUCT_2, "price": price}, {**PRODUCT_2, "product_id": "p3"}]
+        results = client.post("/products/batch", json=payload).json()
+        assert [r["status"] for r in results] == ["invalid", "created"]
+        assert "price" in results[0]["detail"]
+        client.delete("/products/p3")
+
+    assert client.get("/products/p1").json()["price"] == "10"
+    assert client.get("/products/p2").status_code == 404
+
+
+# 異常系: 同一 ID の並行作成は 1 件だけ成功する
+def test_concurrent_duplicate_creates(client: TestClient, atomic_writes):
+    def create(i: int) -> int:
+        payload = {**PRODUCT_1, "name": f"Prod{i}"}
+        return client.post("/products/", json=payload).status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        statuses = list(executor.map(create, range(16)))
+    assert statuses.count(200) == 1
+    assert statuses.count(409) == 15
+    # 最初に成功した書き込みが上書きされていない
+    winner = statuses.index(200)
+    assert client.get("/products/p1").json()["name"] == f"Prod{winner}"
+
+
+# 正常系/異常系: 書き込み系 API は DynamoDB への 1 回の呼び出しで完結する
+def test_write_paths_use_single_dynamodb_call(client: TestClient, dynamodb_calls):
+    client.post("/products/", json=PRODUCT_1)
+    client.post("/products/", json=PRODUCT_1)
+    assert dynamodb_calls == ["PutItem", "PutItem"]
+
+    dynamodb_calls.clear()
+    resp_patch = client.patch("/products/p1", json={"price": 15, "name": "New"})
+    assert resp_patch.json()["price"] == "15"
+    assert resp_patch.json()["name"] == "New"
+    assert client.patch("/products/missing", json={"name": "X"}).status_code == 404
+    assert dynamodb_calls == ["UpdateItem", "UpdateItem"]
+
+    dynamodb_calls.clear()
+    assert client.delete("/products/p1").status_code == 204
+    assert client.delete("/products/p1").status_code == 404
+    assert dynamodb_calls == ["DeleteItem", "DeleteItem"]
+
+    # 更新で存在しない商品が作られていない
+    assert client.get("/products/missing").status_code == 404
+
+
+# 正常系: ids 指定の複数取得はリクエスト順に未存在マーカー付きで返す
+def test_lookup_products_by_ids(client: TestClient, dynamodb_calls):
+    for i in range(150):
+        client.post("/products/", json={**PRODUCT_1, "product_id": f"p{i}"})
+    ids = [f"p{i}" for i in reversed(range(150))] + ["missing", "p0"]
+
+    dynamodb_calls.clear()
+    resp = client.get("/products", params={"ids": ",".join(ids)})
+    assert resp.status_code == 200
+    results = resp.json()
+    assert [r["product_id"] for r in results] == ids
+    assert [r["found"] for r in results] == [True] * 150 + [False, True]
+    assert results[-2]["product"] is None
+    assert results[-1]["product"]["name"] == PRODUCT_1["name"]
+    # 重複を除いた 151 件を 100 件ずつの BatchGetItem で取得
+    assert dynamodb_calls == ["BatchGetItem", "BatchGetItem"]
+
+    # ids の繰り返し指定も可能
+    resp_repeat = client.get("/products/", params=[("ids", "p1"), ("ids", "p2")])
+    assert [r["product_id"] for r in resp_repeat.json()] == ["p1", "p2"]
+
+    too_many = ",".join(f"x{i}" for i in range(501))
+    assert client.get("/products/", params={"ids": too_many}).status_code == 400
+
+
+# 正常系: UnprocessedKeys は再送される
+def test_lookup_products_retries_unprocessed_keys(client: TestClient, monkeypatch):
+    client.post("/products/", json=PRODUCT_1)
+    client.post("/products/", json=PRODUCT_2)
+    resource = Product._dynamodb_resource()
+    original = resource.batch_get_item
+    calls = []
+
+    def flaky_batch_get_item(RequestItems):
+        calls.append(RequestItems)
+        if len(calls) > 1:
+            return original(RequestItems=RequestItems)
+        # 1 回目は 1 件目だけ処理し、残りを未処理として返す
+        table, request = next(iter(RequestItems.items()))
+        first = original(RequestItems={table: {**request, "Keys": request["Keys"][:1]}})
+        first["UnprocessedKeys"] = {table: {**request, "Keys": request["Keys"][1:]}}
+        return first
+
+    monkeypatch.setattr(resource, "batch_get_item", flaky_batch_get_item)
+    resp = client.get("/products/", params={"ids": "p1,p2"})
+    assert [r["found"] for r in resp.json()] == [True, True]
+    assert len(calls) == 2
+
+
+# 正常系: fields 指定時は指定フィールドだけを射影して返す
+def test_read_and_list_with_fields(client: TestClient):
+    client.post("/products/", json=PRODUCT_1)
+    client.post("/products/", json=PRODUCT_2)
+    requests = []
+
+    def record(params, **kwargs):
+        requests.append(params)
+
+    client_events = Product._dynamodb_resource().meta.client.meta.events
+    client_events.register("before-parameter-build.dynamodb", record)
+
+    resp = client.get("/products/p1", params={"fields": "price,name"})
+    assert resp.status_code == 200
+    assert resp.json() == {"product_id": "p1", "name": "Prod1", "price": "10"}
+    # name は予約語のため属性名はプレースホルダで参照する
+    # (version と created_at は ETag 用)
+    assert (
+        requests[-1]["ProjectionExpression"]
+        == "#product_id, #name, #price, #version, #created_at"
+    )
+    resp = client.get("/products/p1", params={"fields": "created_at,price"})
+    assert list(resp.json()) == ["product_id", "price", "created_at"]
+    assert requests[-1]["ProjectionExpression"].endswith("#version")
+
+    resp_list = client.get("/products/", params=[("fields", "name"), ("limit", 1)])
+    assert resp_list.json() in (
+        [{"product_id": "p1", "name": "Prod1"}],
+        [{"product_id": "p2", "name": "Prod2"}],
+    )
+    assert requests[-1]["Limit"] == 1
+    assert "X-Next-Cursor" in resp_list.headers
+
+    resp_all = client.get("/products/", params={"fields": "created_at"})
+    assert all(set(item) == {"product_id", "created_at"} for item in resp_all.json())
+
+    # 存在しない商品・不正なフィールド・未対応の組み合わせ
+    assert client.get("/products/none", params={"fields": "name"}).status_code == 404
+    assert client.get("/products/p1", params={"fields": "secret"}).status_code == 400
+    for params in ({"ids": "p1"}, {"stream": "true"}):
+        resp_bad = client.get("/products/", params={**params, "fields": "name"})
+        assert resp_bad.status_code == 400
+    client_events.unregister("before-parameter-build.dynamodb", record)
+
+
+# 正常系: ETag と If-None-Match による 304
+def test_conditional_get_with_etag(client: TestClient):
+    created = client.post(
+        "/products/", json={**PRODUCT_1, "version": 99, "created_at": CREATED_AT}
+    )
+    etag = item_etag(datetime.fromisoformat(CREATED_AT), 1)
+    assert created.headers["ETag"] == etag
+
+    resp = client.get("/products/p1")
+    assert resp.headers["ETag"] == etag
+    assert "version" not in resp.json()
+
+    not_modified = client.get("/products/p1", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+    for tag in (f"W/{etag}", f'"0", {etag}', "*"):
+        resp_match = client.get("/products/p1", headers={"If-None-Match": tag})
+        assert resp_match.status_code == 304
+
+    # 更新で版が進むと 200 で新しい ETag を返す
+    updated = client.patch("/products/p1", json={"price": 15})
+    updated_etag = item_etag(datetime.fromisoformat(CREATED_AT), 2)
+    assert updated.headers["ETag"] == updated_etag
+    changed = client.get("/products/p1", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] == updated_etag
+    projected = client.get(
+        "/products/p1",
+        params={"fields": "name"},
+        headers={"If-None-Match": updated_etag},
+    )
+    assert projected.status_code == 304
+
+
+# 異常系: 削除して作り直した商品は、版が同じでも以前の ETag に一致しない
+def test_etag_of_recreated_product(client: TestClient):
+    etag = client.post("/products/", json=PRODUCT_1).headers["ETag"]
+    page_etag = client.get("/products/").headers["ETag"]
+    client.delete("/products/p1")
+    recreated = client.post("/products/", json={**PRODUCT_1, "created_at": CREATED_AT})
+    assert recreated.headers["ETag"] != etag
+    assert recreated.headers["ETag"].startswith('"1-')
+
+    assert (
+        client.get("/products/p1", headers={"If-None-Match": etag}).status_code == 200
+    )
+    resp = client.get("/products/", headers={"If-None-Match": page_etag})
+    assert resp.status_code == 200
+    stale = client.patch("/products/p1", json={"price": 1}, headers={"If-Match": etag})
+    assert stale.status_code == 412
+    assert client.get("/products/p1").json()["price"] == "10"
+
+
+# 正常系: 一覧の ETag はページ内の版とカーソルから計算する
+def test_conditional_list_with_etag(client: TestClient):
+    client.post("/products/", json=PRODUCT_1)
+    client.post("/products/", json=PRODUCT_2)
+
+    etag = client.get("/products/").headers["ETag"]
+    assert etag.startswith('W/"')
+    resp = client.get("/products/", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+    # 射影やページサイズが異なれば ETag も異なる
+    assert client.get("/products/", params={"fields": "name"}).headers["ETag"] != etag
+    assert client.get("/products/", params={"limit": 1}).headers["ETag"] != etag
+
+    client.patch("/products/p2", json={"name": "Renamed"})
+    resp_changed = client.get("/products/", headers={"If-None-Match": etag})
+    assert resp_changed.status_code == 200
+    assert resp_changed.headers["ETag"] != etag
+
+
+# 正常系: If-Match による楽観的排他制御
+def test_update_with_if_match(client: TestClient, dynamodb_calls):
+    etag = client.post("/products/", json=PRODUCT_1).headers["ETag"]
+
+    dynamodb_calls.clear()
+    resp = client.patch("/products/p1", json={"price": 11}, headers={"If-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] == etag.replace('"1-', '"2-')
+    # 版の確認と更新は 1 回の UpdateItem で行う
+    assert dynamodb_calls == ["UpdateItem"]
+
+    # 古い版を指定した更新は 412 になり、値は変わらない
+    for tag in (etag, f"W/{resp.headers['ETag']}", '"2"', "garbage"):
+        stale = client.patch(
+            "/products/p1", json={"price": 99}, headers={"If-Match": tag}
+        )
+        assert stale.status_code == 412
+    assert client.get("/products/p1").json()["price"] == "11"
+
+    resp_any = client.patch(
+        "/products/p1", json={"price": 12}, headers={"If-Match": "*"}
+    )
+    assert resp_any.headers["ETag"] == etag.replace('"1-', '"3-')
+    missing = client.patch(
+        "/products/none", json={"price": 1}, headers={"If-Match": etag}
+    )
+    assert missing.status_code == 404
+
+
+# 正常系: version を持たない既存の商品は初期版として扱う
+def test_legacy_item_without_version(client: TestClient):
+    Product._dynamodb_table().put_item(
+        Item={
+            "product_id": "legacy",
+            "name": "Old",
+            "price": "5",
+            "created_at": "2024-01-01T00:00:00+00:00",
+        }
+    )
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    etag = client.get("/products/legacy").headers["ETag"]
+    assert etag == item_etag(created_at, 1)
+
+    # created_key を持たない商品は version だけで比べる
+    resp = client.patch(
+        "/products/legacy", json={"name": "New"}, headers={"If-Match": etag}
+    )
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] == item_etag(created_at, 2)
+
+
+# 正常系: 価格帯・名前の前方一致で検索する
+def test_search_products(client: TestClient):
+    client.post("/products/", json=PRODUCT_1)
+    client.post("/products/", json=PRODUCT_2)
+    client.post("/products/", json={**PRODUCT_1, "product_id": "p3", "price": 15})
+
+    resp = client.get("/products/search", params={"min_price": 12, "limit": 1})
+    assert resp.status_code == 200
+    assert [item["product_id"] for item in resp.json()] == ["p3"]
+    next_page = client.get(
+        "/products/search",
+        params={"min_price": 12, "limit": 1, "cursor": resp.headers["X-Next-Cursor"]},
+    )
+    assert [item["product_id"] for item in next_page.json()] == ["p2"]
+
+    resp_name = client.get("/products/search", params={"name_prefix": "prod2"})
+    (found,) = resp_name.json()
+    found.pop("created_at")
+    assert found == PRODUCT_2_RESPONSE
+    etag = resp_name.headers["ETag"]
+    cached = client.get(
+        "/products/search",
+        params={"name_prefix": "prod2"},
+        headers={"If-None-Match": etag},
+    )
+    assert cached.status_code == 304
+
+
+# 正常系: 新着順の一覧
+def test_latest_products(client: TestClient):
+    for i, product_id in enumerate(["old", "new", "mid"]):
+        created_at = f"2025-01-0{(0, 2, 1)[i] + 1}T00:00:00+00:00"
+        product = {**PRODUCT_1, "product_id": product_id, "created_at": created_at}
+        client.post("/products/", json=product)
+
+    resp = client.get("/products/latest", params={"limit": 2})
+    assert [item["product_id"] for item in resp.json()] == ["new", "mid"]
+    rest = client.get(
+        "/products/latest", params={"cursor": resp.headers["X-Next-Cursor"]}
+    )
+    assert [item["product_id"] for item in rest.json()] == ["old"]
+    assert "X-Next-Cursor" not in rest.headers
+
+    search_cursor = client.get("/products/search", params={"limit": 1}).headers[
+        "X-Next-Cursor"
+    ]
+    resp_invalid = client.get("/products/latest", params={"cursor": search_cursor})
+    assert resp_invalid.status_code == 400
+
+
+# 異常系: 検索条件・カーソルの不正
+def test_search_products_invalid(client: TestClient):
+    params = {"min_price": 20, "max_price": 10}
+    assert client.get("/products/search", params=params).status_code == 400
+    assert (
+        client.get("/products/search", params={"name_prefix": " "}).status_code == 400
+    )
+    assert client.get("/products/search", params={"cursor": "x"}).status_code == 400
+    assert client.get("/products/search", params={"min_price": "x"}).status_code == 422
+    # DynamoDB の数値の範囲・精度を超える価格
+    for price in ("1e400", "1e-400", "0." + "1" * 39):
+        for name in ("min_price", "max_price"):
+            resp = client.get("/products/search", params={name: price})
+            assert resp.status_code == 400
+            assert resp.json() == {"detail": f"{name} is out of range"}
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import apigw
+from api import metrics
+from api.main import app
+from tests.test_apigw import event
+
+PRODUCT = {"product_id": "p1", "name": "Prod1", "price": 10}
+
+
+@pytest.fixture
+def client(products_table, monkeypatch):
+    monkeypatch.setattr(metrics, "DYNAMODB_METRICS_ENABLED", True)
+    metrics.registry.reset()
+    yield TestClient(app)
+    metrics.registry.reset()
+
+
+def timing(resp) -> str:
+    return resp.headers["server-timing"]
+
+
+# 正常系: Server-Timing ヘッダーに DynamoDB の呼び出し数と消費キャパシティが入る
+def test_server_timing(client: TestClient):
+    resp = client.post("/products/", json=PRODUCT)
+    assert resp.status_code == 200
+    assert 'desc="1 calls, ' in timing(resp)
+    assert "app;dur=" in timing(resp)
+    assert ', 0 CU"' not in timing(resp)
+
+    assert 'desc="0 calls, 0 CU"' in timing(client.get("/health"))
+
+
+# 正常系: ワーカースレッドでの呼び出しもリクエストに計上される
+def test_counts_worker_threads(client: TestClient):
+    resp = client.get("/products/search", params={"name_prefix": "p"})
+    assert resp.status_code == 200
+    assert 'desc="8 calls, ' in timing(resp)
+
+
+# 正常系: EMF の JSON 行をルートのディメンション付きで出力する
+def test_emf(client: TestClient, monkeypatch, capsys):
+    monkeypatch.setattr(metrics, "DYNAMODB_METRICS_EMF_ENABLED", True)
+    client.post("/products/", json=PRODUCT)
+
+    record = json.loads(capsys.readouterr().out.splitlines()[-1])
+    assert record["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Route"]]
+    assert record["Route"] == "POST /products/"
+    assert (record["StatusCode"], record["DynamoDBCalls"]) == (200, 1)
+    assert record["DynamoDBOperations"] == {"PutItem": 1}
+
+
+# 正常系: GET /metrics はルート・操作ごとの累計を Prometheus 形式で返す
+def test_prometheus_endpoint(client: TestClient, monkeypatch):
+    monkeypatch.setattr(metrics, "DYNAMODB_METRICS_ENDPOINT_ENABLED", True)
+    client.post("/products/", json=PRODUCT)
+    client.get("/products/p1")
+    client.get("/products/missing")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    lines = resp.text.splitlines()
+    route = 'route="GET /products/{product_id}"'
+    assert f'http_requests_total{{{route},status="404"}} 1' in lines
+    assert f'dynamodb_calls_total{{{route},operation="GetItem"}} 2' in lines
+    assert f"http_request_duration_seconds_count{{{route}}} 2" in lines
+
+
+# 正常系: 無効な場合はヘッダーも /metrics も出さない
+def test_disabled(products_table, monkeypatch):
+    monkeypatch.setattr(metrics, "DYNAMODB_METRICS_ENABLED", False)
+    client = TestClient(app)
+    assert "server-timing" not in client.get("/health").headers
+    assert client.get("/metrics").status_code == 404
+
+
+# 正常系: API Gateway の直接ハンドラーでも計測する
+@pytest.mark.usefixtures("products_table")
+def test_apigw_handler(monkeypatch):
+    monkeypatch.setattr(metrics, "DYNAMODB_METRICS_ENABLED", True)
+    response = apigw.handler(event("POST", "/products/", body=PRODUCT), None)
+    assert 'desc="1 calls, ' in response["headers"]["server-timing"]
+
+
+# 正常系: 直接ハンドラーから委譲したストリーミング一覧は 1 回だけ計測する
+@pytest.mark.usefixtures("products_table")
+def test_apigw_delegated_stream(monkeypatch):
+    monkeypatch.setattr(metrics, "DYNAMODB_METRICS_ENABLED", True)
+    monkeypatch.setattr(metrics, "DYNAMODB_METRICS_ENDPOINT_ENABLED", True)
+    metrics.registry.reset()
+    apigw.handler(event("POST", "/products/", body=PRODUCT), None)
+    response = apigw.handler(event("GET", "/products/", "stream=true"), None)
+    assert response["headers"]["content-type"] == "application/x-ndjson"
+
+    lines = metrics.registry.prometheus_text().splitlines()
+    metrics.registry.reset()
+    assert 'http_requests_total{route="GET /products/",status="200"} 1' in lines
@@ -0,0 +1,102 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import apigw
+from api import profiling
+from api.main import app
+from api.profiling import Sampler
+from tests.test_apigw import event
+
+PRODUCT = {"product_id": "p1", "name": "Prod1", "price": 10}
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILING_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(profiling, "PROFILING_OUTPUT_DIR", str(tmp_path))
+    yield tmp_path
+
+
+@pytest.fixture
+def client(products_table):
+    yield TestClient(app)
+
+
+def read_profile(directory, profile_id: str) -> dict[str, int]:
+    (path,) = directory.glob(f"{profile_id}-*.folded")
+    stacks = {}
+    for line in path.read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        stacks[stack] = int(count)
+    return stacks
+
+
+def busy(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(100))
+
+
+# 正常系: 処理中のスレッドのスタックを記録し、待機中のスレッドは除く
+def test_sampler_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy, args=(stop,), name="busy-worker")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(int).result()
+        sampler = Sampler(0.001)
+        worker.start()
+        sampler.start()
+        while sampler.samples < 5:
+            stop.wait(0.001)
+        sampler.stop()
+        stop.set()
+        worker.join()
+
+    stacks = sampler.collapsed().splitlines()
+    assert any(
+        line.startswith("busy-worker;") and "tests.test_profiling:busy" in line
+        for line in stacks
+    )
+    assert not any(line.startswith("ThreadPoolExecutor") for line in stacks)
+    assert not any("profiling-sampler" in line for line in stacks)
+
+
+# 正常系: X-Profile ヘッダーを付けたリクエストだけを計測する
+def test_profile_header(client: TestClient, output_dir):
+    resp = client.post("/products/", json=PRODUCT, headers={"X-Profile": "1"})
+    assert resp.status_code == 200
+    profile_id = resp.headers["x-profile-id"]
+    (path,) = output_dir.iterdir()
+    assert path.name == f"{profile_id}-POST_products.folded"
+    assert read_profile(output_dir, profile_id)
+
+    assert "x-profile-id" not in client.get("/products/p1").headers
+    assert len(list(output_dir.iterdir())) == 1
+
+
+# 正常系: PROFILING_SAMPLE_RATE の割合でヘッダーなしのリクエストも計測する
+def test_sample_rate(client: TestClient, output_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_SAMPLE_RATE", 1.0)
+    profile_id = client.get("/health").headers["x-profile-id"]
+    assert (output_dir / f"{profile_id}-GET_health.folded").exists()
+
+
+# 正常系: 無効な場合はヘッダーを付けても計測しない
+def test_disabled(client: TestClient, output_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", False)
+    resp = client.get("/health", headers={"X-Profile": "1"})
+    assert "x-profile-id" not in resp.headers
+    assert not list(output_dir.iterdir())
+
+
+# 正常系: API Gateway の直接ハンドラーでもヘッダーで計測する
+@pytest.mark.usefixtures("products_table")
+def test_apigw_handler(output_dir):
+    request = event("POST", "/products/", body=PRODUCT, headers={"X-Profile": "1"})
+    response = apigw.handler(request, None)
+    assert response["statusCode"] == 200
+    profile_id = response["headers"]["x-profile-id"]
+    assert (output_dir / f"{profile_id}-POST_products.folded").exists()
@@ -0,0 +1,58 @@
+import pytest
+
+from api.models import Product
+from api.scan import scan_products
+from api.scan import scan_segments
+
+
+@pytest.fixture
+def seeded_products(products_table):
+    with products_table.batch_writer() as writer:
+        for i in range(50):
+            writer.put_item(
+                Item={
+                    "product_id": f"p{i:02}",
+                    "name": f"Prod{i}",
+                    "price": i,
+                    "created_at": "2025-01-01T00:00:00+00:00",
+                }
+            )
+    return {f"p{i:02}" for i in range(50)}
+
+
+# 正常系: セグメント数に関わらず全件を重複なく返す
+@pytest.mark.parametrize("total_segments", [1, 3, 8])
+def test_scan_products_returns_every_item_once(seeded_products, total_segments):
+    ids = [
+        item.product_id
+        for page in scan_products(total_segments, per_page=7)
+        for item in page
+    ]
+    assert len(ids) == len(seeded_products)
+    assert set(ids) == seeded_products
+    assert all(isinstance(item, Product) for item in next(scan_products(2)))
+
+
+# 正常系: Scan API へ追加パラメータ (射影) を渡せる
+def test_scan_segments_passes_scan_kwargs(seeded_products):
+    pages = scan_segments(4, ProjectionExpression="product_id")
+    items = [item for page in pages for item in page]
+    assert {item["product_id"] for item in items} == seeded_products
+    assert all(set(item) == {"product_id"} for item in items)
+
+
+# 正常系: 途中で読み捨ててもワーカーが停止する
+def test_scan_segments_can_be_closed_early(seeded_products):
+    pages = scan_segments(4, per_page=1)
+    assert len(next(pages)) == 1
+    pages.close()
+
+
+# 異常系: ワーカー側の例外は消費側に伝播する
+def test_scan_segments_propagates_errors(seeded_products, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(Product, "_dyntastic_call", fail)
+    with pytest.raises(RuntimeError, match="boom"):
+        list(scan_segments(2))
@@ -0,0 +1,118 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from decimal import Decimal
+
+import pytest
+
+from api import repository
+from api.models import PRODUCT_INDEX_SHARDS
+from api.models import Product
+from api.pagination import InvalidCursorError
+from api.search import InvalidSearchError
+from api.search import latest_products
+from api.search import search_products
+
+NAMES = ["Apple", "apricot", "Ａｖｏｃａｄｏ", "Banana", "Blueberry", "Cherry"]
+
+
+@pytest.fixture
+def seeded_products(products_table):
+    # 全 shard に散らばる件数を、価格が重複するように投入する
+    for i in range(60):
+        Product(
+            product_id=f"p{i:02}",
+            name=f"{NAMES[i % len(NAMES)]} {i:02}",
+            price=Decimal(i % 20),
+        ).save()
+    return 60
+
+
+def search_all(search=search_products, **criteria) -> list[Product]:
+    """カーソルを辿って全ページを取得する"""
+    products: list[Product] = []
+    cursor = None
+    while True:
+        page, cursor = search(**criteria, cursor=cursor)
+        products.extend(page)
+        if cursor is None:
+            return products
+
+
+# 正常系: 価格帯の検索は全 shard をマージし、価格順に重複なく返す
+@pytest.mark.parametrize("limit", [1, 7, 100])
+def test_search_by_price_range(seeded_products, limit):
+    products = search_all(min_price=Decimal(5), max_price=Decimal(9), limit=limit)
+    prices = [product.price for product in products]
+    assert prices == sorted(prices)
+    assert len(products) == 15
+    assert len({product.product_id for product in products}) == 15
+    assert all(Decimal(5) <= price <= Decimal(9) for price in prices)
+
+    assert len(search_all(limit=50)) == seeded_products
+    assert len(search_all(min_price=Decimal(18), limit=10)) == 6
+    assert len(search_all(max_price=Decimal(0), limit=10)) == 3
+
+
+# 正常系: 名前の前方一致は正規化した名前で照合し、名前順に返す
+def test_search_by_name_prefix(seeded_products):
+    products = search_all(name_prefix="ａＰ", limit=3)
+    names = [product.name for product in products]
+    assert len(names) == 20
+    assert all(name.lower().startswith("ap") for name in names)
+    assert names == sorted(names, key=str.casefold)
+
+    avocados = search_all(name_prefix="avocado", max_price=Decimal(4), limit=2)
+    assert [product.product_id for product in avocados] == ["p02", "p20", "p44"]
+
+
+# 正常系: Scan ではなく shard ごとの Query だけを発行する
+def test_search_uses_query(seeded_products, dynamodb_calls):
+    dynamodb_calls.clear()
+    search_products(min_price=Decimal(1), limit=10)
+    assert dynamodb_calls == ["Query"] * PRODUCT_INDEX_SHARDS
+
+
+# 正常系: 名前を更新すると名前の GSI のキーも更新される
+def test_update_name_updates_name_index(seeded_products):
+    repository.update_product("p00", {"name": "Zucchini"})
+    assert [p.product_id for p in search_all(name_prefix="zu", limit=5)] == ["p00"]
+    assert "p00" not in {p.product_id for p in search_all(name_prefix="ap", limit=50)}
+
+    # 空の名前はインデックスから外れる
+    repository.update_product("p00", {"name": ""})
+    assert search_all(name_prefix="zu", limit=5) == []
+
+
+# 異常系: 不正な条件・カーソル
+def test_search_rejects_invalid_criteria(seeded_products):
+    with pytest.raises(InvalidSearchError):
+        search_products(min_price=Decimal(2), max_price=Decimal(1), limit=10)
+    with pytest.raises(InvalidSearchError):
+        search_products(name_prefix="  ", limit=10)
+
+    # 価格の検索のカーソルは名前の検索には使えない
+    _, cursor = search_products(min_price=Decimal(0), limit=1)
+    with pytest.raises(InvalidCursorError):
+        search_products(name_prefix="a", limit=1, cursor=cursor)
+    with pytest.raises(InvalidCursorError):
+        search_products(limit=1, cursor="not-a-cursor")
+
+
+# 正常系: 新着順の一覧はタイムゾーンに関わらず作成日時の新しい順に返す
+@pytest.mark.parametrize("limit", [1, 4, 50])
+def test_latest_products(products_table, limit):
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    jst = timezone(timedelta(hours=9))
+    for i in range(30):
+        created_at = base + timedelta(minutes=i)
+        if i % 3 == 0:
+            created_at = created_at.astimezone(jst)
+        Product(
+            product_id=f"p{i:02}", name="Prod", price=1, created_at=created_at
+        ).save()
+
+    products = search_all(latest_products, limit=limit)
+    assert [product.product_id for product in products] == [
+        f"p{i:02}" for i in reversed(range(30))
+    ]
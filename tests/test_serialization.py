@@ -0,0 +1,54 @@
+import json
+from datetime import datetime
+from datetime import timezone
+from decimal import Decimal
+
+from pydantic import TypeAdapter
+
+from api.models import Product
+from api.models import ProductResponse
+from api.serialization import dump_ndjson
+from api.serialization import dump_product
+from api.serialization import dump_products
+
+PRODUCTS = [
+    Product(product_id="p1", name="Prod1", description="Desc1", price=Decimal("10")),
+    Product(
+        product_id="p2",
+        name='商品 "2"',
+        price="9.90",  # type: ignore[arg-type]
+        created_at="2025-01-01T00:00:00.123456+00:00",  # type: ignore[arg-type]
+    ),
+    Product(
+        product_id="p3",
+        name="Prod3",
+        price=Decimal("1E+2"),
+        created_at=datetime(2025, 6, 1, 9, 30, tzinfo=timezone.utc),
+    ),
+]
+
+
+def expected(product: Product) -> bytes:
+    return (
+        ProductResponse.model_validate(product, from_attributes=True)
+        .model_dump_json()
+        .encode()
+    )
+
+
+# 正常系: ProductResponse を経由した場合と同じバイト列になる
+def test_matches_product_response():
+    for product in PRODUCTS:
+        assert dump_product(product) == expected(product)
+
+    adapter = TypeAdapter(list[ProductResponse])
+    validated = adapter.validate_python(PRODUCTS, from_attributes=True)
+    assert dump_products(PRODUCTS) == adapter.dump_json(validated)
+    assert dump_products([]) == b"[]"
+
+
+# 正常系: NDJSON は 1 行 1 件
+def test_dump_ndjson():
+    lines = dump_ndjson(PRODUCTS).splitlines()
+    assert lines == [expected(product) for product in PRODUCTS]
+    assert [json.loads(line)["product_id"] for line in lines] == ["p1", "p2", "p3"]
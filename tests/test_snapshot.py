@@ -0,0 +1,258 @@
+import time
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import models
+from api.main import app
+from api.models import Product
+from api.pagination import InvalidCursorError
+from api.pagination import encode_cursor
+from api.search import latest_products
+from api.search import search_products
+from api.snapshot import ProductSnapshot
+from api.snapshot import UnsupportedValueError
+from api.snapshot import product_snapshot
+from tests.test_search import search_all
+
+CREATED_AT = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def seeded_products(products_table):
+    # 価格の重複・表記 ("1.50" など)・説明なし・タイムゾーンの混在を含める
+    for i in range(40):
+        Product(
+            product_id=f"p{i:02}",
+            name=f"Product {i}" if i % 7 else "",
+            description=None if i % 3 else f"Description {i}",
+            price=[Decimal(i % 10), Decimal("1.50"), Decimal("0.000001")][i % 3],
+            created_at=(
+                CREATED_AT.astimezone(timezone(timedelta(hours=9)))
+                if i % 4 == 0
+                else CREATED_AT.replace(tzinfo=None)
+            )
+            + timedelta(minutes=i),
+        ).save()
+    return 40
+
+
+@pytest.fixture
+def enabled(seeded_products, monkeypatch):
+    monkeypatch.setattr(models, "PRODUCT_SNAPSHOT_ENABLED", True)
+    product_snapshot.rebuild()
+    yield product_snapshot
+    product_snapshot.stop()
+
+
+@pytest.fixture
+def client(enabled):
+    yield TestClient(app)
+
+
+def dump(products: list[Product]) -> list[str]:
+    return [product.model_dump_json() for product in products]
+
+
+def list_all(snapshot: ProductSnapshot, limit: int) -> list[Product]:
+    products: list[Product] = []
+    cursor = None
+    while True:
+        page, cursor = snapshot.list_page(limit, cursor)
+        products.extend(page)
+        if cursor is None:
+            return products
+
+
+# 正常系: 列から組み立てた商品は DynamoDB から読んだ商品と同じ値・表記になる
+@pytest.mark.parametrize("limit", [1, 7, 100])
+def test_matches_dynamodb(seeded_products, limit):
+    snapshot = ProductSnapshot.scan()
+    assert len(snapshot) == seeded_products
+
+    expected = sorted(Product.scan(), key=lambda product: product.product_id)
+    assert dump(list_all(snapshot, limit)) == dump(expected)
+
+    for criteria in [
+        {},
+        {"min_price": Decimal("1.5"), "max_price": Decimal(5)},
+        {"min_price": Decimal("0.0000005"), "max_price": Decimal("1.5")},
+        {"max_price": Decimal(0)},
+    ]:
+        products = search_all(snapshot.search, **criteria, limit=limit)
+        from_index = search_all(search_products, **criteria, limit=limit)
+        assert [p.price for p in products] == [p.price for p in from_index]
+        assert sorted(dump(products)) == sorted(dump(from_index))
+
+    # 作成日時は重複しないため、GSI と同じ順になる
+    latest = search_all(snapshot.latest, limit=limit)
+    assert dump(latest) == dump(search_all(latest_products, limit=limit))
+
+
+# 正常系: GSI を読んで返したカーソルとスナップショットのカーソルは相互に続きを読める
+def test_cursor_compatible(seeded_products):
+    snapshot = ProductSnapshot.scan()
+    first, cursor = search_products(limit=5, max_price=Decimal(6))
+    second, cursor = snapshot.search(limit=5, max_price=Decimal(6), cursor=cursor)
+    products = first + second
+    while cursor is not None:
+        page, cursor = search_products(limit=5, max_price=Decimal(6), cursor=cursor)
+        products.extend(page)
+    assert [p.price for p in products] == sorted(p.price for p in products)
+    expected = search_all(limit=5, max_price=Decimal(6))
+    assert {p.product_id for p in products} == {p.product_id for p in expected}
+    assert len(products) == len(expected) == 36
+
+    first, cursor = snapshot.latest(limit=3)
+    second, _ = latest_products(limit=3, cursor=cursor)
+    assert dump(first + second) == dump(snapshot.latest(limit=6)[0])
+
+    with pytest.raises(InvalidCursorError):
+        snapshot.latest(limit=3, cursor=search_products(limit=3)[1])
+
+
+# 正常系: 価格が同じ商品でも GSI のカーソルの続きをスナップショットで読み落とさない
+@pytest.mark.parametrize("limit", [1, 2, 5])
+def test_cursor_compatible_with_tied_prices(products_table, limit):
+    for i in range(20):
+        Product(product_id=f"p{i:02}", name=f"Product {i}", price=Decimal(10)).save()
+    snapshot = ProductSnapshot.scan()
+
+    products, cursor = search_products(limit=limit)
+    while cursor is not None:
+        page, cursor = snapshot.search(limit=limit, cursor=cursor)
+        products.extend(page)
+    assert sorted(p.product_id for p in products) == [f"p{i:02}" for i in range(20)]
+
+
+# 異常系: 一覧は Scan と並び順が異なるため、カーソルを互いの続きには使えない
+def test_list_cursor_not_shared_with_scan(client: TestClient, monkeypatch):
+    snapshot_cursor = client.get("/products/", params={"limit": 3}).headers[
+        "x-next-cursor"
+    ]
+    resp = client.get("/products/", params={"cursor": snapshot_cursor, "limit": 1})
+    assert [p["product_id"] for p in resp.json()] == ["p03"]
+
+    monkeypatch.setattr(models, "PRODUCT_SNAPSHOT_ENABLED", False)
+    scan_cursor = client.get("/products/", params={"limit": 3}).headers["x-next-cursor"]
+    for params in [
+        {"cursor": snapshot_cursor},
+        {"cursor": snapshot_cursor, "fields": "name"},
+        {"cursor": snapshot_cursor, "stream": True},
+    ]:
+        assert client.get("/products/", params=params).status_code == 400
+
+    monkeypatch.setattr(models, "PRODUCT_SNAPSHOT_ENABLED", True)
+    assert client.get("/products/", params={"cursor": scan_cursor}).status_code == 400
+    # 射影は DynamoDB を読むため Scan のカーソルを使う
+    resp = client.get("/products/", params={"cursor": scan_cursor, "fields": "name"})
+    assert resp.status_code == 200
+    for key in [{"snapshot_after": 1}, {"snapshot_after": "p00", "product_id": "p"}]:
+        with pytest.raises(InvalidCursorError):
+            product_snapshot.current().list_page(1, encode_cursor(key))
+
+
+# 正常系: 有効な場合は一覧・価格帯検索・新着順を DynamoDB を読まずに返す
+def test_serves_api(client: TestClient, dynamodb_calls):
+    resp = client.get("/products/", params={"limit": 3})
+    assert [p["product_id"] for p in resp.json()] == ["p00", "p01", "p02"]
+    resp = client.get("/products/", params={"cursor": resp.headers["x-next-cursor"]})
+    assert len(resp.json()) == 37
+    prices = [
+        p["price"]
+        for p in client.get("/products/search", params={"min_price": 1.5}).json()
+    ]
+    assert prices[:2] == ["1.50", "1.50"] and prices[-1] == "9"
+    assert client.get("/products/latest").json()[0]["product_id"] == "p39"
+    assert dynamodb_calls == []
+
+    # 名前の検索は GSI を読む
+    client.get("/products/search", params={"name_prefix": "prod"})
+    assert dynamodb_calls == ["Query"] * models.PRODUCT_INDEX_SHARDS
+
+
+# 正常系: このプロセスでの作成・更新・削除はその場で反映する
+def test_write_through(client: TestClient):
+    created = client.post(
+        "/products/", json={"product_id": "a", "name": "A", "price": 99}
+    )
+    assert created.status_code == 200
+    client.patch("/products/p01", json={"price": 100})
+    client.delete("/products/p02")
+
+    ids = [
+        p["product_id"] for p in client.get("/products/", params={"limit": 4}).json()
+    ]
+    assert ids == ["a", "p00", "p01", "p03"]
+    expensive = client.get("/products/search", params={"min_price": 99}).json()
+    assert [(p["product_id"], p["price"]) for p in expensive] == [
+        ("a", "99"),
+        ("p01", "100"),
+    ]
+    assert (
+        client.get("/products/latest", params={"limit": 1}).json()[0]["product_id"]
+        == "a"
+    )
+
+    client.delete("/test/clear-table")
+    assert client.get("/products/").json() == []
+
+
+# 正常系: 読み直しまでの間は新しく作成された商品だけを GSI から取り込む
+def test_refresh(enabled, monkeypatch):
+    snapshot = enabled.snapshot
+    Product(
+        product_id="new", name="New", price=1, created_at=CREATED_AT + timedelta(days=1)
+    ).save()
+    # 他のコンテナでの更新は読み直しまで反映しない
+    Product(
+        product_id="p00", name="Renamed", price=1, created_at=CREATED_AT, version=2
+    ).save()
+    enabled.refresh()
+    assert enabled.snapshot is snapshot
+    assert snapshot.latest(limit=1)[0][0].product_id == "new"
+    _, after_new = snapshot.list_page(1)
+    assert snapshot.list_page(1, after_new)[0][0].name == ""
+
+    # 古い版の商品で新しい版を上書きしない
+    snapshot.apply(Product(product_id="new", name="Old", price=1, version=0))
+    assert snapshot.latest(limit=1)[0][0].name == "New"
+
+    monkeypatch.setattr(models, "PRODUCT_SNAPSHOT_REBUILD_SECONDS", 0)
+    enabled.refresh()
+    assert enabled.snapshot is not snapshot
+    assert enabled.snapshot.list_page(1, after_new)[0][0].name == "Renamed"
+
+
+# 正常系: 初回はバックグラウンドで読み込み、それまでは DynamoDB を読む
+def test_background_load(seeded_products, monkeypatch):
+    monkeypatch.setattr(models, "PRODUCT_SNAPSHOT_ENABLED", True)
+    try:
+        deadline = time.monotonic() + 10
+        while product_snapshot.current() is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(product_snapshot.current()) == seeded_products
+    finally:
+        product_snapshot.stop()
+
+    monkeypatch.setattr(models, "PRODUCT_SNAPSHOT_ENABLED", False)
+    assert product_snapshot.current() is None
+
+
+# 異常系: 列に格納できない価格の商品があればスナップショットを使わない
+def test_unsupported_price(enabled):
+    product = Product(product_id="x", name="X", price=Decimal("0.0000001"))
+    with pytest.raises(UnsupportedValueError):
+        ProductSnapshot([product])
+
+    enabled.apply(product)
+    assert enabled.current() is None
+
+    product.save()
+    with pytest.raises(UnsupportedValueError):
+        enabled.rebuild()
+    assert enabled.current() is None
@@ -0,0 +1,167 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import stats
+from api.main import app
+from api.models import Product
+
+
+@pytest.fixture
+def client(product_stats):
+    yield TestClient(app)
+
+
+def product(product_id: str, price: int) -> dict:
+    return {"product_id": product_id, "name": f"Prod {product_id}", "price": price}
+
+
+def read_stats(client: TestClient) -> dict:
+    resp = client.get("/products/stats")
+    assert resp.status_code == 200
+    return resp.json()
+
+
+# 正常系: 作成・価格の更新・削除に合わせて集計値が変わる
+def test_stats_follow_writes(client: TestClient, dynamodb_calls):
+    assert read_stats(client) == {
+        "product_count": 0,
+        "price_total": "0",
+        "price_average": None,
+    }
+
+    client.post("/products/", json=product("p1", 10))
+    client.post("/products/", json=product("p2", 20))
+    assert client.post("/products/", json=product("p1", 99)).status_code == 409
+    assert read_stats(client) == {
+        "product_count": 2,
+        "price_total": "30",
+        "price_average": "15",
+    }
+
+    # 価格を変えない更新は従来どおり 1 回の UpdateItem
+    dynamodb_calls.clear()
+    client.patch("/products/p1", json={"name": "Renamed"})
+    assert dynamodb_calls == ["UpdateItem"]
+
+    dynamodb_calls.clear()
+    resp = client.patch("/products/p1", json={"price": 16})
+    assert dynamodb_calls == ["GetItem", "TransactWriteItems"]
+    assert resp.json()["price"] == "16"
+    assert resp.json()["name"] == "Renamed"
+    assert resp.headers["ETag"].startswith('"3-')
+    assert client.get("/products/p1").json() == resp.json()
+    assert read_stats(client)["price_total"] == "36"
+
+    assert client.delete("/products/p2").status_code == 204
+    assert read_stats(client) == {
+        "product_count": 1,
+        "price_total": "16",
+        "price_average": "16",
+    }
+
+
+# 異常系: 失敗した書き込みは集計値を変えない
+def test_failed_writes_do_not_change_stats(client: TestClient):
+    etag = client.post("/products/", json=product("p1", 10)).headers["ETag"]
+
+    stale = client.patch(
+        "/products/p1",
+        json={"price": 50},
+        headers={"If-Match": etag.replace('"1-', '"9-')},
+    )
+    assert stale.status_code == 412
+    assert client.patch("/products/none", json={"price": 50}).status_code == 404
+    assert client.delete("/products/none").status_code == 404
+    assert read_stats(client)["price_total"] == "10"
+
+    resp = client.patch("/products/p1", json={"price": 12}, headers={"If-Match": etag})
+    assert resp.headers["ETag"] == etag.replace('"1-', '"2-')
+    assert read_stats(client)["price_total"] == "12"
+
+
+# 正常系: 一括作成では作成できた商品だけを数える
+@pytest.mark.usefixtures("atomic_writes")
+def test_batch_create_updates_stats(client: TestClient):
+    client.post("/products/", json=product("p0", 100))
+    rows = [product(f"p{i}", i) for i in range(150)]
+    results = client.post("/products/batch", json=rows).json()
+    assert sum(result["status"] == "created" for result in results) == 149
+    assert read_stats(client) == {
+        "product_count": 150,
+        "price_total": str(sum(range(1, 150)) + 100),
+        "price_average": str(Decimal(sum(range(1, 150)) + 100) / 150),
+    }
+
+
+# 正常系: 同時に書き込んでもカウンタの増減が失われない
+@pytest.mark.usefixtures("atomic_writes")
+def test_concurrent_writes(client: TestClient):
+    def create_and_reprice(i: int) -> None:
+        client.post("/products/", json=product(f"p{i}", 1))
+        client.patch(f"/products/p{i}", json={"price": 2})
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(create_and_reprice, range(64)))
+    assert read_stats(client)["product_count"] == 64
+    assert read_stats(client)["price_total"] == "128"
+
+
+# 正常系: 既存の商品から集計値を作り直す・全件削除で 0 に戻る
+def test_rebuild(client: TestClient, products_table):
+    with products_table.batch_writer() as writer:
+        for i in range(10):
+            # 集計を有効にする前に書き込まれた商品 (価格が文字列型のものも含む)
+            price = str(i) if i % 2 else Decimal(i)
+            writer.put_item(Item={"product_id": f"p{i}", "name": "Old", "price": price})
+    assert read_stats(client)["product_count"] == 0
+
+    rebuilt = stats.rebuild()
+    assert (rebuilt.product_count, rebuilt.price_total) == (10, Decimal(45))
+
+    client.delete("/test/clear-table")
+    assert read_stats(client)["product_count"] == 0
+    assert len(list(Product.scan())) == 0
+
+
+# 異常系: 集計が無効な場合は 404
+def test_stats_disabled(products_table):
+    resp = TestClient(app).get("/products/stats")
+    assert resp.status_code == 404
+
+
+@pytest.fixture
+def interleave(monkeypatch):
+    """最初のトランザクションの直前に、別のリクエストを割り込ませる"""
+    transact = stats.transact
+    pending = []
+
+    def interleaved(*args, **kwargs):
+        while pending:
+            pending.pop()()
+        transact(*args, **kwargs)
+
+    monkeypatch.setattr(stats, "transact", interleaved)
+    return pending
+
+
+# 異常系: 読んでから書くまでに削除された商品は 404 で、集計値を二重に変えない
+@pytest.mark.parametrize("write", ["delete", "patch"])
+def test_write_races_with_delete(client: TestClient, interleave, write):
+    client.post("/products/", json=product("p1", 10))
+    client.post("/products/", json=product("p2", 20))
+
+    interleave.append(lambda: client.delete("/products/p1"))
+    if write == "delete":
+        resp = client.delete("/products/p1")
+    else:
+        resp = client.patch("/products/p1", json={"price": 50})
+    assert resp.status_code == 404
+    assert client.get("/products/p1").status_code == 404
+    assert read_stats(client) == {
+        "product_count": 1,
+        "price_total": "20",
+        "price_average": "20",
+    }